@@ -0,0 +1,17 @@
+from logging.handlers import RotatingFileHandler
+import os
+
+
+class ArquivoRotativoHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler que só abre o arquivo (e cria a pasta) no primeiro registro:
+    importar settings, "manage.py check" e os testes não criam nada em disco.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        kwargs["delay"] = True
+        super().__init__(filename, *args, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
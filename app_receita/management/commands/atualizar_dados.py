@@ -0,0 +1,51 @@
+import json
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from basecode import Config, fingerprint_fontes  # type: ignore
+
+from app_receita.services.snapshot import construir_snapshot, ler_manifesto
+
+
+class Command(BaseCommand):
+    help = (
+        "Atualizador em segundo plano: a cada intervalo confere as fontes e, se mudaram, monta e "
+        "publica um novo snapshot. As views seguem servindo o snapshot atual durante a montagem; "
+        "se ela falhar, o snapshot anterior continua publicado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intervalo", type=float, help="Segundos entre verificações (padrão: settings.RECEITA_ATUALIZACAO_INTERVALO).")
+        parser.add_argument("--uma-vez", action="store_true", help="Faz uma única verificação e sai.")
+        parser.add_argument("--forcar", action="store_true", help="Monta o snapshot mesmo sem mudança nas fontes (só na 1ª verificação).")
+        parser.add_argument("--diretorio", help="Pasta dos snapshots (padrão: settings.RECEITA_SNAPSHOT_DIR).")
+        parser.add_argument("--manter", type=int, help="Quantidade de versões mantidas em disco.")
+
+    def handle(self, *args, **options):
+        intervalo = options["intervalo"] or float(getattr(settings, "RECEITA_ATUALIZACAO_INTERVALO", 15 * 60))
+        forcar = options["forcar"]
+        while True:
+            self._verificar(options, forcar)
+            forcar = False
+            if options["uma_vez"]:
+                return
+            time.sleep(intervalo)
+
+    def _verificar(self, options, forcar: bool) -> None:
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cfg = Config()
+        try:
+            atual = ler_manifesto(diretorio=options["diretorio"])
+            # o manifesto passou por JSON: compara na mesma representação
+            fp = json.loads(json.dumps(fingerprint_fontes(cfg), default=str))
+            if not forcar and atual is not None and atual.get("fingerprint") == fp:
+                self.stdout.write(f"[{agora}] Fontes sem mudança; snapshot {atual['versao']} segue publicado.")
+                return
+            manifesto = construir_snapshot(cfg, diretorio=options["diretorio"], manter=options["manter"])
+        except Exception as e:
+            self.stderr.write(f"[{agora}] Falha na atualização ({type(e).__name__}: {e}); o snapshot anterior continua publicado.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"[{agora}] Snapshot {manifesto['versao']} publicado."))
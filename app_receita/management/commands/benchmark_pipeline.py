@@ -0,0 +1,251 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from basecode import _alocar_pendente_hd, _melt_vendas, _tipar_vendas, start_of_current_month  # type: ignore
+
+from app_receita.services.filtros import filtrar, filtro_indexado
+
+
+def _alocacao_hd_referencia(rec: pd.DataFrame, dim: pd.DataFrame, cur: pd.Timestamp) -> pd.DataFrame:
+    """Implementação linha a linha original de tbl_pendente_alocacao_hd_v2 (referência do benchmark)."""
+    jd = rec.merge(dim, left_on="codigo_frente", right_on="codigofrente", how="left")
+    tot = jd.groupby("codigo_frente", dropna=False)["QTD_HD"].sum().rename("TotalHD").reset_index()
+    jd = jd.merge(tot, on="codigo_frente", how="left")
+
+    mmin = jd.groupby("codigo_frente", dropna=False)["PER_REF"].min().rename("MinPER").reset_index()
+    jd = jd.merge(mmin, on="codigo_frente", how="left")
+    jd["MesesDeslocar"] = np.where(jd["MinPER"] < cur, (cur.year-jd["MinPER"].dt.year)*12 + (cur.month-jd["MinPER"].dt.month), 0)
+
+    def _calc_row(row):
+        if pd.isna(row["TotalHD"]) or row["TotalHD"] == 0:
+            return pd.Series({"mes_calendario": pd.NaT, "ReceitaPendenteAlocMes": np.nan})
+        valor = row["ReceitaPendAloc"] * (row["QTD_HD"] / row["TotalHD"])
+        mes = (row["PER_REF"] + pd.DateOffset(months=int(row["MesesDeslocar"]))).normalize()
+        return pd.Series({"mes_calendario": mes, "ReceitaPendenteAlocMes": valor})
+
+    out = jd.join(jd.apply(_calc_row, axis=1))
+    out = out[out["mes_calendario"].notna()].copy()
+    out = out[out["mes_calendario"] >= cur].copy()
+    out["mes_calendario"] = out["mes_calendario"].dt.date
+    return out[["Check","mes_calendario","codigo_frente","nome_cliente","ReceitaPendenteAlocMes"]]
+
+
+def _dados_alocacao_hd(linhas: int, seed: int) -> tuple[pd.DataFrame, pd.DataFrame, pd.Timestamp]:
+    """
+    Dimensionamento sintético com "linhas" linhas (~12 meses por frente, dias 1–31 e horário
+    para exercitar o fim de mês) e a receita pendente das frentes, já tipados como no pipeline.
+    """
+    rng = np.random.default_rng(seed)
+    cur = start_of_current_month()
+    n_frentes = max(1, linhas // 12)
+
+    frentes = rng.integers(1, n_frentes * 2, size=linhas)
+    inicio = cur.to_datetime64().astype("datetime64[M]") + rng.integers(-24, 24, size=linhas)
+    per = (
+        inicio.astype("datetime64[D]") + rng.integers(0, 31, size=linhas)
+    ).astype("datetime64[ns]") + rng.integers(0, 86_400, size=linhas).astype("timedelta64[s]")
+    dim = pd.DataFrame({
+        "codigofrente": pd.array(frentes, dtype="Int64"),
+        "PER_REF": pd.Series(per).where(rng.random(linhas) > 0.01),
+        "QTD_HD": rng.integers(0, 6, size=linhas),
+    })
+    dim["PER_REF"] = dim["PER_REF"].fillna(cur)
+
+    # frentes sem dimensionamento, repetidas (Check/Cliente diferentes) e sem código
+    cod = rng.integers(1, n_frentes * 3, size=n_frentes)
+    rec = pd.DataFrame({
+        "Check": rng.choice(["Agronegócio", "Industrial", "Varejo"], size=n_frentes),
+        "codigo_frente": pd.array(cod, dtype="Int64"),
+        "nome_cliente": pd.Series(cod).map(lambda c: f"cliente {c % 997}"),
+        "ReceitaPendAloc": rng.normal(50_000, 20_000, size=n_frentes).round(2),
+    })
+    rec.loc[rng.random(n_frentes) < 0.01, "codigo_frente"] = pd.NA
+    return rec, dim, cur
+
+
+def _filtros_referencia(df, mes: str, status: str, carteira_interno: str | None):
+    """Implementação original de _aplicar_filtros_basicos (varredura das colunas a cada chamada)."""
+    out = df.copy()
+    if "mes_calendario" in out.columns and mes != "tudo":
+        try:
+            y, m = mes.split("-")
+            ini = pd.Timestamp(int(y), int(m), 1)
+            fim = ini + pd.offsets.MonthEnd(0)
+            mask = (pd.to_datetime(out["mes_calendario"], errors="coerce") >= ini) & \
+                   (pd.to_datetime(out["mes_calendario"], errors="coerce") <= fim)
+            out = out[mask]
+        except Exception:
+            pass
+    if status != "todos":
+        cand_cols = [c for c in out.columns if "classificacao" in c or "status" in c]
+        mask = None
+        for c in cand_cols:
+            m = out[c].astype(str).str.strip().eq(status)
+            mask = m if mask is None else (mask | m)
+        if mask is not None:
+            out = out[mask]
+    if carteira_interno is not None and "Check" in out.columns:
+        out = out[out["Check"].astype(str).str.strip().eq(carteira_interno)]
+    return out
+
+
+def _dados_filtros(linhas: int, seed: int) -> pd.DataFrame:
+    """Long sintético: datas (com horário e inválidas), Check/status com espaços e nulos."""
+    rng = np.random.default_rng(seed)
+    mes = (
+        np.datetime64("2024-01-01") + rng.integers(0, 3 * 365, size=linhas).astype("timedelta64[D]")
+    ).astype("datetime64[ns]") + np.where(rng.random(linhas) < 0.05, np.timedelta64(3, "h"), np.timedelta64(0, "h"))
+    df = pd.DataFrame({
+        "Check": rng.choice(np.array(["Agronegócio", " Agronegócio", "MID", "Varejo", None], dtype=object), size=linhas),
+        "mes_calendario": pd.Series(mes).dt.date.where(rng.random(linhas) > 0.01),
+        "codigo_frente": rng.integers(1, 50_000, size=linhas),
+        "status_frente": rng.choice(np.array(["Novo", "Renovação ", "Projeto em Risco", None], dtype=object), size=linhas),
+        "classificacaooportunidade__c": rng.choice(np.array(["Novo", "Renovação", None], dtype=object), size=linhas),
+        "Atributo": rng.choice(["ReceitaPoC", "SuccessFee", "ReceitaProduto"], size=linhas),
+        "Valor": rng.normal(1_000, 500, size=linhas),
+    })
+    return df
+
+
+def _melt_vendas_referencia(combined: pd.DataFrame) -> pd.DataFrame:
+    """Layout anterior do tF_Vendas_long: melt de todas as colunas, textos object e datas date."""
+    id_cols = [c for c in ["Check", "mes_calendario", "codigo_frente", "nome_cliente", "status_frente"] if c in combined.columns]
+    value_cols = [c for c in combined.columns if c not in id_cols]
+    long_df = combined.melt(id_vars=id_cols, value_vars=value_cols, var_name="Atributo", value_name="Valor")
+    long_df["mes_calendario"] = pd.to_datetime(long_df["mes_calendario"], errors="coerce").dt.date
+    long_df["codigo_frente"] = pd.to_numeric(long_df["codigo_frente"], errors="coerce").astype("Int64")
+    return long_df
+
+
+_MEDIDAS_SINTETICAS = (
+    "ReceitaMeta", "ReceitaPendenteAlocMes", "ReceitaRepresadaAc", "ReceitaRecuperadaAc",
+    "Estoque.ReceitaRepresadaFinalSaldo", "Estoque.ReceitaRepresadaFinal", "SomaVendas", "MetaVendas",
+    "Recebimento", "SuccessFee", "ReceitaProduto", "ReceitaPoC",
+)
+
+
+def _dados_consolidado(linhas: int, seed: int) -> pd.DataFrame:
+    """
+    Consolidado sintético no formato do tf_vendas antes do melt: cada linha vem de uma fonte
+    e só tem as medidas dela (demais zeradas), mais ReceitaTotal/DifMeta.
+    """
+    rng = np.random.default_rng(seed)
+    fonte = rng.integers(0, len(_MEDIDAS_SINTETICAS), size=linhas)
+    df = pd.DataFrame({
+        "Check": rng.choice(["Agronegócio", "Bens Não Duráveis", "MID", "Servicos e Tecnologia", "Falconi EUA"], size=linhas),
+        "mes_calendario": pd.Series(
+            np.datetime64("2024-01-01", "M") + rng.integers(0, 36, size=linhas)
+        ).astype("datetime64[ns]").dt.date,
+        "codigo_frente": rng.integers(1, 50_000, size=linhas),
+        "nome_cliente": pd.Series(rng.integers(0, 3_000, size=linhas)).map(lambda c: f"Cliente {c:04d}"),
+        "status_frente": rng.choice(np.array(["Ativa", "Encerrada", "Vendido", None], dtype=object), size=linhas),
+    })
+    for i, c in enumerate(_MEDIDAS_SINTETICAS):
+        df[c] = np.where(fonte == i, rng.normal(10_000, 5_000, size=linhas).round(2), 0.0)
+    vendas = fonte == _MEDIDAS_SINTETICAS.index("SomaVendas")
+    df["classificacaooportunidade__c"] = np.where(vendas, rng.choice(["Novo", "Renovação"], size=linhas), None)
+    df["ReceitaTotal"] = df[["ReceitaPoC", "ReceitaPendenteAlocMes", "Estoque.ReceitaRepresadaFinal", "SuccessFee", "ReceitaProduto"]].sum(axis=1)
+    df["DifMeta"] = df["ReceitaMeta"] - df["ReceitaTotal"]
+    return df
+
+
+class Command(BaseCommand):
+    help = "Mede etapas críticas do pipeline com dados sintéticos e confere o resultado com a implementação de referência."
+
+    casos = ("alocacao_hd", "filtros", "memoria_long")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--caso", choices=self.casos, action="append", help="Caso a medir (padrão: todos).")
+        parser.add_argument("--linhas", type=int, default=500_000, help="Linhas dos dados sintéticos.")
+        parser.add_argument("--repeticoes", type=int, default=3, help="Execuções medidas (vale a melhor).")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--sem-referencia", action="store_true", help="Não executa a referência (lenta).")
+
+    def _medir(self, func, repeticoes: int):
+        melhor, out = float("inf"), None
+        for _ in range(max(1, repeticoes)):
+            t0 = time.perf_counter()
+            out = func()
+            melhor = min(melhor, time.perf_counter() - t0)
+        return melhor, out
+
+    def handle(self, *args, **options):
+        for caso in options["caso"] or self.casos:
+            getattr(self, f"_caso_{caso}")(options)
+
+    def _caso_alocacao_hd(self, options):
+        rec, dim, cur = _dados_alocacao_hd(options["linhas"], options["seed"])
+        self.stdout.write(f"alocacao_hd: {len(dim)} linhas de dimensionamento, {len(rec)} frentes")
+
+        t_vet, out = self._medir(lambda: _alocar_pendente_hd(rec, dim, cur), options["repeticoes"])
+        self.stdout.write(f"  vetorizado: {t_vet:.3f}s ({len(out)} linhas)")
+        if options["sem_referencia"]:
+            return
+
+        t_ref, ref = self._medir(lambda: _alocacao_hd_referencia(rec, dim, cur), 1)
+        self.stdout.write(f"  referência: {t_ref:.3f}s ({t_ref / t_vet:.0f}x)")
+        try:
+            # a referência devolve o valor como object (pd.Series por linha); o vetorizado, float64
+            pd.testing.assert_frame_equal(out, ref, check_exact=True, check_dtype=False)
+        except AssertionError as e:
+            raise CommandError(f"alocacao_hd: resultado diverge da referência\n{e}") from e
+        self.stdout.write(self.style.SUCCESS("  resultado idêntico à referência"))
+
+    def _caso_filtros(self, options):
+        df = _dados_filtros(options["linhas"], options["seed"])
+        combinacoes = [
+            (mes, status, carteira)
+            for mes in ("tudo", "2024-02", "2025-12", "2025-13")
+            for status in ("todos", "Novo", "Renovação")
+            for carteira in (None, "Agronegócio", "MID")
+        ]
+        self.stdout.write(f"filtros: {len(df)} linhas, {len(combinacoes)} combinações mês/status/carteira")
+
+        t_idx, _ = self._medir(lambda: filtro_indexado(df), 1)
+        self.stdout.write(f"  montagem dos índices: {t_idx:.3f}s (uma vez por DataFrame)")
+        t_vet, outs = self._medir(lambda: [filtrar(df, *c) for c in combinacoes], options["repeticoes"])
+        self.stdout.write(f"  indexado: {t_vet / len(combinacoes) * 1000:.2f}ms por filtro")
+        if options["sem_referencia"]:
+            return
+
+        t_ref, refs = self._medir(lambda: [_filtros_referencia(df, *c) for c in combinacoes], 1)
+        self.stdout.write(f"  referência: {t_ref / len(combinacoes) * 1000:.2f}ms por filtro ({t_ref / t_vet:.0f}x)")
+        for c, out, ref in zip(combinacoes, outs, refs):
+            try:
+                pd.testing.assert_frame_equal(out, ref, check_exact=True)
+            except AssertionError as e:
+                raise CommandError(f"filtros {c}: resultado diverge da referência\n{e}") from e
+        self.stdout.write(self.style.SUCCESS("  resultado idêntico à referência"))
+
+    def _caso_memoria_long(self, options):
+        combined = _dados_consolidado(options["linhas"], options["seed"])
+        self.stdout.write(f"memoria_long: consolidado com {len(combined)} linhas x {combined.shape[1]} colunas")
+
+        t_novo, novo = self._medir(lambda: _melt_vendas(_tipar_vendas(combined)), options["repeticoes"])
+        t_ref, ref = self._medir(lambda: _melt_vendas_referencia(combined), 1)
+        mb = lambda df: df.memory_usage(deep=True).sum() / 2**20
+        self.stdout.write(f"  {'layout':<10}{'linhas':>12}{'MB':>10}{'tempo':>10}")
+        self.stdout.write(f"  {'anterior':<10}{len(ref):>12}{mb(ref):>10.1f}{t_ref:>9.2f}s")
+        self.stdout.write(f"  {'compacto':<10}{len(novo):>12}{mb(novo):>10.1f}{t_novo:>9.2f}s")
+        for col in novo.columns:
+            self.stdout.write(f"    {col:<30}{str(novo[col].dtype)[:20]:<22}{novo[col].memory_usage(deep=True) / 2**20:>8.1f} MB")
+
+        # mesmas somas por dimensões/medida (o layout anterior também tinha a classificação como medida)
+        chaves = ["Check", "mes_calendario", "codigo_frente", "nome_cliente", "status_frente", "Atributo"]
+        ref = ref[ref["Atributo"] != "classificacaooportunidade__c"].copy()
+        ref["Valor"] = pd.to_numeric(ref["Valor"])
+        ref["mes_calendario"] = pd.to_datetime(ref["mes_calendario"])
+        a = ref.groupby(chaves, dropna=False)["Valor"].sum()
+        a = a[a != 0].sort_index()
+        novo = novo.astype({c: object for c in ("Check", "nome_cliente", "status_frente", "Atributo")})
+        novo["mes_calendario"] = novo["mes_calendario"].astype("datetime64[ns]")
+        b = novo.groupby(chaves, dropna=False)["Valor"].sum().sort_index()
+        a.index = a.index.set_levels(a.index.levels[1].astype("datetime64[ns]"), level=1)
+        try:
+            pd.testing.assert_series_equal(a, b, check_index_type=False, check_names=False)
+        except AssertionError as e:
+            raise CommandError(f"memoria_long: somas divergem do layout anterior\n{e}") from e
+        self.stdout.write(self.style.SUCCESS("  mesmas somas por dimensão/medida"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from basecode import Config  # type: ignore
+
+from app_receita.services.snapshot import construir_snapshot
+
+
+class Command(BaseCommand):
+    help = "Executa o pipeline e publica um snapshot Parquet (lido pelas views no lugar das fontes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--diretorio", help="Pasta dos snapshots (padrão: settings.RECEITA_SNAPSHOT_DIR).")
+        parser.add_argument("--manter", type=int, help="Quantidade de versões mantidas em disco.")
+
+    def handle(self, *args, **options):
+        try:
+            manifesto = construir_snapshot(Config(), diretorio=options["diretorio"], manter=options["manter"])
+        except Exception as e:
+            raise CommandError(f"Falha ao construir snapshot: {e}") from e
+
+        for nome, info in manifesto["tabelas"].items():
+            self.stdout.write(f"  {nome}: {info['linhas']} linhas")
+        self.stdout.write(self.style.SUCCESS(f"Snapshot {manifesto['versao']} publicado."))
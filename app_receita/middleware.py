@@ -0,0 +1,89 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from app_receita.services import metricas
+
+
+def _rotulos(request, response) -> dict:
+    """view (url_name da app, ou "outros") + tipo da URL, quando houver (exportar/<tipo>/, api/tabela/<tipo>/)."""
+    match = getattr(request, "resolver_match", None)
+    view = "outros"
+    tipo = ""
+    if match is not None and match.app_name in ("", "app_receita") and match.url_name:
+        view = match.url_name
+        tipo = str(match.kwargs.get("tipo", ""))
+    return {"view": view, "tipo": tipo, "metodo": request.method}
+
+
+class MetricasMiddleware:
+    """
+    Mede cada requisição para o /metrics: latência até a resposta, tamanho do corpo e
+    contagem por status. Respostas em streaming (exportações) têm o tamanho e a duração
+    total medidos quando o último bloco é enviado.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        inicio = time.perf_counter()
+        metricas.EM_ANDAMENTO.somar(1)
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.EM_ANDAMENTO.somar(-1)
+        return self._registrar(request, response, inicio)
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        metricas.EM_ANDAMENTO.somar(1)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.EM_ANDAMENTO.somar(-1)
+        return self._registrar(request, response, inicio)
+
+    def _registrar(self, request, response, inicio: float):
+        rotulos = _rotulos(request, response)
+        metricas.LATENCIA.observar(time.perf_counter() - inicio, **rotulos)
+        metricas.REQUISICOES.somar(1, status=str(response.status_code), **rotulos)
+        if not response.streaming:
+            metricas.TAMANHO.observar(len(response.content), **rotulos)
+        elif response.is_async:
+            response.streaming_content = _medir_async(response.streaming_content, inicio, rotulos)
+        else:
+            response.streaming_content = _medir(response.streaming_content, inicio, rotulos)
+        return response
+
+
+def _fim_streaming(tamanho: int, inicio: float, rotulos: dict) -> None:
+    metricas.TAMANHO.observar(tamanho, **rotulos)
+    metricas.DURACAO_STREAMING.observar(time.perf_counter() - inicio, **rotulos)
+
+
+def _medir(blocos, inicio: float, rotulos: dict):
+    tamanho = 0
+    try:
+        for bloco in blocos:
+            tamanho += len(bloco)
+            yield bloco
+    finally:
+        _fim_streaming(tamanho, inicio, rotulos)
+
+
+async def _medir_async(blocos, inicio: float, rotulos: dict):
+    tamanho = 0
+    try:
+        async for bloco in blocos:
+            tamanho += len(bloco)
+            yield bloco
+    finally:
+        _fim_streaming(tamanho, inicio, rotulos)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+from collections.abc import Mapping
+from typing import Dict, Tuple
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from app_receita.services.filtros import colunas_status
+
+# Cubo = somas pré-agregadas por (dimensões de filtro) x medida, montadas uma vez por
+# resultado do pipeline/snapshot. As telas filtram e pivotam o cubo, não o long inteiro.
+# As dimensões guardam os valores originais (Check/status sem normalizar); o mês vira o
+# 1º dia do mês – os filtros de mês/status/carteira dão o mesmo resultado no cubo.
+
+# fontes da cascata quando não há o consolidado (tF_Vendas)
+FONTES_CASCATA = ("Receita_PoC", "Receita_Produto", "Receita_SuccessFee", "Estoque", "Pendente_Alocacao_HD", "Meta_Receita", "Vendas")
+MEDIDAS_CASCATA = (
+    "ReceitaPoC", "SuccessFee", "ReceitaProduto", "ReceitaPendenteAlocMes",
+    "ReceitaPendenteAssinatura", "ReceitaPotencialPocMes", "ReceitaMeta",
+)
+DIMENSOES_TABELA = ("Check", "nome_cliente", "codigo_frente")
+# colunas de status do tF_Vendas consolidado usadas pelo filtro de status da cascata
+COLUNAS_STATUS_CONSOLIDADO = ("status_frente",)
+
+
+def _mes_inicio(s: "pd.Series") -> "pd.Series":
+    return pd.to_datetime(s, errors="coerce").dt.to_period("M").dt.to_timestamp()
+
+
+def _agregar(df: "pd.DataFrame", chaves: list[str], medidas: list[str]) -> "pd.DataFrame":
+    base = df[chaves + medidas].copy()
+    if "mes_calendario" in base.columns:
+        base["mes_calendario"] = _mes_inicio(base["mes_calendario"])
+    for c in medidas:
+        base[c] = pd.to_numeric(base[c], errors="coerce")
+    if not chaves:
+        return base[medidas].sum().to_frame().T
+    return base.groupby(chaves, dropna=False, sort=False, observed=True)[medidas].sum().reset_index()
+
+
+class CuboReceita:
+    """
+    Agregados de um resultado do pipeline (PipelineResult/SnapshotResult), calculados no
+    primeiro uso de cada parte:
+      - cascata(): Valor por (Check, mês, colunas de status, Atributo);
+      - tabela(chaves, medida): medida por (Check, nome_cliente, codigo_frente, mês, status).
+    Guarda só uma referência fraca ao resultado.
+    """
+
+    def __init__(self, dfs: Mapping):
+        self._dfs = weakref.ref(dfs)
+        self._partes: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _resultado(self) -> Mapping:
+        dfs = self._dfs()
+        if dfs is None:
+            raise RuntimeError("Resultado do pipeline já foi descartado.")
+        return dfs
+
+    def _parte(self, chave: tuple, montar):
+        with self._lock:
+            if chave not in self._partes:
+                self._partes[chave] = montar(self._resultado())
+            return self._partes[chave]
+
+    def cascata(self) -> Tuple["pd.DataFrame", bool]:
+        """
+        (cubo, consolidado) no formato Atributo/Valor. Com o tF_Vendas (wide) o cubo traz todas
+        as suas medidas, inclusive ReceitaTotal/DifMeta (consolidado=True); sem ele, as medidas
+        de MEDIDAS_CASCATA das fontes individuais.
+        """
+        return self._parte(("cascata",), _montar_cascata)
+
+    def tabela(self, chaves: Tuple[str, ...], medida: str) -> "pd.DataFrame":
+        """Soma de "medida" nas fontes "chaves" (concatenadas), por frente/mês."""
+        return self._parte(("tabela", tuple(chaves), medida), lambda dfs: _montar_tabela(dfs, chaves, medida))
+
+    def tabelas(self, partes: Tuple[Tuple[str, Tuple[str, ...], str], ...]) -> Tuple["pd.DataFrame", Dict[str, np.ndarray]]:
+        """
+        Partes de tabela (tipo, chaves, medida) empilhadas num só DataFrame – colunas "tipo"
+        e "Valor" (a medida de cada parte) –, para filtrar várias abas de uma vez com um só
+        índice. Devolve também as posições isentas de cada filtro (linhas de partes sem a
+        coluna de mês/status/carteira, que filtradas sozinhas não seriam restringidas).
+        """
+        pecas = [(tipo, medida, self.tabela(chaves, medida) if chaves else None) for tipo, chaves, medida in partes]
+        return self._parte(("tabelas", tuple(partes)), lambda dfs: _empilhar(pecas))
+
+
+def _montar_cascata(dfs: Mapping) -> Tuple["pd.DataFrame", bool]:
+    src = dfs.get("tF_Vendas")
+    consolidado = src is not None and not src.empty
+    if not consolidado:
+        frames = [dfs[k] for k in FONTES_CASCATA if k in dfs]
+        src = pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame()
+
+    status = colunas_status(src)
+    if consolidado:
+        # como no tF_Vendas_long original, só status_frente filtra o status: a classificação
+        # Novo/Renovação das Vendas (hoje dimensão do wide) era um Atributo do melt, não filtro
+        status = [c for c in status if c in COLUNAS_STATUS_CONSOLIDADO]
+    chaves = [c for c in ("Check", "mes_calendario") if c in src.columns] + status
+    if consolidado:
+        # agrega o wide direto: sem passar pelo long (melt) para depois pivotar de volta
+        medidas = [c for c in src.columns if c not in chaves and pd.api.types.is_numeric_dtype(src[c]) and c != "codigo_frente"]
+    else:
+        medidas = [c for c in MEDIDAS_CASCATA if c in src.columns]
+    if not medidas:
+        return pd.DataFrame(columns=chaves + ["Atributo", "Valor"]), consolidado
+    cubo = _agregar(src, chaves, medidas).melt(id_vars=chaves, value_vars=medidas, var_name="Atributo", value_name="Valor")
+    return cubo, consolidado
+
+
+def _empilhar(pecas) -> Tuple["pd.DataFrame", Dict[str, np.ndarray]]:
+    frames = []
+    isentos: Dict[str, list] = {"mes": [], "status": [], "carteira": []}
+    inicio = 0
+    for tipo, medida, df in pecas:
+        if df is None or df.empty or medida not in df.columns:
+            continue
+        parte = df.rename(columns={medida: "Valor"})
+        parte.insert(0, "tipo", tipo)
+        faixa = np.arange(inicio, inicio + len(parte), dtype=np.intp)
+        if "mes_calendario" not in parte.columns:
+            isentos["mes"].append(faixa)
+        if not colunas_status(parte):
+            isentos["status"].append(faixa)
+        if "Check" not in parte.columns:
+            isentos["carteira"].append(faixa)
+        frames.append(parte)
+        inicio += len(parte)
+    if not frames:
+        return pd.DataFrame(columns=["tipo", "Valor"]), {}
+    pilha = pd.concat(frames, ignore_index=True, sort=False) if len(frames) > 1 else frames[0]
+    pilha["tipo"] = pilha["tipo"].astype("category")
+    return pilha, {k: np.concatenate(v) for k, v in isentos.items() if v}
+
+
+def _montar_tabela(dfs: Mapping, chaves: Tuple[str, ...], medida: str) -> "pd.DataFrame":
+    frames = [df for df in (dfs.get(k) for k in chaves) if df is not None]
+    if not frames:
+        return pd.DataFrame()
+    src = pd.concat(frames, ignore_index=True, sort=False) if len(frames) > 1 else frames[0]
+    if src.empty or medida not in src.columns:
+        return src.iloc[0:0]
+    dims = [c for c in DIMENSOES_TABELA + ("mes_calendario",) if c in src.columns] + colunas_status(src)
+    return _agregar(src, dims, [medida])
+
+
+# um cubo por resultado carregado; sai do registro junto com o resultado
+_CUBOS: Dict[int, CuboReceita] = {}
+_CUBOS_LOCK = threading.Lock()
+
+
+def cubo_receita(dfs: Mapping) -> CuboReceita:
+    with _CUBOS_LOCK:
+        cubo = _CUBOS.get(id(dfs))
+        if cubo is not None and cubo._dfs() is dfs:
+            return cubo
+        cubo = _CUBOS[id(dfs)] = CuboReceita(dfs)
+    weakref.finalize(dfs, _descartar_cubo, id(dfs), cubo)
+    return cubo
+
+
+def _descartar_cubo(chave: int, cubo: CuboReceita) -> None:
+    with _CUBOS_LOCK:
+        if _CUBOS.get(chave) is cubo:
+            del _CUBOS[chave]
@@ -1,13 +1,26 @@
 from __future__ import annotations
-from dataclasses import asdict
+from dataclasses import asdict, dataclass
 import pandas as pd
-from datetime import date
+from datetime import date, datetime
 from typing import Any, Dict, List, Tuple
+import hashlib
+import json
+import logging
+from concurrent.futures import Future
+import threading
+import time
 import traceback
 
+from django.conf import settings
+
 # importa seu pipeline
 # se você escolheu outro nome de arquivo, troque "basecode" abaixo
-from basecode import Config, run_pipeline  # type: ignore
+from basecode import PIPELINE_VIEWS, Config, PipelineResult, fingerprint_fontes, run_pipeline  # type: ignore
+
+from app_receita.services.cubo import cubo_receita
+from app_receita.services.filtros import filtrar
+from app_receita.services.snapshot import carregar_snapshot
+from app_receita.services.trava import trava_pipeline
 
 # --- nomes oficiais de UI que você definiu ---
 CARTEIRAS_UI_OFICIAIS = [
@@ -36,12 +49,274 @@ def _ajustar_carteira_para_interno(valor_ui: str) -> str:
 def _ajustar_carteira_para_ui(valor_dado: str) -> str:
     return DEPARA_EXIBICAO.get(valor_dado, valor_dado)
 
+logger = logging.getLogger(__name__)
+
+# --- cache do pipeline (por processo) ---
+
+def _chave_config(cfg: Config) -> str:
+    payload = json.dumps(asdict(cfg), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _normalizar_fingerprint(fp: Dict[str, Any]) -> Dict[str, Any]:
+    """Fingerprint no formato JSON (tuplas viram listas): comparável com o gravado no manifesto do snapshot."""
+    return json.loads(json.dumps(fp, sort_keys=True, default=str))
+
+
+@dataclass
+class _EntradaCache:
+    dfs: Dict[str, "pd.DataFrame"]
+    fingerprint: Dict[str, Any]
+    criado_em: float
+    validado_em: float
+    desatualizado: bool = False  # fontes mudaram desde a construção (conferido em validado_em)
+
+
+class PipelineCache:
+    """
+    Guarda o resultado de run_pipeline por Config.
+      - Arquivos (CSV/Excel/.accdb) são conferidos por mtime/tamanho a cada acesso (só stat).
+      - Vencido o TTL, o fingerprint completo (Access/BigQuery) é recalculado: se nada mudou,
+        a entrada é revalidada; senão, o pipeline roda de novo reaproveitando as etapas cujas
+        fontes não mudaram (refresh incremental).
+      - Com RECEITA_PIPELINE_SERVIR_ANTIGO (stale-while-revalidate), uma entrada vencida
+        continua sendo servida enquanto a nova é montada em segundo plano; a troca só
+        acontece quando a nova foi calculada por inteiro. Se a atualização falhar, a entrada
+        antiga fica no ar e a próxima tentativa espera o TTL.
+      - Single-flight: uma construção por Config no processo (quem chega depois espera o
+        mesmo Future; as etapas do resultado preguiçoso também são lidas uma vez só) e uma
+        leitura completa por vez entre processos (trava de arquivo "pipeline", mantida na
+        atualização em segundo plano e na montagem de snapshot). Quem esperou a trava de
+        outro processo usa o snapshot que ele tenha publicado, se houver.
+    O dicionário devolvido é compartilhado entre requisições: não altere os DataFrames.
+    """
+
+    def __init__(self, ttl: float | None = None):
+        self._ttl = ttl
+        self._entradas: Dict[str, _EntradaCache] = {}
+        self._lock = threading.Lock()
+        self._em_construcao: Dict[str, Future] = {}
+        self._proxima_tentativa: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.antigos = 0
+        self.falhas_atualizacao = 0
+
+    @property
+    def ttl(self) -> float:
+        if self._ttl is not None:
+            return self._ttl
+        return float(getattr(settings, "RECEITA_PIPELINE_CACHE_TTL", 15 * 60))
+
+    def _valida(self, entrada: _EntradaCache, cfg: Config, agora: float) -> bool:
+        arquivos = _normalizar_fingerprint(fingerprint_fontes(cfg, completo=False))["arquivos"]
+        if arquivos != entrada.fingerprint.get("arquivos"):
+            return False
+        if agora - entrada.validado_em < self.ttl:
+            return not entrada.desatualizado
+        # no máximo uma consulta completa (Access/BigQuery) por TTL, inclusive quando a
+        # entrada já está vencida e a atualização em segundo plano ainda não terminou/falhou
+        fp = _normalizar_fingerprint(fingerprint_fontes(cfg))
+        entrada.validado_em = agora
+        entrada.desatualizado = fp != entrada.fingerprint
+        return not entrada.desatualizado
+
+    @property
+    def servir_antigo(self) -> bool:
+        return bool(getattr(settings, "RECEITA_PIPELINE_SERVIR_ANTIGO", True))
+
+    def obter(self, cfg: Config) -> Dict[str, "pd.DataFrame"]:
+        chave = _chave_config(cfg)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+        if entrada is not None and self._valida(entrada, cfg, time.time()):
+            with self._lock:
+                self.hits += 1
+            return entrada.dfs
+
+        if entrada is not None and self.servir_antigo:
+            with self._lock:
+                self.antigos += 1
+            self._atualizar_em_segundo_plano(chave, cfg, entrada)
+            return entrada.dfs
+
+        with self._lock:
+            self.misses += 1
+        return self._construir_unico(chave, cfg, entrada, completo=False).dfs
+
+    def _construir_unico(self, chave: str, cfg: Config, anterior: _EntradaCache | None, completo: bool) -> _EntradaCache:
+        """Constrói a entrada da chave; se já há uma construção em andamento, espera por ela."""
+        with self._lock:
+            fut = self._em_construcao.get(chave)
+            dono = fut is None
+            if dono:
+                fut = self._em_construcao[chave] = Future()
+        if not dono:
+            return fut.result()
+        try:
+            nova = self._construir(chave, cfg, anterior, completo)
+            fut.set_result(nova)
+            return nova
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._em_construcao.pop(chave, None)
+
+    def _construir(self, chave: str, cfg: Config, anterior: _EntradaCache | None, completo: bool) -> _EntradaCache:
+        with trava_pipeline() as trava:
+            if trava.esperou and getattr(settings, "RECEITA_USAR_SNAPSHOT", True):
+                # outro processo acabou de ler as fontes: se publicou um snapshot, usa ele
+                snap = carregar_snapshot(cfg)
+                if snap is not None:
+                    agora = time.time()
+                    fp = _normalizar_fingerprint(snap.manifesto.get("fingerprint") or {})
+                    nova = _EntradaCache(dfs=snap, fingerprint=fp, criado_em=agora, validado_em=agora)
+                    with self._lock:
+                        self._entradas[chave] = nova
+                    return nova
+            # refresh incremental só a partir de um PipelineResult (entrada vinda de snapshot lê tudo)
+            previo = anterior.dfs if anterior is not None and isinstance(anterior.dfs, PipelineResult) else None
+            dfs = run_pipeline(cfg, previous=previo)
+            # fingerprint antes da leitura (se a fonte mudar durante o run, a próxima validação
+            # percebe), com as mesmas consultas que as etapas do run vão reaproveitar
+            fp = _normalizar_fingerprint(dfs.fingerprint())
+            # todas as leituras acontecem aqui, sob a trava (como em construir_snapshot)
+            try:
+                dfs.materialize([k for k in dfs if k not in PIPELINE_VIEWS])
+            except Exception:
+                if completo:
+                    # atualização: só troca se calculou tudo (a entrada antiga segue no ar)
+                    raise
+                # 1ª carga: as etapas que deram certo ficam guardadas; as que falharam
+                # levantam a exceção no dfs.get(...) correspondente, como antes
+                pass
+        agora = time.time()
+        nova = _EntradaCache(dfs=dfs, fingerprint=fp, criado_em=agora, validado_em=agora)
+        with self._lock:
+            self._entradas[chave] = nova
+        return nova
+
+    def _atualizar_em_segundo_plano(self, chave: str, cfg: Config, entrada: _EntradaCache) -> None:
+        with self._lock:
+            if chave in self._em_construcao or time.time() < self._proxima_tentativa.get(chave, 0.0):
+                return
+
+        def _rodar():
+            try:
+                self._construir_unico(chave, cfg, entrada, completo=True)
+                with self._lock:
+                    self._proxima_tentativa.pop(chave, None)
+            except Exception:
+                logger.exception("Falha na atualização do pipeline em segundo plano")
+                with self._lock:
+                    self.falhas_atualizacao += 1
+                    self._proxima_tentativa[chave] = time.time() + self.ttl
+
+        threading.Thread(target=_rodar, name=f"receita-atualizacao-{chave[:8]}", daemon=True).start()
+
+    def versao(self, cfg: Config, validar: bool = True) -> Tuple[str, float] | None:
+        """
+        (versão, criado_em) da entrada que obter(cfg) serviria, sem rodar o pipeline: a versão
+        é um hash do fingerprint das fontes. None se ainda não há entrada servível.
+        validar=False: a da entrada guardada como está, sem conferir as fontes nem disparar
+        atualização (leitura passiva, ex.: métricas).
+        """
+        chave = _chave_config(cfg)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        if validar and not self._valida(entrada, cfg, time.time()):
+            if not self.servir_antigo:
+                return None
+            # vencida: segue servindo (e versionando) a antiga enquanto a nova é montada
+            self._atualizar_em_segundo_plano(chave, cfg, entrada)
+        payload = json.dumps(entrada.fingerprint, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16], entrada.criado_em
+
+    def atual(self, cfg: Config) -> Dict[str, "pd.DataFrame"] | None:
+        """Resultado guardado para o Config (válido ou não), sem validar nem construir."""
+        with self._lock:
+            entrada = self._entradas.get(_chave_config(cfg))
+        return entrada.dfs if entrada is not None else None
+
+    def invalidar(self, cfg: Config | None = None) -> None:
+        """Descarta a entrada do Config informado (ou todas)."""
+        with self._lock:
+            if cfg is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(_chave_config(cfg), None)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "antigos": self.antigos,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "entradas": len(self._entradas),
+                "construcoes": len(self._em_construcao),
+                "falhas_atualizacao": self.falhas_atualizacao,
+                "ttl": self.ttl,
+            }
+
+
+_CACHE_PIPELINE = PipelineCache()
+
+
 def carregar_pipeline(cfg: Config) -> Dict[str, "pd.DataFrame"]:
     """
-    Executa seu pipeline e retorna o dicionário de DataFrames.
-    Se der erro (ex.: falta driver do Access), propaga a exceção.
+    Retorna o mapeamento (preguiçoso) de DataFrames do pipeline.
+    Com RECEITA_USAR_SNAPSHOT, usa o snapshot Parquet publicado (manage.py construir_snapshot);
+    sem snapshot, roda o pipeline sobre as fontes via cache do processo. Cada chave é
+    calculada no primeiro acesso; se der erro (ex.: falta driver do Access), a exceção sobe
+    no dfs.get(...) correspondente – erros não são cacheados.
     """
-    return run_pipeline(cfg)
+    if getattr(settings, "RECEITA_USAR_SNAPSHOT", True):
+        snap = carregar_snapshot(cfg)
+        if snap is not None:
+            return snap
+    return _CACHE_PIPELINE.obter(cfg)
+
+
+def versao_dados(cfg: Config, validar: bool = True) -> Tuple[str, float] | None:
+    """
+    (versão, timestamp) dos dados que carregar_pipeline(cfg) devolveria agora – a versão do
+    snapshot publicado ou a da entrada do cache do processo – sem carregar DataFrames.
+    None quando ainda não se sabe (cache vazio/vencido): quem chama deve calcular normalmente.
+    validar=False: a entrada do cache não é revalidada (nem fingerprint nem atualização em
+    segundo plano); devolve a versão da entrada guardada, mesmo vencida.
+    """
+    try:
+        if getattr(settings, "RECEITA_USAR_SNAPSHOT", True):
+            snap = carregar_snapshot(cfg)
+            if snap is not None:
+                gerado_em = snap.manifesto.get("gerado_em")
+                return snap.versao, (datetime.fromisoformat(gerado_em).timestamp() if gerado_em else 0.0)
+        return _CACHE_PIPELINE.versao(cfg, validar=validar)
+    except Exception:
+        return None
+
+
+def resultado_atual(cfg: Config) -> Dict[str, "pd.DataFrame"] | None:
+    """Resultado já disponível (snapshot publicado ou entrada do cache), sem disparar leitura/construção."""
+    if getattr(settings, "RECEITA_USAR_SNAPSHOT", True):
+        snap = carregar_snapshot(cfg)
+        if snap is not None:
+            return snap
+    return _CACHE_PIPELINE.atual(cfg)
+
+
+def invalidar_cache_pipeline(cfg: Config | None = None) -> None:
+    _CACHE_PIPELINE.invalidar(cfg)
+
+
+def estatisticas_cache_pipeline() -> Dict[str, Any]:
+    return _CACHE_PIPELINE.estatisticas()
 
 # --- nomes oficiais de UI que você definiu ---
 CARTEIRAS_UI_OFICIAIS = [
@@ -67,10 +342,15 @@ def _ajustar_carteira_para_interno(valor_ui: str) -> str:
 def _ajustar_carteira_para_ui(valor_dado: str) -> str:
     return DEPARA_EXIBICAO.get(valor_dado, valor_dado)
 
-def listar_carteiras_ui(cfg: "Config") -> list[str]:
+# fontes consultadas por padrão para montar a lista de carteiras
+CHAVES_CARTEIRAS = ("Carteira", "Receita_PoC", "Receita_Produto", "Receita_SuccessFee", "Vendas", "tF_Vendas")
+
+def listar_carteiras_ui(cfg: "Config", chaves: "Tuple[str, ...] | None" = None) -> list[str]:
     """
     Lê carteiras do pipeline, aplica de/para para UI e
     GARANTE presença dos nomes oficiais definidos por você.
+    "chaves" restringe as fontes consultadas (o pipeline é preguiçoso: cada aba
+    passa só as suas, sem disparar as demais leituras).
     """
     try:
         dfs = carregar_pipeline(cfg)
@@ -78,8 +358,12 @@ def listar_carteiras_ui(cfg: "Config") -> list[str]:
         dfs = {}
 
     candidatos = set()
-    for key in ["Carteira", "Receita_PoC", "Receita_Produto", "Receita_SuccessFee", "Vendas", "tF_Vendas_long"]:
-        df = dfs.get(key)
+    for key in (chaves or CHAVES_CARTEIRAS):
+        try:
+            df = dfs.get(key)
+        except Exception:
+            # fonte indisponível (driver/arquivo): segue com as demais
+            continue
         if df is not None and not df.empty:
             col = "Carteira" if "Carteira" in df.columns else ("Check" if "Check" in df.columns else None)
             if col:
@@ -92,103 +376,52 @@ def listar_carteiras_ui(cfg: "Config") -> list[str]:
     extras = sorted([x for x in combinada if x not in CARTEIRAS_UI_OFICIAIS])
     return CARTEIRAS_UI_OFICIAIS + extras
 
-def _aplicar_filtros_basicos(df, mes: str, status: str, carteira: str):
+def _aplicar_filtros_basicos(df, mes: str, status: str, carteira: str, isentos=None):
     """
     Aplica filtros de mês/status/carteira nos DataFrames long ou consolidados.
     - mes: '2025-01'..'2025-12' ou 'tudo'
-    - status: 'Novo'|'Renovação'|'todos' (coluna esperada: classificacao... na base Vendas/long)
-    - carteira: UI label (mapeado p/ interno)
+    - status: 'Novo'|'Renovação'|'todos' (qualquer coluna com "classificacao"/"status" no nome)
+    - carteira: UI label (mapeado p/ interno), comparado com a coluna Check
+    Usa índices por valor montados uma vez por DataFrame (services/filtros.py): passe
+    DataFrames que não serão alterados depois (ex.: partes do cubo). Sem filtro aplicável,
+    devolve o próprio df. isentos: posições que passam em cada filtro (ver FiltroIndexado).
     """
-    import pandas as pd
-
     if df is None or df.empty:
         return df
+    carteira_interno = _ajustar_carteira_para_interno(carteira) if carteira != "todas" else None
+    return filtrar(df, mes, status, carteira_interno, isentos)
 
-    out = df.copy()
-
-    # Mês
-    if "mes_calendario" in out.columns and mes != "tudo":
-        try:
-            y, m = mes.split("-")
-            ini = pd.Timestamp(int(y), int(m), 1)
-            fim = ini + pd.offsets.MonthEnd(0)
-            mask = (pd.to_datetime(out["mes_calendario"], errors="coerce") >= ini) & \
-                   (pd.to_datetime(out["mes_calendario"], errors="coerce") <= fim)
-            out = out[mask]
-        except Exception:
-            pass
-
-    # Status
-    # Em 'Vendas' e no long consolidado, o status costuma ficar em 'classificacaooportunidade__c' ou 'status_frente'
-    if status != "todos":
-        cand_cols = [c for c in out.columns if "classificacao" in c or "status" in c]
-        if cand_cols:
-            mask_any = False
-            mask = None
-            for c in cand_cols:
-                m = out[c].astype(str).str.strip().eq(status)
-                mask = m if mask is None else (mask | m)
-                mask_any = True
-            if mask_any:
-                out = out[mask]
-
-    # Carteira
-    if carteira != "todas":
-        carteira_interno = _ajustar_carteira_para_interno(carteira)
-        if "Check" in out.columns:
-            out = out[out["Check"].astype(str).str.strip().eq(carteira_interno)]
-
-    return out
-
-def calcular_cascata(cfg: Config, mes: str, status: str, carteira: str) -> List[Dict[str, Any]]:
+def calcular_cascata(cfg: Config, mes: str, status: str, carteira: str, dfs: "Dict[str, pd.DataFrame] | None" = None) -> List[Dict[str, Any]]:
     """
     Retorna lista com labels/valores para o gráfico em cascata,
-    somando colunas de interesse do dataframe long (tF_Vendas_long) OU fontes individuais.
+    somando colunas de interesse do consolidado (tF_Vendas) OU fontes individuais.
+    dfs: resultado já carregado (ex.: exportação de todas as abas); por padrão, carregar_pipeline(cfg).
     """
-    import numpy as np
-    import pandas as pd
-
-    dfs = carregar_pipeline(cfg)
-
-    # preferimos o long unificado quando disponível
-    src = dfs.get("tF_Vendas_long")
-    if src is None or src.empty:
-        # fallback: tenta concatenar fontes individuais
-        frames = []
-        for k in ["Receita_PoC", "Receita_Produto", "Receita_SuccessFee", "Estoque", "Pendente_Alocacao_HD", "Meta_Receita", "Vendas"]:
-            if k in dfs:
-                frames.append(dfs[k])
-        src = pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame()
-
-    src = _aplicar_filtros_basicos(src, mes=mes, status=status, carteira=carteira)
-
-    # Se estivermos no formato long (id_vars + Atributo/Valor)
-    if "Atributo" in src.columns and "Valor" in src.columns:
-        pivot = src.pivot_table(index=None, columns="Atributo", values="Valor", aggfunc="sum")
-        # pega valores presentes e default 0 quando não houver
-        poc         = float(pivot.get("ReceitaPoC", 0) or 0)
-        sfee        = float(pivot.get("SuccessFee", 0) or 0)
-        prod        = float(pivot.get("ReceitaProduto", 0) or 0)
-        pend_form   = float(pivot.get("ReceitaPendenteAlocMes", 0) or 0)
-        pend_ass    = float(pivot.get("ReceitaPendenteAssinatura", 0) or 0)  # se existir depois
-        potencial   = float(pivot.get("ReceitaPotencialPocMes", 0) or 0)
-        gap_meta    = float(pivot.get("DifMeta", 0) or 0)
-        total       = float(pivot.get("ReceitaTotal", 0) or (poc + sfee + prod + pend_form + pend_ass + potencial))
-
+    dfs = carregar_pipeline(cfg) if dfs is None else dfs
+
+    # cubo pré-agregado do consolidado (ou das fontes individuais, quando não houver)
+    cubo, consolidado = cubo_receita(dfs).cascata()
+    cubo = _aplicar_filtros_basicos(cubo, mes=mes, status=status, carteira=carteira)
+    somas = cubo.groupby("Atributo")["Valor"].sum() if not cubo.empty else pd.Series(dtype=float)
+
+    def soma(atributo):
+        return float(somas.get(atributo, 0.0))
+
+    poc       = soma("ReceitaPoC")
+    sfee      = soma("SuccessFee")
+    prod      = soma("ReceitaProduto")
+    pend_form = soma("ReceitaPendenteAlocMes")
+    pend_ass  = soma("ReceitaPendenteAssinatura")  # se existir depois
+    potencial = soma("ReceitaPotencialPocMes")
+
+    if consolidado:
+        # total e gap já vêm calculados no tF_Vendas
+        gap_meta = soma("DifMeta")
+        total    = soma("ReceitaTotal") or (poc + sfee + prod + pend_form + pend_ass + potencial)
     else:
         # fallback simplificado (quando só temos colunas separadas)
-        def soma(col):
-            return float(pd.to_numeric(src.get(col), errors="coerce").fillna(0).sum()) if col in src.columns else 0.0
-
-        poc       = soma("ReceitaPoC")
-        sfee      = soma("SuccessFee")
-        prod      = soma("ReceitaProduto")
-        pend_form = soma("ReceitaPendenteAlocMes")
-        pend_ass  = soma("ReceitaPendenteAssinatura")
-        potencial = soma("ReceitaPotencialPocMes")
-        meta      = soma("ReceitaMeta")
-        total     = poc + sfee + prod + pend_form + pend_ass + potencial
-        gap_meta  = meta - total
+        total    = poc + sfee + prod + pend_form + pend_ass + potencial
+        gap_meta = soma("ReceitaMeta") - total
 
     return [
         {"label": "Receita PoC", "valor": round(poc, 2)},
@@ -255,152 +488,109 @@ def _pivot_mensal_2025(df, valor_col: str):
 
     return pivot
 
-def tabela_poc(cfg: "Config", mes: str, status: str, carteira: str):
+# tipo (URL/API) -> (fontes candidatas, coluna de valor) da tabela da aba. Produtos junta
+# Razão (histórico) + Carteira (futuro), como no run_pipeline; as demais usam a 1ª fonte
+# que já traz a coluna de valor.
+FONTES_TABELAS = {
+    "poc": (("Receita_PoC",), "ReceitaPoC"),
+    "success_fee": (("Receita_SuccessFee",), "SuccessFee"),
+    "produtos": (("Receita_Produto", "Carteira_Produto"), "ReceitaProduto"),
+    "pend_formacao": (("Pendente_Alocacao_HD", "tF_Vendas", "Vendas"), "ReceitaPendenteAlocMes"),
+    "pend_assinatura": (("Pendente_Assinatura", "tF_Vendas", "Vendas"), "ReceitaPendenteAssinatura"),
+    "potencial": (("Receita_Potencial", "tF_Vendas", "Vendas"), "ReceitaPotencialPocMes"),
+}
+_FONTES_JUNTAS = {"produtos"}
+
+
+def _fontes_tabela(dfs, tipo: str) -> Tuple[str, ...]:
+    """Chaves do pipeline somadas na tabela da aba; () = sem fonte (tabela vazia)."""
+    fontes, valor_col = FONTES_TABELAS[tipo]
+    if tipo in _FONTES_JUNTAS:
+        return fontes
+    for k in fontes:
+        d = dfs.get(k)
+        if d is not None and valor_col in d.columns:
+            return (k,)
+    return ()
+
+
+def tabelas_filtradas(
+    cfg: "Config", mes: str, status: str, carteira: str,
+    tipos: "Tuple[str, ...] | None" = None, dfs: "Dict[str, pd.DataFrame] | None" = None,
+) -> Dict[str, "pd.DataFrame"]:
     """
-    Tabela de Receita PoC (linhas: Carteira/Cliente/Frente, colunas: meses 2025).
+    Tabelas das abas "tipos" (padrão: todas), linhas Carteira/Cliente/Frente e colunas meses
+    2025 + Total. As partes do cubo das abas são empilhadas (CuboReceita.tabelas) e os filtros
+    aplicados uma única vez, sobre o índice dessa pilha (montado uma vez por resultado).
+    Erros sobem: quem precisa de fallback (páginas) trata.
     """
-    import pandas as pd
+    dfs = carregar_pipeline(cfg) if dfs is None else dfs
+    tipos = tuple(FONTES_TABELAS) if tipos is None else tuple(tipos)
+    partes = tuple((tipo, _fontes_tabela(dfs, tipo), FONTES_TABELAS[tipo][1]) for tipo in tipos)
+    pilha, isentos = cubo_receita(dfs).tabelas(partes)
+    if not pilha.empty:
+        pilha = _aplicar_filtros_basicos(pilha, mes, status, carteira, isentos)
+        pilha = _filtrar_ano_2025(pilha)
+
+    tabelas = {}
+    for tipo, _, valor_col in partes:
+        parte = pilha[pilha["tipo"] == tipo].rename(columns={"Valor": valor_col}) if not pilha.empty else pd.DataFrame()
+        tabelas[tipo] = _pivot_mensal_2025(parte, valor_col)
+    return tabelas
+
+
+def _tabela_aba(tipo: str, cfg: "Config", mes: str, status: str, carteira: str, dfs) -> "pd.DataFrame":
     try:
-        dfs = carregar_pipeline(cfg)
-        df = dfs.get("Receita_PoC")
-        if df is None:
-            return pd.DataFrame()
-        df = _aplicar_filtros_basicos(df, mes, status, carteira)
-        df = _filtrar_ano_2025(df)
-        return _pivot_mensal_2025(df, "ReceitaPoC")  # valor
+        return tabelas_filtradas(cfg, mes, status, carteira, (tipo,), dfs)[tipo]
     except Exception:
-        import traceback; traceback.print_exc()
+        logger.exception("Erro ao montar a tabela %s", tipo)
         return pd.DataFrame()
 
-def tabela_success_fee(cfg: "Config", mes: str, status: str, carteira: str):
-    import pandas as pd
-    try:
-        dfs = carregar_pipeline(cfg)
-        df = dfs.get("Receita_SuccessFee")
-        if df is None:
-            return pd.DataFrame()
-        df = _aplicar_filtros_basicos(df, mes, status, carteira)
-        df = _filtrar_ano_2025(df)
-        return _pivot_mensal_2025(df, "SuccessFee")
-    except Exception:
-        import traceback; traceback.print_exc()
-        return pd.DataFrame()
 
-def tabela_produtos(cfg: "Config", mes: str, status: str, carteira: str):
-    import pandas as pd
-    try:
-        dfs = carregar_pipeline(cfg)
-        # juntar Razão (histórico) + Carteira (futuro) como no run_pipeline
-        df = dfs.get("Receita_Produto")
-        car = dfs.get("Carteira_Produto")
-        import pandas as pd
-        base = pd.concat([df, car], ignore_index=True, sort=False) if df is not None or car is not None else pd.DataFrame()
-        if base is None or base.empty:
-            return pd.DataFrame()
-        base = _aplicar_filtros_basicos(base, mes, status, carteira)
-        base = _filtrar_ano_2025(base)
-        return _pivot_mensal_2025(base, "ReceitaProduto")
-    except Exception:
-        import traceback; traceback.print_exc()
-        return pd.DataFrame()
+def tabela_poc(cfg: "Config", mes: str, status: str, carteira: str, dfs: "Dict[str, pd.DataFrame] | None" = None):
+    """
+    Tabela de Receita PoC (linhas: Carteira/Cliente/Frente, colunas: meses 2025).
+    """
+    return _tabela_aba("poc", cfg, mes, status, carteira, dfs)
+
+def tabela_success_fee(cfg: "Config", mes: str, status: str, carteira: str, dfs: "Dict[str, pd.DataFrame] | None" = None):
+    return _tabela_aba("success_fee", cfg, mes, status, carteira, dfs)
 
+def tabela_produtos(cfg: "Config", mes: str, status: str, carteira: str, dfs: "Dict[str, pd.DataFrame] | None" = None):
+    return _tabela_aba("produtos", cfg, mes, status, carteira, dfs)
 
-def tabela_pendente_formacao(cfg: "Config", mes: str, status: str, carteira: str):
+
+def tabela_pendente_formacao(cfg: "Config", mes: str, status: str, carteira: str, dfs: "Dict[str, pd.DataFrame] | None" = None):
     """
     Tabela de Receita Pendente por Formação de Equipe.
     Entrada esperada: dfs["Pendente_Alocacao_HD"] ou qualquer fonte que já traga a coluna
     "ReceitaPendenteAlocMes" (caso contrário, retorna pivot vazio com a mesma estrutura de meses/Total).
     """
-    import pandas as pd
-    VALOR_COL = "ReceitaPendenteAlocMes"
-    try:
-        dfs = carregar_pipeline(cfg)
-
-        # Procura uma fonte que já tenha a coluna "ReceitaPendenteAlocMes" pronta
-        candidatos = ["Pendente_Alocacao_HD", "tF_Vendas_long", "Vendas"]
-        src = None
-        for k in candidatos:
-            d = dfs.get(k)
-            if d is not None and (VALOR_COL in d.columns):
-                src = d
-                break
+    return _tabela_aba("pend_formacao", cfg, mes, status, carteira, dfs)
 
-        if src is None or src.empty:
-            return _pivot_mensal_2025(pd.DataFrame(), VALOR_COL)
-
-        src = _aplicar_filtros_basicos(src, mes, status, carteira)
-        src = _filtrar_ano_2025(src)
-
-        if VALOR_COL not in src.columns:
-            return _pivot_mensal_2025(pd.DataFrame(), VALOR_COL)
-
-        return _pivot_mensal_2025(src, VALOR_COL)
-    except Exception:
-        traceback.print_exc()
-        return _pivot_mensal_2025(pd.DataFrame(), VALOR_COL)
-
-def tabela_pendente_assinatura(cfg: "Config", mes: str, status: str, carteira: str):
+def tabela_pendente_assinatura(cfg: "Config", mes: str, status: str, carteira: str, dfs: "Dict[str, pd.DataFrame] | None" = None):
     """
     Tabela de Receita Pendente de Assinatura.
     Entrada esperada: uma fonte que já contenha a coluna "ReceitaPendenteAssinatura"
-    (ex.: dfs["Pendente_Assinatura"] ou consolidado explodido). Fallback: pivot vazio.
+    (ex.: dfs["Pendente_Assinatura"] ou o consolidado tF_Vendas). Fallback: pivot vazio.
     """
-    import pandas as pd
-    VALOR_COL = "ReceitaPendenteAssinatura"
-    try:
-        dfs = carregar_pipeline(cfg)
-
-        candidatos = ["Pendente_Assinatura", "tF_Vendas_long", "Vendas"]
-        src = None
-        for k in candidatos:
-            d = dfs.get(k)
-            if d is not None and (VALOR_COL in d.columns):
-                src = d
-                break
-
-        if src is None or src.empty:
-            return _pivot_mensal_2025(pd.DataFrame(), VALOR_COL)
-
-        src = _aplicar_filtros_basicos(src, mes, status, carteira)
-        src = _filtrar_ano_2025(src)
+    return _tabela_aba("pend_assinatura", cfg, mes, status, carteira, dfs)
 
-        if VALOR_COL not in src.columns:
-            return _pivot_mensal_2025(pd.DataFrame(), VALOR_COL)
-
-        return _pivot_mensal_2025(src, VALOR_COL)
-    except Exception:
-        traceback.print_exc()
-        return _pivot_mensal_2025(pd.DataFrame(), VALOR_COL)
-
-def tabela_receita_potencial(cfg: "Config", mes: str, status: str, carteira: str):
+def tabela_receita_potencial(cfg: "Config", mes: str, status: str, carteira: str, dfs: "Dict[str, pd.DataFrame] | None" = None):
     """
     Tabela de Receita Potencial (PoC).
-    Entrada esperada: uma fonte com a coluna "ReceitaPotencialPocMes" (ex.: dfs["tF_Vendas_long"]
-    explodido ou dfs["Receita_Potencial"], se existir). Fallback: pivot vazio.
+    Entrada esperada: uma fonte com a coluna "ReceitaPotencialPocMes" (ex.: dfs["tF_Vendas"]
+    ou dfs["Receita_Potencial"], se existir). Fallback: pivot vazio.
     """
-    import pandas as pd
-    VALOR_COL = "ReceitaPotencialPocMes"
-    try:
-        dfs = carregar_pipeline(cfg)
+    return _tabela_aba("potencial", cfg, mes, status, carteira, dfs)
 
-        candidatos = ["Receita_Potencial", "tF_Vendas_long", "Vendas"]
-        src = None
-        for k in candidatos:
-            d = dfs.get(k)
-            if d is not None and (VALOR_COL in d.columns):
-                src = d
-                break
 
-        if src is None or src.empty:
-            return _pivot_mensal_2025(pd.DataFrame(), VALOR_COL)
-
-        src = _aplicar_filtros_basicos(src, mes, status, carteira)
-        src = _filtrar_ano_2025(src)
-
-        if VALOR_COL not in src.columns:
-            return _pivot_mensal_2025(pd.DataFrame(), VALOR_COL)
-
-        return _pivot_mensal_2025(src, VALOR_COL)
-    except Exception:
-        traceback.print_exc()
-        return _pivot_mensal_2025(pd.DataFrame(), VALOR_COL)
+# tipo (URL/API) -> função da tabela da aba
+TABELAS = {
+    "poc": tabela_poc,
+    "success_fee": tabela_success_fee,
+    "produtos": tabela_produtos,
+    "pend_formacao": tabela_pendente_formacao,
+    "pend_assinatura": tabela_pendente_assinatura,
+    "potencial": tabela_receita_potencial,
+}
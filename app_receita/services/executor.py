@@ -0,0 +1,55 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+import asyncio
+import threading
+
+from django.conf import settings
+
+# Executor limitado das views assíncronas: pipeline/pandas/renderização rodam aqui, fora do
+# event loop. Cancelar a corrotina que espera (cliente desconectou) descarta a tarefa se ela
+# ainda não começou; a que já está rodando termina, mas o resultado é ignorado.
+
+T = TypeVar("T")
+
+WORKERS_PADRAO = 8
+
+_EXECUTOR: ThreadPoolExecutor | None = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            workers = int(getattr(settings, "RECEITA_ASYNC_WORKERS", WORKERS_PADRAO))
+            _EXECUTOR = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="receita-async")
+        return _EXECUTOR
+
+
+async def em_executor(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await asyncio.get_running_loop().run_in_executor(executor(), partial(fn, *args, **kwargs))
+
+
+async def iterar_em_executor(gerador: Iterator[T]) -> AsyncIterator[T]:
+    """Consome um gerador síncrono (ex.: xlsx_streaming) no executor, um item por vez."""
+    fim = object()
+    pendente: Future | None = None
+    try:
+        while True:
+            pendente = executor().submit(next, gerador, fim)
+            item = await asyncio.wrap_future(pendente)
+            if item is fim:
+                return
+            yield item
+    finally:
+        # desconexão (GeneratorExit/CancelledError): fecha o gerador para liberar o que ele
+        # segura – mas só depois que o next() em andamento numa thread do pool terminar
+        # (fechar um gerador em execução levanta ValueError e mascara o cancelamento)
+        close = getattr(gerador, "close", None)
+        if close is not None:
+            if pendente is None:
+                close()
+            else:
+                pendente.add_done_callback(lambda _: close())
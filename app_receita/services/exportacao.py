@@ -0,0 +1,226 @@
+from __future__ import annotations
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator, Sequence, Tuple
+import csv
+import io
+import math
+import numbers
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from app_receita.services.dados import calcular_cascata, carregar_pipeline, tabelas_filtradas
+
+# Exportação em streaming: as linhas saem da tabela já pivotada direto para o arquivo
+# (.xlsx montado como zip em fluxo, ou CSV), em blocos de ~64 KB – sem BytesIO com o
+# arquivo inteiro e sem esperar a serialização terminar para enviar o 1º byte.
+
+# tipo (URL, ver dados.FONTES_TABELAS) -> (nome do arquivo sem extensão, nome da aba em "todas")
+TABELAS_EXPORTACAO = {
+    "poc": ("poc_2025", "PoC"),
+    "success_fee": ("success_fee_2025", "Success Fee"),
+    "produtos": ("produtos_2025", "Produtos"),
+    "pend_formacao": ("pendente_formacao_2025", "Pendente Formação"),
+    "pend_assinatura": ("pendente_assinatura_2025", "Pendente Assinatura"),
+    "potencial": ("receita_potencial_2025", "Receita Potencial"),
+}
+ARQUIVO_TODAS = "receita_2025"
+
+TAMANHO_BLOCO = 64 * 1024
+LIMITE_XLSX = 1_048_575  # linhas de dados numa aba do Excel (+ cabeçalho)
+
+CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def limite_linhas(solicitado: int | None = None) -> int:
+    """Menor entre o pedido (?limite=), settings.RECEITA_EXPORTACAO_MAX_LINHAS e o máximo do Excel."""
+    limite = int(getattr(settings, "RECEITA_EXPORTACAO_MAX_LINHAS", LIMITE_XLSX))
+    if solicitado is not None and solicitado > 0:
+        limite = min(limite, solicitado)
+    return min(limite, LIMITE_XLSX)
+
+
+def linhas_dataframe(df: "pd.DataFrame | None", limite: int | None = None) -> Iterator[Sequence[Any]]:
+    """Cabeçalho + até "limite" linhas de df, geradas uma a uma."""
+    if df is None:
+        return
+    yield [str(c) for c in df.columns]
+    linhas = df.itertuples(index=False, name=None)
+    for i, linha in enumerate(linhas):
+        if limite is not None and i >= limite:
+            break
+        yield linha
+
+
+class _Saida(io.RawIOBase):
+    """Destino não-seekable do zip: acumula o que foi escrito até ser drenado."""
+
+    def __init__(self):
+        self._partes: list[bytes] = []
+        self.tamanho = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._partes.append(bytes(b))
+        self.tamanho += len(b)
+        return len(b)
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        self.tamanho = 0
+        return dados
+
+
+# caracteres de controle não aceitos em XML 1.0
+_XML_INVALIDO = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _celula_xml(valor: Any) -> str:
+    if valor is None or valor is pd.NA or valor is pd.NaT:
+        return "<c/>"
+    if isinstance(valor, (bool, np.bool_)):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, numbers.Integral):
+        return f"<c><v>{int(valor)}</v></c>"
+    if isinstance(valor, numbers.Real):
+        valor = float(valor)
+        return f"<c><v>{valor!r}</v></c>" if math.isfinite(valor) else "<c/>"
+    if isinstance(valor, (datetime, date)):
+        valor = valor.isoformat()
+    texto = _XML_INVALIDO.sub("", str(valor))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _linha_xml(valores: Sequence[Any]) -> str:
+    return "<row>" + "".join(_celula_xml(v) for v in valores) + "</row>"
+
+
+_NS_PLANILHA = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_NS_REL = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+_TIPO_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+
+def _arquivos_fixos(nomes: list[str]) -> Iterator[Tuple[str, str]]:
+    """Partes do pacote .xlsx além das abas (escritas ao final, quando as abas são conhecidas)."""
+    abas_ct = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(nomes) + 1)
+    )
+    yield "[Content_Types].xml", (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        f"{abas_ct}</Types>"
+    )
+    yield "_rels/.rels", (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_TIPO_REL}/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    )
+    abas = "".join(
+        f'<sheet name="{escape(nome, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+        for i, nome in enumerate(nomes, 1)
+    )
+    yield "xl/workbook.xml", (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f"<workbook {_NS_PLANILHA} {_NS_REL}><sheets>{abas}</sheets></workbook>"
+    )
+    rels = "".join(
+        f'<Relationship Id="rId{i}" Type="{_TIPO_REL}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(nomes) + 1)
+    )
+    yield "xl/_rels/workbook.xml.rels", (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>'
+    )
+
+
+def _nome_aba(nome: str, usados: set[str]) -> str:
+    # Excel: até 31 caracteres, sem []:*?/\ e sem repetição
+    base = re.sub(r"[\[\]:*?/\\]", "_", nome)[:31] or "dados"
+    candidato, n = base, 1
+    while candidato.lower() in usados:
+        n += 1
+        candidato = f"{base[:28]}_{n}"
+    usados.add(candidato.lower())
+    return candidato
+
+
+def xlsx_streaming(planilhas: Iterable[Tuple[str, Iterable[Sequence[Any]]]]) -> Iterator[bytes]:
+    """
+    Gera um .xlsx em blocos a partir de (nome da aba, linhas). Cada aba é escrita linha a
+    linha direto no zip (texto inline, sem sharedStrings/estilos): a memória usada não
+    depende do tamanho da exportação.
+    """
+    saida = _Saida()
+    nomes: list[str] = []
+    usados: set[str] = set()
+    with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for nome, linhas in planilhas:
+            nomes.append(_nome_aba(nome, usados))
+            with zf.open(f"xl/worksheets/sheet{len(nomes)}.xml", "w", force_zip64=True) as f:
+                f.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><worksheet {_NS_PLANILHA}><sheetData>'.encode())
+                for linha in linhas:
+                    f.write(_linha_xml(linha).encode("utf-8"))
+                    if saida.tamanho >= TAMANHO_BLOCO:
+                        yield saida.drenar()
+                f.write(b"</sheetData></worksheet>")
+        if not nomes:
+            # pacote precisa de ao menos uma aba
+            nomes.append("dados")
+            zf.writestr("xl/worksheets/sheet1.xml", f"<worksheet {_NS_PLANILHA}><sheetData/></worksheet>")
+        for caminho, conteudo in _arquivos_fixos(nomes):
+            zf.writestr(caminho, conteudo)
+    yield saida.drenar()
+
+
+def planilhas_todas(cfg, mes: str, status: str, carteira: str, limite: int | None = None) -> list[Tuple[str, Iterable[Sequence[Any]]]]:
+    """
+    (aba, linhas) de todas as abas de TABELAS_EXPORTACAO + a cascata, sobre um único
+    carregamento do pipeline e uma única aplicação dos filtros (tabelas_filtradas).
+    Tudo é calculado aqui, antes da resposta: erro de fonte/pipeline vira resposta de erro,
+    não um .xlsx truncado com status 200 – o streaming fica só com a serialização.
+    """
+    dfs = carregar_pipeline(cfg)
+    tabelas = tabelas_filtradas(cfg, mes, status, carteira, tuple(TABELAS_EXPORTACAO), dfs=dfs)
+    cascata = calcular_cascata(cfg, mes, status, carteira, dfs=dfs)
+    planilhas = [(aba, linhas_dataframe(tabelas[tipo], limite)) for tipo, (_, aba) in TABELAS_EXPORTACAO.items()]
+    planilhas.append(("Cascata", [("Indicador", "Valor")] + [(item["label"], item["valor"]) for item in cascata]))
+    return planilhas
+
+
+def _valor_csv(valor: Any) -> Any:
+    if valor is None or valor is pd.NA or valor is pd.NaT:
+        return ""
+    if isinstance(valor, float) and math.isnan(valor):
+        return ""
+    return valor
+
+
+def csv_streaming(linhas: Iterable[Sequence[Any]], delimitador: str = ";") -> Iterator[bytes]:
+    """CSV (UTF-8 com BOM, ";" como os CSVs de entrada) gerado em blocos."""
+    buf = io.StringIO()
+    escritor = csv.writer(buf, delimiter=delimitador)
+    buf.write("﻿")
+    for linha in linhas:
+        escritor.writerow([_valor_csv(v) for v in linha])
+        if buf.tell() >= TAMANHO_BLOCO:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
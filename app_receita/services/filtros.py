@@ -0,0 +1,142 @@
+from __future__ import annotations
+from typing import Dict, Tuple
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# Filtros de mês/status/carteira por índice: para cada DataFrame filtrado, as colunas são
+# tipadas uma única vez (mês como índice inteiro de mês, Check/status como códigos) e as
+# posições das linhas ficam agrupadas por valor. Um filtro vira interseção de posições.
+# Os DataFrames filtrados são tratados como somente leitura (ex.: partes do cubo).
+
+
+def colunas_status(df: "pd.DataFrame") -> list[str]:
+    """Colunas usadas pelo filtro de status (qualquer uma contendo "classificacao"/"status")."""
+    return [c for c in df.columns if "classificacao" in c or "status" in c]
+
+
+def indice_mes(mes: str) -> int | None:
+    """'2025-03' -> índice inteiro do mês (ano*12 + mês-1); None se não for um mês válido."""
+    try:
+        y, m = mes.split("-")
+        ts = pd.Timestamp(int(y), int(m), 1)
+    except Exception:
+        return None
+    return ts.year * 12 + ts.month - 1
+
+
+def _posicoes_por_codigo(codigos: np.ndarray) -> Dict[int, np.ndarray]:
+    """{código: posições (ordenadas) das linhas com o código}; código -1 = sem valor."""
+    ordem = np.argsort(codigos, kind="stable")
+    ordenados = codigos[ordem]
+    valores, inicios = np.unique(ordenados, return_index=True)
+    fins = np.append(inicios[1:], len(ordenados))
+    return {int(v): ordem[i:f] for v, i, f in zip(valores, inicios, fins) if v >= 0}
+
+
+def _indice_texto(col: "pd.Series") -> Dict[str, np.ndarray]:
+    # mesma comparação do filtro original: str(valor).strip() == filtro
+    codigos, valores = pd.factorize(col.astype(str).str.strip())
+    por_codigo = _posicoes_por_codigo(codigos)
+    return {valores[c]: pos for c, pos in por_codigo.items()}
+
+
+def _indice_meses(col: "pd.Series") -> Dict[int, np.ndarray]:
+    """
+    Linha entra no mês M se 1º dia de M <= data <= último dia de M às 00:00 (o limite do
+    filtro original); datas inválidas ou após a 00:00 do último dia não entram em nenhum mês.
+    """
+    vals = pd.to_datetime(col, errors="coerce").to_numpy(dtype="datetime64[ns]")
+    meses = vals.astype("datetime64[M]")
+    ultimo_dia = ((meses + 1).astype("datetime64[D]") - 1).astype("datetime64[ns]")
+    validas = ~np.isnat(vals) & (vals <= ultimo_dia)
+    codigos = np.where(validas, meses.astype(np.int64) + 1970 * 12, -1)
+    return _posicoes_por_codigo(codigos)
+
+
+class FiltroIndexado:
+    """Índices de um DataFrame (não guarda o DataFrame) para filtrar sem varrer as colunas."""
+
+    def __init__(self, df: "pd.DataFrame"):
+        self._n = len(df)
+        self._meses = _indice_meses(df["mes_calendario"]) if "mes_calendario" in df.columns else None
+        self._status = [_indice_texto(df[c]) for c in colunas_status(df)]
+        self._check = _indice_texto(df["Check"]) if "Check" in df.columns else None
+
+    def posicoes(
+        self, mes: str, status: str, carteira_interno: str | None,
+        isentos: Dict[str, np.ndarray] | None = None,
+    ) -> np.ndarray | None:
+        """
+        Posições das linhas que passam nos filtros; None = nenhum filtro se aplica.
+        isentos: {"mes"|"status"|"carteira": posições} que passam naquele filtro de qualquer
+        forma (ex.: linhas de uma parte empilhada que não tem a coluna do filtro).
+        """
+        vazio = np.empty(0, dtype=np.intp)
+        isentos = isentos or {}
+        conjuntos = []
+        if self._meses is not None and mes != "tudo":
+            idx = indice_mes(mes)
+            if idx is not None:  # mês mal formatado: filtro ignorado
+                conjuntos.append(self._uniao([self._meses.get(idx, vazio)], isentos.get("mes")))
+        if status != "todos" and self._status:
+            partes = [ind[status] for ind in self._status if status in ind]
+            conjuntos.append(self._uniao(partes, isentos.get("status")))
+        if carteira_interno is not None and self._check is not None:
+            conjuntos.append(self._uniao([self._check.get(carteira_interno, vazio)], isentos.get("carteira")))
+
+        if not conjuntos:
+            return None
+        # parte do menor conjunto e confere os demais por marcação (O(n), sem ordenar)
+        conjuntos.sort(key=len)
+        pos = conjuntos[0]
+        for outro in conjuntos[1:]:
+            if not len(pos):
+                break
+            marca = np.zeros(self._n, dtype=bool)
+            marca[outro] = True
+            pos = pos[marca[pos]]
+        return pos
+
+    def _uniao(self, partes: list[np.ndarray], extra: np.ndarray | None) -> np.ndarray:
+        partes = [p for p in partes + [extra] if p is not None and len(p)]
+        if len(partes) <= 1:
+            return partes[0] if partes else np.empty(0, dtype=np.intp)
+        marca = np.zeros(self._n, dtype=bool)
+        for p in partes:
+            marca[p] = True
+        return np.flatnonzero(marca)
+
+
+# um índice por DataFrame; sai do registro junto com o DataFrame
+_FILTROS: Dict[int, Tuple["weakref.ref", FiltroIndexado]] = {}
+_FILTROS_LOCK = threading.Lock()
+
+
+def filtro_indexado(df: "pd.DataFrame") -> FiltroIndexado:
+    with _FILTROS_LOCK:
+        ref, filtro = _FILTROS.get(id(df), (None, None))
+        if ref is not None and ref() is df:
+            return filtro
+    filtro = FiltroIndexado(df)
+    with _FILTROS_LOCK:
+        _FILTROS[id(df)] = (weakref.ref(df, lambda _, chave=id(df): _descartar(chave)), filtro)
+    return filtro
+
+
+def filtrar(
+    df: "pd.DataFrame", mes: str, status: str, carteira_interno: str | None,
+    isentos: Dict[str, np.ndarray] | None = None,
+) -> "pd.DataFrame":
+    """Linhas de df que passam nos filtros; sem filtro aplicável devolve o próprio df (sem cópia)."""
+    pos = filtro_indexado(df).posicoes(mes, status, carteira_interno, isentos)
+    return df if pos is None else df.take(pos)
+
+
+def _descartar(chave: int) -> None:
+    with _FILTROS_LOCK:
+        atual = _FILTROS.get(chave)
+        if atual is not None and atual[0]() is None:
+            del _FILTROS[chave]
@@ -0,0 +1,173 @@
+from __future__ import annotations
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+import math
+import threading
+import time
+
+from app_receita.services.dados import (
+    Config,
+    estatisticas_cache_pipeline,
+    resultado_atual,
+    versao_dados,
+)
+from app_receita.services.snapshot import ler_manifesto
+
+# Métricas da camada web no formato texto do Prometheus, coletadas no próprio processo
+# (sem serviço externo). Requisições são medidas pelo MetricasMiddleware; o estado do
+# pipeline (idade dos dados, cache, construções, etapas) é lido na hora do scrape.
+# Com vários workers, cada processo expõe as suas – o Prometheus agrega por instância.
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BUCKETS_TAMANHO = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+def _rotulos_texto(rotulos: Rotulos) -> str:
+    if not rotulos:
+        return ""
+    def esc(v: str) -> str:
+        return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in rotulos) + "}"
+
+
+def _numero(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class Histograma:
+    """Histograma com rótulos (buckets cumulativos na exposição, como o Prometheus espera)."""
+
+    def __init__(self, nome: str, ajuda: str, buckets: Iterable[float]):
+        self.nome, self.ajuda = nome, ajuda
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Rotulos, List[float]] = {}  # contagens por bucket (+Inf no fim), soma
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **rotulos: str) -> None:
+        chave = tuple(sorted(rotulos.items()))
+        i = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [0.0] * (len(self.buckets) + 2)
+            serie[i] += 1
+            serie[-1] += valor
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for rotulos, serie in sorted(series.items()):
+            acumulado = 0.0
+            for limite, n in zip(self.buckets + (math.inf,), serie[:-1]):
+                acumulado += n
+                linhas.append(f"{self.nome}_bucket{_rotulos_texto(rotulos + (('le', _numero(limite)),))} {_numero(acumulado)}")
+            linhas.append(f"{self.nome}_sum{_rotulos_texto(rotulos)} {_numero(serie[-1])}")
+            linhas.append(f"{self.nome}_count{_rotulos_texto(rotulos)} {_numero(acumulado)}")
+        return linhas
+
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, tipo: str = "counter"):
+        self.nome, self.ajuda, self.tipo = nome, ajuda, tipo
+        self._series: Dict[Rotulos, float] = {}
+        self._lock = threading.Lock()
+
+    def somar(self, valor: float = 1.0, **rotulos: str) -> None:
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            self._series[chave] = self._series.get(chave, 0.0) + valor
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        with self._lock:
+            series = dict(self._series)
+        linhas += [f"{self.nome}{_rotulos_texto(r)} {_numero(v)}" for r, v in sorted(series.items())]
+        return linhas
+
+
+LATENCIA = Histograma(
+    "receita_http_request_duration_seconds",
+    "Tempo até a resposta (cabeçalhos) por view/tipo.",
+    BUCKETS_LATENCIA,
+)
+TAMANHO = Histograma(
+    "receita_http_response_size_bytes",
+    "Tamanho do corpo da resposta por view/tipo (streaming: medido ao fim do envio).",
+    BUCKETS_TAMANHO,
+)
+DURACAO_STREAMING = Histograma(
+    "receita_http_stream_duration_seconds",
+    "Tempo total de envio das respostas em streaming (exportações).",
+    BUCKETS_LATENCIA,
+)
+REQUISICOES = Contador("receita_http_requests_total", "Requisições por view/tipo/status.")
+EM_ANDAMENTO = Contador("receita_http_requests_in_progress", "Requisições em andamento.", tipo="gauge")
+
+
+def _gauge(nome: str, ajuda: str, valores: Iterable[Tuple[Rotulos, float]]) -> List[str]:
+    linhas = [f"# HELP {nome} {ajuda}", f"# TYPE {nome} gauge"]
+    linhas += [f"{nome}{_rotulos_texto(r)} {_numero(v)}" for r, v in valores]
+    return linhas
+
+
+def _contador(nome: str, ajuda: str, valor: float) -> List[str]:
+    return [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter", f"{nome} {_numero(valor)}"]
+
+
+def _metricas_pipeline() -> List[str]:
+    cfg = Config()
+    agora = time.time()
+    linhas: List[str] = []
+
+    # passivo: o scrape não revalida o cache (fingerprint) nem dispara atualização
+    versao = versao_dados(cfg, validar=False)
+    linhas += _gauge(
+        "receita_dados_idade_segundos", "Idade dos dados servidos (snapshot ou cache do processo).",
+        [((), agora - versao[1])] if versao else [],
+    )
+    manifesto = ler_manifesto()
+    if manifesto and manifesto.get("gerado_em"):
+        gerado = datetime.fromisoformat(manifesto["gerado_em"]).timestamp()
+        linhas += _gauge("receita_snapshot_idade_segundos", "Idade do snapshot publicado.", [((("versao", manifesto["versao"]),), agora - gerado)])
+
+    cache = estatisticas_cache_pipeline()
+    linhas += _contador("receita_pipeline_cache_hits_total", "Acessos ao cache do pipeline servidos sem reconstruir.", cache["hits"])
+    linhas += _contador("receita_pipeline_cache_misses_total", "Acessos que construíram o pipeline.", cache["misses"])
+    linhas += _contador("receita_pipeline_cache_stale_total", "Acessos servidos com entrada vencida (atualização em segundo plano).", cache["antigos"])
+    linhas += _contador("receita_pipeline_refresh_failures_total", "Falhas de atualização em segundo plano.", cache["falhas_atualizacao"])
+    linhas += _gauge("receita_pipeline_cache_hit_ratio", "hits / (hits + misses) desde o início do processo.", [((), cache["hit_ratio"])])
+    linhas += _gauge("receita_pipeline_builds_in_progress", "Construções do pipeline em andamento no processo.", [((), cache["construcoes"])])
+
+    # última execução de cada etapa: separa "fonte lenta" (leitura) de "pandas lento" (transformação)
+    dfs = resultado_atual(cfg)
+    etapas = dfs.report() if dfs is not None and hasattr(dfs, "report") else []
+    linhas += _gauge(
+        "receita_pipeline_stage_seconds", "Tempo da última execução de cada etapa, por fase (read/transform).",
+        [((("etapa", e["stage"]), ("fase", fase)), e[f"{fase}_s"]) for e in etapas for fase in ("read", "transform")],
+    )
+    linhas += _gauge(
+        "receita_pipeline_stage_rows", "Linhas de saída da última execução de cada etapa.",
+        [((("etapa", e["stage"]),), e["rows_out"]) for e in etapas],
+    )
+    linhas += _gauge(
+        "receita_pipeline_stage_memory_bytes", "Memória do DataFrame de saída de cada etapa.",
+        [((("etapa", e["stage"]),), e["memory_bytes"]) for e in etapas],
+    )
+    return linhas
+
+
+def texto_prometheus() -> str:
+    linhas: List[str] = []
+    for metrica in (REQUISICOES, EM_ANDAMENTO, LATENCIA, TAMANHO, DURACAO_STREAMING):
+        linhas += metrica.exportar()
+    try:
+        linhas += _metricas_pipeline()
+    except Exception as e:
+        linhas += _gauge("receita_metricas_erro", f"Falha ao coletar métricas do pipeline ({type(e).__name__}).", [((), 1)])
+    return "\n".join(linhas) + "\n"
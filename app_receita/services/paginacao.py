@@ -0,0 +1,118 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+import math
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from app_receita.services.dados import TABELAS, carregar_pipeline, tabelas_filtradas
+
+# Paginação das tabelas das abas no servidor: a tabela filtrada/pivotada é calculada uma
+# vez por (resultado do pipeline, aba, filtros) e guardada; cada página é só um recorte
+# (já ordenado) dela, com os totais das colunas calculados sobre a tabela inteira.
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+TABELAS_GUARDADAS = 32  # tabelas filtradas mantidas (LRU)
+
+
+class TabelaPaginada:
+    """Tabela de uma aba já filtrada, com totais e ordenações calculados sob demanda."""
+
+    def __init__(self, df: "pd.DataFrame"):
+        self.df = df.reset_index(drop=True)
+        self._ordens: Dict[Tuple[str, bool], np.ndarray] = {}
+        self._totais: Dict[str, Any] | None = None
+        self._lock = threading.Lock()
+
+    def totais(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._totais is None:
+                self._totais = {
+                    str(c): _valor_json(self.df[c].sum())
+                    for c in self.df.columns
+                    if pd.api.types.is_numeric_dtype(self.df[c]) and not pd.api.types.is_bool_dtype(self.df[c])
+                }
+            return self._totais
+
+    def _ordem(self, coluna: str, decrescente: bool) -> np.ndarray:
+        with self._lock:
+            chave = (coluna, decrescente)
+            if chave not in self._ordens:
+                s = self.df[coluna].reset_index(drop=True)
+                self._ordens[chave] = s.sort_values(ascending=not decrescente, kind="stable", na_position="last").index.to_numpy()
+            return self._ordens[chave]
+
+    def pagina(self, offset: int = 0, limite: int = LIMITE_PADRAO, ordenar: str | None = None, decrescente: bool = False) -> Dict[str, Any]:
+        offset = max(offset, 0)
+        limite = min(max(limite, 1), limite_maximo())
+        if ordenar not in self.df.columns:
+            ordenar, decrescente = None, False
+        if ordenar is None:
+            recorte = self.df.iloc[offset:offset + limite]
+        else:
+            recorte = self.df.take(self._ordem(ordenar, decrescente)[offset:offset + limite])
+        return {
+            "colunas": [str(c) for c in self.df.columns],
+            "linhas": [[_valor_json(v) for v in linha] for linha in recorte.itertuples(index=False, name=None)],
+            "offset": offset,
+            "limite": limite,
+            "total_linhas": len(self.df),
+            "totais": self.totais(),
+            "ordenar": ordenar,
+            "desc": decrescente,
+        }
+
+
+def limite_maximo() -> int:
+    return int(getattr(settings, "RECEITA_API_MAX_LINHAS", LIMITE_MAXIMO))
+
+
+def _valor_json(valor: Any) -> Any:
+    if valor is None or valor is pd.NA or valor is pd.NaT:
+        return None
+    if isinstance(valor, (bool, np.bool_)):
+        return bool(valor)
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    if isinstance(valor, (float, np.floating)):
+        valor = float(valor)
+        return valor if math.isfinite(valor) else None
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    return str(valor)
+
+
+# (id do resultado, tipo, mes, status, carteira) -> (ref fraca do resultado, tabela)
+_TABELAS: "OrderedDict[tuple, Tuple[weakref.ref, TabelaPaginada]]" = OrderedDict()
+_TABELAS_LOCK = threading.Lock()
+
+
+def tabela_paginada(cfg, tipo: str, mes: str, status: str, carteira: str) -> TabelaPaginada:
+    """
+    Tabela filtrada da aba "tipo" (KeyError se o tipo não existir), reaproveitada entre páginas.
+    Erros ao montar a tabela sobem (quem chama decide o fallback) e nada é guardado.
+    """
+    if tipo not in TABELAS:
+        raise KeyError(tipo)
+    dfs = carregar_pipeline(cfg)
+    chave = (id(dfs), tipo, mes, status, carteira)
+    with _TABELAS_LOCK:
+        ref, tabela = _TABELAS.get(chave, (None, None))
+        if ref is not None and ref() is dfs:
+            _TABELAS.move_to_end(chave)
+            return tabela
+    tabela = TabelaPaginada(tabelas_filtradas(cfg, mes, status, carteira, (tipo,), dfs)[tipo])
+    with _TABELAS_LOCK:
+        _TABELAS[chave] = (weakref.ref(dfs), tabela)
+        _TABELAS.move_to_end(chave)
+        # descarta as de resultados já substituídos e, depois, as menos usadas
+        for k in [k for k, (r, _) in _TABELAS.items() if r() is None]:
+            del _TABELAS[k]
+        while len(_TABELAS) > TABELAS_GUARDADAS:
+            _TABELAS.popitem(last=False)
+    return tabela
@@ -0,0 +1,240 @@
+from __future__ import annotations
+from collections.abc import Mapping
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+from django.conf import settings
+
+from basecode import PIPELINE_VIEWS, Config, run_pipeline  # type: ignore
+
+from app_receita.services.trava import trava_pipeline
+
+# Snapshot = uma pasta por versão com um .parquet por DataFrame do pipeline + manifest.json.
+# O arquivo "ATUAL" aponta para a versão publicada (troca atômica via os.replace).
+# Visões derivadas (basecode.PIPELINE_VIEWS, ex.: tF_Vendas_long) não são gravadas: são
+# geradas a partir da base no primeiro acesso.
+FORMATO_SNAPSHOT = 2
+ARQUIVO_PONTEIRO = "ATUAL"
+ARQUIVO_MANIFESTO = "manifest.json"
+
+# campos do Config que não mudam os dados (não invalidam o snapshot)
+_CAMPOS_EXECUCAO = {"pipeline_workers"}
+
+
+def _diretorio_snapshots(diretorio: str | Path | None = None) -> Path:
+    if diretorio is not None:
+        return Path(diretorio)
+    return Path(getattr(settings, "RECEITA_SNAPSHOT_DIR", Path(settings.BASE_DIR) / "snapshots"))
+
+
+def _exigir_pyarrow() -> None:
+    try:
+        import pyarrow  # type: ignore  # noqa: F401
+    except Exception as e:
+        raise RuntimeError(
+            "pyarrow não está instalado. Instale `pip install pyarrow` para gravar/ler snapshots."
+        ) from e
+
+
+def _config_fontes(cfg: Config) -> Dict[str, Any]:
+    return {k: v for k, v in asdict(cfg).items() if k not in _CAMPOS_EXECUCAO}
+
+
+def _mesma_config(manifesto: Dict[str, Any], cfg: Config) -> bool:
+    # o manifesto passou por JSON: compara na mesma representação
+    return manifesto.get("config") == json.loads(json.dumps(_config_fontes(cfg), default=str))
+
+
+def _preparar_parquet(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Colunas object com tipos misturados (ex.: codigo_frente texto/número) não viram Arrow;
+    nesses casos os valores não nulos são gravados como texto.
+    """
+    import pyarrow as pa  # type: ignore
+
+    out = df
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if out is df:
+                out = df.copy()
+            out[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return out
+
+
+def _nome_versao(fp: Dict[str, Any], cfg: Config) -> str:
+    payload = json.dumps({"fp": fp, "cfg": _config_fontes(cfg)}, sort_keys=True, default=str)
+    return datetime.now().strftime("%Y%m%dT%H%M%S") + "-" + hashlib.sha1(payload.encode("utf-8")).hexdigest()[:8]
+
+
+def construir_snapshot(cfg: Config, diretorio: str | Path | None = None, manter: int | None = None) -> Dict[str, Any]:
+    """
+    Executa o pipeline inteiro, grava cada DataFrame em Parquet e publica a nova versão.
+    A pasta é montada como ".tmp-<versao>" e só então renomeada/apontada: leitores nunca
+    enxergam um snapshot pela metade. Devolve o manifesto.
+    A leitura das fontes fica sob a trava "pipeline" (uma leitura completa por vez entre
+    processos).
+    """
+    _exigir_pyarrow()
+    base = _diretorio_snapshots(diretorio)
+    base.mkdir(parents=True, exist_ok=True)
+
+    with trava_pipeline():
+        resultado = run_pipeline(cfg)
+        # fingerprint antes da leitura: se a fonte mudar durante o run, o próximo build percebe
+        # (as etapas reaproveitam as mesmas consultas de COUNT/MAX e metadados)
+        fp = resultado.fingerprint()
+        dfs = resultado.materialize([k for k in resultado if k not in PIPELINE_VIEWS])
+
+    versao = _nome_versao(fp, cfg)
+    tmp = base / f".tmp-{versao}"
+    tmp.mkdir()
+    tabelas: Dict[str, Any] = {}
+    try:
+        for nome, df in dfs.items():
+            arquivo = f"{nome}.parquet"
+            _preparar_parquet(df).to_parquet(tmp / arquivo, index=False)
+            tabelas[nome] = {"arquivo": arquivo, "linhas": int(len(df)), "colunas": [str(c) for c in df.columns]}
+        manifesto = {
+            "formato": FORMATO_SNAPSHOT,
+            "versao": versao,
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "config": _config_fontes(cfg),
+            "fingerprint": fp,
+            "tabelas": tabelas,
+            "visoes": {nome: base for nome, (base, _) in PIPELINE_VIEWS.items() if base in tabelas},
+            "relatorio": resultado.report(),
+        }
+        (tmp / ARQUIVO_MANIFESTO).write_text(json.dumps(manifesto, indent=2, default=str), encoding="utf-8")
+        os.replace(tmp, base / versao)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    _publicar(base, versao)
+    _remover_antigos(base, manter if manter is not None else getattr(settings, "RECEITA_SNAPSHOT_MANTER", 3))
+    return manifesto
+
+
+def _publicar(base: Path, versao: str) -> None:
+    tmp = base / f"{ARQUIVO_PONTEIRO}.tmp"
+    tmp.write_text(versao, encoding="utf-8")
+    os.replace(tmp, base / ARQUIVO_PONTEIRO)
+
+
+def _remover_antigos(base: Path, manter: int) -> None:
+    atual = versao_atual(base)
+    versoes = sorted(p for p in base.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for p in versoes[:-manter] if manter > 0 else []:
+        if p.name != atual:
+            shutil.rmtree(p, ignore_errors=True)
+
+
+def versao_atual(diretorio: str | Path | None = None) -> str | None:
+    try:
+        versao = (_diretorio_snapshots(diretorio) / ARQUIVO_PONTEIRO).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return versao or None
+
+
+def ler_manifesto(versao: str | None = None, diretorio: str | Path | None = None) -> Dict[str, Any] | None:
+    versao = versao or versao_atual(diretorio)
+    if versao is None:
+        return None
+    try:
+        return json.loads((_diretorio_snapshots(diretorio) / versao / ARQUIVO_MANIFESTO).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+class SnapshotResult(Mapping):
+    """
+    DataFrames de um snapshot gravado, com a mesma interface do resultado do pipeline
+    (dfs.get(chave)). Cada Parquet só é lido no primeiro acesso à chave; as visões
+    derivadas são geradas a partir da base também no primeiro acesso.
+    """
+
+    def __init__(self, pasta: Path, manifesto: Dict[str, Any]):
+        self.pasta = pasta
+        self.manifesto = manifesto
+        self.versao: str = manifesto["versao"]
+        self._tabelas: Dict[str, Any] = manifesto["tabelas"]
+        self._visoes: Dict[str, str] = {k: v for k, v in manifesto.get("visoes", {}).items() if k in PIPELINE_VIEWS}
+        self._chaves = list(self._tabelas) + [k for k in self._visoes if k not in self._tabelas]
+        self._cache: Dict[str, "pd.DataFrame"] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> "pd.DataFrame":
+        if key in self._tabelas:
+            with self._lock:
+                df = self._cache.get(key)
+                if df is None:
+                    df = self._cache[key] = pd.read_parquet(self.pasta / self._tabelas[key]["arquivo"])
+                return df
+        if key in self._visoes:
+            base = self[self._visoes[key]]
+            with self._lock:
+                df = self._cache.get(key)
+                if df is None:
+                    df = self._cache[key] = PIPELINE_VIEWS[key][1](base)
+                return df
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._chaves)
+
+    def __len__(self) -> int:
+        return len(self._chaves)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._tabelas or key in self._visoes
+
+    def materialize(self) -> Dict[str, "pd.DataFrame"]:
+        return {k: self[k] for k in self._chaves}
+
+    def report(self) -> list[Dict[str, Any]]:
+        """Relatório das etapas do run que gerou o snapshot (mesmo formato de PipelineResult.report())."""
+        return list(self.manifesto.get("relatorio", []))
+
+
+_CARREGADO: Dict[str, SnapshotResult] = {}
+_CARREGADO_LOCK = threading.Lock()
+
+
+def carregar_snapshot(cfg: Config, diretorio: str | Path | None = None) -> SnapshotResult | None:
+    """
+    Snapshot publicado para este Config (ou None se não houver / pyarrow ausente / Config
+    com outras fontes). A instância fica em memória enquanto a versão publicada não mudar.
+    """
+    base = _diretorio_snapshots(diretorio)
+    versao = versao_atual(base)
+    if versao is None:
+        return None
+    chave = str(base)
+    with _CARREGADO_LOCK:
+        snap = _CARREGADO.get(chave)
+        if snap is not None and snap.versao == versao:
+            return snap if _mesma_config(snap.manifesto, cfg) else None
+    try:
+        _exigir_pyarrow()
+    except RuntimeError:
+        return None
+    manifesto = ler_manifesto(versao, base)
+    if manifesto is None or manifesto.get("formato") != FORMATO_SNAPSHOT:
+        return None
+    snap = SnapshotResult(base / versao, manifesto)
+    with _CARREGADO_LOCK:
+        _CARREGADO[chave] = snap
+    return snap if _mesma_config(manifesto, cfg) else None
@@ -0,0 +1,120 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+# Trava entre processos (workers do servidor, manage.py atualizar_dados...) por arquivo:
+# quem cria o arquivo com O_EXCL é o dono; enquanto mantida, o dono renova o mtime
+# (lease). Arquivo sem renovação há mais que a validade é de um processo que morreu e
+# pode ser tomado.
+
+VALIDADE_PADRAO = 10 * 60  # segundos sem renovação até a trava ser considerada abandonada
+
+
+def _diretorio_travas() -> Path:
+    base = getattr(settings, "RECEITA_TRAVA_DIR", None) or Path(settings.BASE_DIR) / ".travas"
+    return Path(base)
+
+
+class TravaArquivo:
+    """
+    Lease em <RECEITA_TRAVA_DIR>/<nome>.lock. Uso:
+        with TravaArquivo("pipeline") as trava:
+            ...            # trava.esperou: outro processo a detinha quando chegamos
+    """
+
+    def __init__(self, nome: str, validade: float | None = None, intervalo_espera: float = 0.5):
+        self.caminho = _diretorio_travas() / f"{nome}.lock"
+        self.validade = float(validade if validade is not None else getattr(settings, "RECEITA_TRAVA_VALIDADE", VALIDADE_PADRAO))
+        self.intervalo_espera = intervalo_espera
+        self.esperou = False
+        self._token = uuid.uuid4().hex
+        self._parar = threading.Event()
+        self._renovador: threading.Thread | None = None
+
+    def tentar(self) -> bool:
+        """Tenta pegar a trava sem esperar."""
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(self.caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            self._remover_se_abandonada()
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"token": self._token, "pid": os.getpid(), "host": socket.gethostname(), "desde": time.time()}, f)
+        self._parar.clear()
+        self._renovador = threading.Thread(target=self._renovar, name=f"trava-{self.caminho.stem}", daemon=True)
+        self._renovador.start()
+        return True
+
+    def adquirir(self, timeout: float | None = None) -> bool:
+        """Espera pela trava (até "timeout" segundos; None = sem limite)."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while not self.tentar():
+            self.esperou = True
+            if limite is not None and time.monotonic() >= limite:
+                return False
+            time.sleep(self.intervalo_espera)
+        return True
+
+    def liberar(self) -> None:
+        self._parar.set()
+        if self._renovador is not None:
+            self._renovador.join()
+            self._renovador = None
+        if self._dono():
+            try:
+                self.caminho.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> "TravaArquivo":
+        self.adquirir()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.liberar()
+
+    def _renovar(self) -> None:
+        while not self._parar.wait(self.validade / 3):
+            # tomada como abandonada (ex.: processo parado por mais que a validade): o arquivo
+            # agora é de outro dono e não pode ser renovado por este
+            if not self._dono():
+                return
+            try:
+                os.utime(self.caminho)
+            except FileNotFoundError:
+                return
+
+    def _ler_token(self) -> str | None:
+        try:
+            return json.loads(self.caminho.read_text(encoding="utf-8")).get("token")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _dono(self) -> bool:
+        return self._ler_token() == self._token
+
+    def _remover_se_abandonada(self) -> None:
+        try:
+            token = self._ler_token()
+            if time.time() - self.caminho.stat().st_mtime <= self.validade:
+                return
+            # só remove se ainda for a mesma trava abandonada: outro processo pode tê-la
+            # tomado (novo token) ou o dono pode ter renovado entre a leitura e agora
+            if self._ler_token() != token or time.time() - self.caminho.stat().st_mtime <= self.validade:
+                return
+            self.caminho.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def trava_pipeline() -> TravaArquivo:
+    """Trava das leituras completas das fontes (run_pipeline do cache e montagem de snapshot)."""
+    return TravaArquivo("pipeline")
@@ -1,4 +1,9 @@
 from django import template
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+import numpy as np
+import pandas as pd
+
 register = template.Library()
 
 @register.filter
@@ -6,4 +11,67 @@ def get_item(row, colname):
     try:
         return row[colname]
     except Exception:
-        return ""
\ No newline at end of file
+        return ""
+
+
+# ---------- Tabela HTML montada por coluna (sem iterrows/get_item por célula) ----------
+_BRL = str.maketrans({",": ".", ".": ","})
+
+
+def _numerica(s: "pd.Series") -> bool:
+    return pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+
+
+def formatar_brl(valores) -> "pd.Series":
+    """Números no formato 1.234,56 (vazio para NaN/None)."""
+    s = pd.to_numeric(pd.Series(valores), errors="coerce").astype("float64")
+    txt = s.map("{:,.2f}".format, na_action="ignore").str.translate(_BRL)
+    return txt.fillna("").astype(object)
+
+
+def _texto_html(s: "pd.Series") -> "pd.Series":
+    # escapa cada valor distinto uma vez só
+    codigos, valores = pd.factorize(s, use_na_sentinel=True)
+    escapados = np.array([escape(str(v)) for v in valores] + [""], dtype=object)
+    return pd.Series(escapados[codigos], index=s.index, dtype=object)
+
+
+def _celulas(s: "pd.Series") -> "pd.Series":
+    if _numerica(s):
+        return '<td class="text-end">' + formatar_brl(s.to_numpy()).set_axis(s.index) + "</td>"
+    return "<td>" + _texto_html(s) + "</td>"
+
+
+@register.simple_tag
+def tabela_html(df, totais=None):
+    """
+    <thead>/<tbody>/<tfoot> de um DataFrame (ex.: pivot das abas) montados coluna a coluna:
+    números formatados em BRL de uma vez por coluna, textos escapados por valor distinto.
+    totais: {coluna: total} já calculado (ex.: da tabela inteira, quando df é só uma página);
+    sem ele, soma as colunas numéricas de df.
+    """
+    if df is None or len(df.columns) == 0:
+        return ""
+    colunas = [str(c) for c in df.columns]
+    thead = "".join(f'<th data-col="{escape(c)}">{escape(c)}</th>' for c in colunas)
+
+    if len(df):
+        base = df.reset_index(drop=True)
+        linhas = "<tr>" + _celulas(base.iloc[:, 0])
+        for i in range(1, base.shape[1]):
+            linhas = linhas + _celulas(base.iloc[:, i])
+        tbody = "".join((linhas + "</tr>").tolist())
+    else:
+        tbody = ""
+
+    if totais is None:
+        totais = {str(c): df[c].sum() for c in df.columns if _numerica(df[c])}
+    rodape = []
+    for i, c in enumerate(colunas):
+        if c in totais:
+            rodape.append(f'<td class="text-end">{formatar_brl([totais[c]])[0]}</td>')
+        else:
+            rodape.append("<td>Total</td>" if i == 0 else "<td></td>")
+    tfoot = "<tr>" + "".join(rodape) + "</tr>"
+
+    return mark_safe(f"<thead><tr>{thead}</tr></thead><tbody>{tbody}</tbody><tfoot class=\"fw-semibold\">{tfoot}</tfoot>")
@@ -0,0 +1,156 @@
+import re
+import sqlite3
+import threading
+import time
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+from pandas.testing import assert_frame_equal
+
+import basecode  # type: ignore
+from basecode import _AccessPool, _read_access_table, configure_access_pool  # type: ignore
+
+BASE = r"C:\Work\Base\BD_Resultado.accdb"
+
+
+class FakeAccessDriver:
+    """
+    Driver substituto do pyodbc para rodar os leitores Access sem ACE/ODBC.
+    Cada conexão é um sqlite3 em memória carregado com os DataFrames do db_path, o que aceita
+    o SQL gerado pelo basecode ([colchetes], parâmetros "?", COUNT/MAX, "SELECT 1").
+
+        configure_access_pool(driver=FakeAccessDriver({cfg.access_db_resultado: {"tbl_Cotacoes": df}}))
+    """
+
+    def __init__(self, bases: dict[str, dict[str, pd.DataFrame]]):
+        self.bases = bases
+        self.conexoes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, conn_str: str):
+        m = re.search(r"DBQ=([^;]*);", conn_str)
+        db_path = m.group(1) if m else ""
+        if db_path not in self.bases:
+            raise RuntimeError(f"Base Access inexistente no driver fake: {db_path}")
+        con = sqlite3.connect(":memory:", check_same_thread=False)
+        for table_name, df in self.bases[db_path].items():
+            df.to_sql(table_name, con, index=False)
+        with self._lock:
+            self.conexoes += 1
+        return con
+
+
+class AccessPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.driver = FakeAccessDriver({BASE: {"tbl": pd.DataFrame({"x": [1]})}})
+        patcher = mock.patch("basecode._ACCESS_DRIVER", self.driver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pool(self, max_size=2, timeout=5.0) -> _AccessPool:
+        pool = _AccessPool(BASE, max_size, timeout)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_reaproveita_conexao_devolvida(self):
+        pool = self._pool()
+        con = pool.checkout()
+        pool.checkin(con)
+        self.assertIs(pool.checkout(), con)
+        self.assertEqual((pool.criadas, self.driver.conexoes), (1, 1))
+
+    def test_limite_de_conexoes_e_timeout(self):
+        pool = self._pool(max_size=2, timeout=0.2)
+        a, b = pool.checkout(), pool.checkout()
+        self.assertIsNot(a, b)
+
+        inicio = time.monotonic()
+        with self.assertRaisesRegex(RuntimeError, "Timeout aguardando conexão Access"):
+            pool.checkout()
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.2)
+        self.assertEqual(self.driver.conexoes, 2)
+
+    def test_checkout_bloqueado_recebe_a_conexao_devolvida(self):
+        pool = self._pool(max_size=1)
+        con = pool.checkout()
+        recebida = []
+        t = threading.Thread(target=lambda: recebida.append(pool.checkout()))
+        t.start()
+        time.sleep(0.05)
+        self.assertEqual(recebida, [])  # esperando: pool cheio
+        pool.checkin(con)
+        t.join(5)
+        self.assertEqual(recebida, [con])
+        self.assertEqual(pool.criadas, 1)
+
+    def test_falha_do_driver_libera_a_vaga(self):
+        pool = _AccessPool(r"C:\outra.accdb", 1, 0.1)
+        with self.assertRaisesRegex(RuntimeError, "inexistente"):
+            pool.checkout()
+        pool.db_path = BASE
+        pool.checkout()  # a vaga da tentativa que falhou foi devolvida
+        self.assertEqual(pool.criadas, 1)
+        pool.close()
+
+    def test_health_check_de_conexao_ociosa(self):
+        pool = self._pool()
+        saudavel, quebrada = pool.checkout(), pool.checkout()
+        quebrada.close()
+        pool.checkin(quebrada)
+        pool.checkin(saudavel)
+        with mock.patch("basecode.ACCESS_POOL_CHECK_AFTER", 0.0):
+            self.assertIs(pool.checkout(), saudavel)  # passou no SELECT 1
+            nova = pool.checkout()  # a fechada é descartada e substituída
+        self.assertNotIn(nova, (saudavel, quebrada))
+        self.assertEqual((pool.criadas, pool.descartadas), (3, 1))
+
+    def test_conexao_recente_nao_passa_por_health_check(self):
+        pool = self._pool()
+        con = pool.checkout()
+        con.close()
+        pool.checkin(con)
+        self.assertIs(pool.checkout(), con)
+        self.assertEqual(pool.descartadas, 0)
+
+    def test_checkin_suspeita_forca_health_check(self):
+        pool = self._pool()
+        con = pool.checkout()
+        pool.checkin(con, suspeita=True)
+        self.assertIs(pool.checkout(), con)  # saudável: reaproveitada
+
+        con.close()
+        pool.checkin(con, suspeita=True)
+        nova = pool.checkout()
+        self.assertIsNot(nova, con)
+        self.assertEqual((pool.criadas, pool.descartadas), (2, 1))
+
+    def test_close_fecha_as_ociosas(self):
+        pool = self._pool()
+        con = pool.checkout()
+        pool.checkin(con)
+        pool.close()
+        self.assertEqual(pool.descartadas, 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            con.execute("SELECT 1")
+
+
+class LeituraAccessTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(
+            configure_access_pool,
+            max_size=basecode.ACCESS_POOL_MAX_SIZE,
+            timeout=basecode.ACCESS_POOL_TIMEOUT,
+            driver=basecode._ACCESS_DRIVER,
+        )
+
+    def test_le_tabela_pelo_pool_com_filtros(self):
+        df = pd.DataFrame({"Carteira": ["Agronegócio", "Saúde", "Agronegócio"], "Valor": [1.0, 2.0, 3.0]})
+        driver = FakeAccessDriver({BASE: {"tbl_Cotacoes": df}})
+        configure_access_pool(max_size=1, driver=driver)
+
+        lido = _read_access_table(BASE, "tbl_Cotacoes", columns=["Valor"], filters=[("Carteira", "=", "Agronegócio")])
+        assert_frame_equal(lido, pd.DataFrame({"Valor": [1.0, 3.0]}))
+        lido = _read_access_table(BASE, "tbl_Cotacoes", filters=[("Valor", "IN", [2.0, 3.0])])
+        assert_frame_equal(lido, df.iloc[1:].reset_index(drop=True))
+        self.assertEqual(driver.conexoes, 1)  # a segunda leitura reaproveitou a conexão
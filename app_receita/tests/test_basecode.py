@@ -0,0 +1,396 @@
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from basecode import (  # type: ignore
+    _ID_COLS_VENDAS, Config, _alocar_pendente_hd, _classificar_oportunidades, tbl_vendas, tf_estoque,
+    tf_vendas, tf_vendas_long,
+)
+
+# Referências linha a linha: a lógica de antes da vetorização (baseline), mantida aqui
+# só para comparar com a implementação atual sobre fixtures pequenas.
+
+
+def _alocar_linha_a_linha(rec, dim, cur):
+    jd = rec.merge(dim, left_on="codigo_frente", right_on="codigofrente", how="left")
+    tot = jd.groupby("codigo_frente", dropna=False)["QTD_HD"].sum().rename("TotalHD").reset_index()
+    jd = jd.merge(tot, on="codigo_frente", how="left")
+
+    mmin = jd.groupby("codigo_frente", dropna=False)["PER_REF"].min().rename("MinPER").reset_index()
+    jd = jd.merge(mmin, on="codigo_frente", how="left")
+    jd["MesesDeslocar"] = np.where(jd["MinPER"] < cur, (cur.year-jd["MinPER"].dt.year)*12 + (cur.month-jd["MinPER"].dt.month), 0)
+
+    def _calc_row(row):
+        if pd.isna(row["TotalHD"]) or row["TotalHD"] == 0:
+            return pd.Series({"mes_calendario": pd.NaT, "ReceitaPendenteAlocMes": np.nan})
+        valor = row["ReceitaPendAloc"] * (row["QTD_HD"] / row["TotalHD"])
+        mes = (row["PER_REF"] + pd.DateOffset(months=int(row["MesesDeslocar"]))).normalize()
+        return pd.Series({"mes_calendario": mes, "ReceitaPendenteAlocMes": valor})
+
+    out = jd.join(jd.apply(_calc_row, axis=1))
+    out = out[out["mes_calendario"].notna()].copy()
+    out = out[out["mes_calendario"] >= cur].copy()
+    out["mes_calendario"] = out["mes_calendario"].dt.date
+    return out[["Check","mes_calendario","codigo_frente","nome_cliente","ReceitaPendenteAlocMes"]]
+
+
+class AlocacaoPendenteHDTests(SimpleTestCase):
+    cur = pd.Timestamp(2025, 3, 1)
+
+    def _rec(self, frentes):
+        return pd.DataFrame({
+            "Check": [f"Carteira {f}" for f in frentes],
+            "codigo_frente": pd.array(frentes, dtype="Int64"),
+            "nome_cliente": [f"Cliente {f}" for f in frentes],
+            "ReceitaPendAloc": [1000.0 * f for f in frentes],
+        })
+
+    def _dim(self, linhas):
+        frentes, meses, hds = zip(*linhas)
+        return pd.DataFrame({
+            "codigofrente": pd.array(frentes, dtype="Int64"),
+            # como em tbl_pendente_alocacao_hd_v2: mês vazio vira o mês corrente
+            "PER_REF": pd.to_datetime(list(meses)).fillna(self.cur),
+            "QTD_HD": list(hds),
+        })
+
+    def _comparar(self, rec, dim):
+        atual = _alocar_pendente_hd(rec, dim, self.cur)
+        esperado = _alocar_linha_a_linha(rec, dim, self.cur)
+        # o apply linha a linha devolvia a coluna de valor como object
+        esperado["ReceitaPendenteAlocMes"] = esperado["ReceitaPendenteAlocMes"].astype(float)
+        assert_frame_equal(atual, esperado)
+        return atual
+
+    def test_alocacao_parcial_proporcional_ao_hd(self):
+        # frente 1 começa em maio: 2+1+1 HDs, sem deslocamento
+        out = self._comparar(self._rec([1]), self._dim([(1, "2025-05-01", 2), (1, "2025-06-01", 1), (1, "2025-07-01", 1)]))
+        self.assertEqual(out["ReceitaPendenteAlocMes"].tolist(), [500.0, 250.0, 250.0])
+
+    def test_inicio_no_passado_desloca_a_frente_inteira(self):
+        # começa em dezembro (3 meses atrás): todos os meses andam 3, nada fica antes do mês corrente
+        dim = self._dim([(2, "2024-12-01", 1), (2, "2025-01-31", 1), (2, "2025-02-15", 2)])
+        out = self._comparar(self._rec([2]), dim)
+        self.assertEqual([str(d) for d in out["mes_calendario"]], ["2025-03-01", "2025-04-30", "2025-05-15"])
+        self.assertAlmostEqual(out["ReceitaPendenteAlocMes"].sum(), 2000.0)
+
+    def test_frente_esgotada_ou_sem_dimensionamento_nao_aloca(self):
+        # frente 3 com 0 HD e frente 4 sem linhas no dimensionamento; a 5 (mês vazio = mês
+        # corrente) é alocada normalmente
+        dim = self._dim([(3, "2025-04-01", 0), (3, "2025-05-01", 0), (5, "2025-04-01", 1), (5, None, 1)])
+        out = self._comparar(self._rec([3, 4, 5]), dim)
+        self.assertEqual(out["codigo_frente"].tolist(), [5, 5])
+        self.assertEqual(out["ReceitaPendenteAlocMes"].tolist(), [2500.0, 2500.0])
+
+    def test_empates_no_mesmo_mes_e_no_inicio(self):
+        # duas linhas no mesmo mês (empate no mínimo) e frentes diferentes com o mesmo início
+        dim = self._dim([(6, "2025-01-01", 1), (6, "2025-01-01", 1), (6, "2025-02-01", 2), (7, "2025-01-01", 3)])
+        out = self._comparar(self._rec([6, 7]), dim)
+        self.assertEqual(len(out), 4)
+        self.assertEqual(out.groupby("codigo_frente")["ReceitaPendenteAlocMes"].sum().tolist(), [6000.0, 7000.0])
+
+    def test_frentes_misturadas(self):
+        dim = self._dim([
+            (1, "2025-05-01", 2), (1, "2025-06-01", 1), (2, "2024-12-01", 1), (2, "2025-01-31", 1),
+            (3, "2025-04-01", 0), (6, "2025-01-01", 1), (6, "2025-01-01", 1), (8, "2025-03-31", 4),
+        ])
+        rec = self._rec([8, 1, 2, 3, 4, 6])
+        rec.loc[len(rec)] = ["Sem frente", pd.NA, "Cliente ?", 50.0]
+        self._comparar(rec, dim)
+
+
+def _tbl_vendas_linha_a_linha(df):
+    """tbl_vendas de antes da vetorização, a partir da tabela já lida do Access."""
+    df = df.copy()
+    for col in ["Safra", "Data_Entrada_Oport"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    if "Valor_Frente" in df.columns:
+        df["Valor_Frente"] = pd.to_numeric(df["Valor_Frente"], errors="coerce")
+
+    def norm_class(c):
+        if pd.isna(c) or str(c).strip() == "":
+            return None
+        return "Novo" if str(c).strip() == "Novo" else "Renovação"
+
+    if "classificacaooportunidade__c" in df.columns:
+        df["class_norm"] = df["classificacaooportunidade__c"].apply(norm_class)
+    else:
+        df["class_norm"] = None
+
+    if "codigo_frente" in df.columns:
+        cod_raw = pd.to_numeric(df["codigo_frente"], errors="coerce")
+    elif "Frente" in df.columns:
+        cod_raw = pd.to_numeric(df["Frente"], errors="coerce")
+    else:
+        cod_raw = pd.Series(dtype="float64")
+    df["codigo_frente_txt"] = cod_raw.astype("Int64").astype(str) if not cod_raw.empty else ""
+
+    mapa_frente = (
+        df.groupby("codigo_frente_txt")["class_norm"]
+          .apply(lambda s: [x for x in s.dropna().tolist() if x != ""])
+          .reset_index(name="ListaClass")
+    )
+
+    def class_por_frente(lc):
+        if "Renovação" in lc:
+            return "Renovação"
+        if "Novo" in lc:
+            return "Novo"
+        return None
+
+    mapa_frente["class_por_frente"] = mapa_frente["ListaClass"].apply(class_por_frente)
+    mapa_frente = mapa_frente.drop(columns=["ListaClass"])
+    df["prefixo5"] = df["codigo_frente_txt"].astype(str).str[:5]
+    mapa_prefixo = (
+        mapa_frente.assign(prefixo5=mapa_frente["codigo_frente_txt"].astype(str).str[:5])
+        .groupby("prefixo5")["class_por_frente"]
+        .apply(lambda s: [x for x in s.dropna().tolist()])
+        .reset_index(name="Classes")
+    )
+    mapa_prefixo["class_por_prefixo"] = mapa_prefixo["Classes"].apply(lambda cls: "Renovação" if "Renovação" in cls else "Novo")
+    mapa_prefixo = mapa_prefixo.drop(columns=["Classes"])
+    df = df.merge(mapa_frente, on="codigo_frente_txt", how="left").merge(mapa_prefixo, on="prefixo5", how="left")
+
+    def class_final(row):
+        # no pandas 2 as colunas eram object e o vazio chegava como None; no 3 são texto e
+        # chega como NaN: trata os dois como vazio, como o código original esperava
+        for c in (row.get("class_norm"), row.get("class_por_frente"), row.get("class_por_prefixo")):
+            if not (c is None or pd.isna(c) or c == ""):
+                return c
+        return "Novo"
+
+    df["classificacao_final"] = df.apply(class_final, axis=1)
+    if "Status" in df.columns:
+        df = df[df["Status"].isin(["Oficializado", "Vendido"])].copy()
+    if "Safra" in df.columns:
+        df = df[df["Safra"] >= pd.Timestamp(2025, 1, 1)]
+
+    out = pd.DataFrame()
+    out["mes_calendario"] = df["Safra"] if "Safra" in df.columns else pd.NaT
+    out["Check"] = df["CarteiraAtual"] if "CarteiraAtual" in df.columns else None
+    out["status_frente"] = df["Status"] if "Status" in df.columns else None
+    out["classificacaooportunidade__c"] = df["classificacao_final"]
+    out["SomaVendas"] = df["Valor_Frente"] if "Valor_Frente" in df.columns else 0
+    out["mes_calendario"] = pd.to_datetime(out["mes_calendario"], errors="coerce").dt.date
+    return out
+
+
+def _oportunidades() -> "pd.DataFrame":
+    # cliente A: frentes 12345001/12345002 (mesmo prefixo); cliente B: 67890001; produto sem frente
+    return pd.DataFrame({
+        "codigo_frente": [12345001, 12345001, 12345002, 12345002, 67890001, 67890001, 67890002, None, "abc", 55555001],
+        "classificacaooportunidade__c": ["Novo", None, None, "", " Novo ", "Upsell", None, "Renovação", None, np.nan],
+        "Safra": ["2025-02-01", "2025-03-01", None, "2025-04-01", "2025-01-15", "2025-05-01", "2025-06-01",
+                  "2025-02-01", "2024-12-01", "not a date"],
+        "Status": ["Vendido", "Oficializado", "Vendido", "Vendido", "Vendido", "Vendido", "Oficializado",
+                   "Vendido", "Vendido", "Perdido"],
+        "CarteiraAtual": ["MID", "MID", "MID", "MID", "Agronegócio", "Agronegócio", "Agronegócio", "MID", "MID", "MID"],
+        "Valor_Frente": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0],
+    })
+
+
+class ClassificacaoOportunidadesTests(SimpleTestCase):
+    def _vendas(self, df):
+        with mock.patch("basecode._read_access_table", return_value=df):
+            atual = tbl_vendas(Config())
+        assert_frame_equal(atual, _tbl_vendas_linha_a_linha(df))
+        return atual
+
+    def test_primeira_venda_e_renovacao_por_frente_e_prefixo(self):
+        df = _oportunidades()
+        classes = _classificar_oportunidades(df["classificacaooportunidade__c"], pd.to_numeric(df["codigo_frente"], errors="coerce"))
+        self.assertEqual(classes.tolist(), [
+            "Novo", "Novo",            # 12345001: a linha sem classe herda a da frente
+            "Novo", "Novo",            # 12345002 sem classe: prefixo 12345 só tem Novo
+            "Novo", "Renovação",       # 67890001: cada linha mantém a sua
+            "Renovação",               # 67890002 sem classe: prefixo 67890 tem Renovação
+            "Renovação", "Renovação",  # sem frente (None/"abc"): mesmo grupo <NA>
+            "Novo",                    # nada na frente nem no prefixo
+        ])
+
+    def test_tbl_vendas_igual_ao_baseline_com_datas_invalidas(self):
+        out = self._vendas(_oportunidades())
+        # Safra vazia/inválida e anterior a 2025 saem; Perdido também
+        self.assertEqual(out["SomaVendas"].tolist(), [1.0, 2.0, 4.0, 5.0, 6.0, 7.0, 8.0])
+
+    def test_sem_coluna_de_frente_ou_de_classificacao(self):
+        df = _oportunidades()
+        self._vendas(df.drop(columns=["codigo_frente"]))
+        self._vendas(df.drop(columns=["classificacaooportunidade__c"]))
+        self._vendas(df.rename(columns={"codigo_frente": "Frente"}))
+
+
+def _tf_estoque_linha_a_linha(df, tbl_PendenteAlocacao=None):
+    """tf_estoque de antes do cálculo agrupado (um diff por frente), a partir da consulta."""
+    df = df.copy()
+    df["mes_calendario"] = pd.to_datetime(df.get("mes_calendario"), errors="coerce")
+    df = df.sort_values(["codigo_frente", "mes_calendario"])
+    grp_cols = ["Check", "nome_cliente", "codigo_frente", "status_frente", "mes_calendario"]
+    agg = df.groupby(grp_cols, dropna=False).agg(
+        ReceitaRepresadaAc=("valor_represado_acumulado", "sum"),
+        ReceitaRecuperadaAc=("valor_recuperado_acumulado", "sum"),
+    ).reset_index()
+    out_frames = []
+    for cod, sub in agg.groupby("codigo_frente", dropna=False):
+        sub = sub.sort_values("mes_calendario").copy()
+        sub["Estoque.ReceitaRepresadaFinalSaldo"] = sub["ReceitaRepresadaAc"] - sub["ReceitaRecuperadaAc"]
+        sub["Estoque.ReceitaRepresadaFinal"] = sub["Estoque.ReceitaRepresadaFinalSaldo"].diff()
+        if not sub.empty:
+            sub.loc[sub.index[0], "Estoque.ReceitaRepresadaFinal"] = sub.loc[sub.index[0], "Estoque.ReceitaRepresadaFinalSaldo"]
+        out_frames.append(sub)
+    estoque = pd.concat(out_frames, ignore_index=True) if out_frames else agg
+    if tbl_PendenteAlocacao is not None and not tbl_PendenteAlocacao.empty:
+        estoque = pd.concat([estoque, tbl_PendenteAlocacao], ignore_index=True, sort=False)
+    estoque["mes_calendario"] = pd.to_datetime(estoque["mes_calendario"], errors="coerce").dt.date
+    for c in ["Estoque.ReceitaRepresadaFinalSaldo", "Estoque.ReceitaRepresadaFinal"]:
+        if c in estoque.columns:
+            estoque[c] = pd.to_numeric(estoque[c], errors="coerce").fillna(0.0)
+    return estoque
+
+
+def _fonte_geral() -> "pd.DataFrame":
+    linhas = [
+        # frente, mês, represado acumulado, recuperado acumulado (fora de ordem, meses repetidos)
+        (101, "2025-03-01", 300.0, 50.0),
+        (101, "2025-01-01", 100.0, 0.0),
+        (101, "2025-02-01", 150.0, 20.0),
+        (101, "2025-02-01", 50.0, 0.0),
+        (202, "2025-02-01", 80.0, 100.0),
+        (303, "2025-01-01", 10.0, 0.0),
+        (303, None, 5.0, 0.0),
+        (None, "2025-01-01", 7.0, 1.0),
+        (None, "2025-02-01", 9.0, 1.0),
+    ]
+    frentes, meses, rep, rec = zip(*linhas)
+    return pd.DataFrame({
+        "Check": ["MID"] * len(linhas),
+        "nome_cliente": ["Cliente"] * len(linhas),
+        "codigo_frente": pd.array(frentes, dtype="Int64"),
+        "status_frente": ["Em andamento"] * len(linhas),
+        "mes_calendario": list(meses),
+        "valor_represado_acumulado": list(rep),
+        "valor_recuperado_acumulado": list(rec),
+    })
+
+
+class EstoqueTests(SimpleTestCase):
+    def _estoque(self, fonte, pendente=None):
+        with mock.patch("basecode._read_bigquery_sql", return_value=fonte):
+            atual = tf_estoque(Config(), pendente)
+        assert_frame_equal(atual, _tf_estoque_linha_a_linha(fonte, pendente))
+        return atual
+
+    def test_deltas_por_frente_e_primeira_linha_com_o_saldo(self):
+        out = self._estoque(_fonte_geral())
+        f101 = out[out["codigo_frente"] == 101]
+        self.assertEqual(f101["Estoque.ReceitaRepresadaFinalSaldo"].tolist(), [100.0, 180.0, 250.0])
+        self.assertEqual(f101["Estoque.ReceitaRepresadaFinal"].tolist(), [100.0, 80.0, 70.0])
+        # 1ª linha de cada frente recebe o saldo, não a diferença para a frente anterior
+        f202 = out[out["codigo_frente"] == 202]
+        self.assertEqual(f202["Estoque.ReceitaRepresadaFinal"].tolist(), [-20.0])
+        f303 = out[out["codigo_frente"] == 303]
+        self.assertEqual(f303["Estoque.ReceitaRepresadaFinal"].tolist(), [10.0, -5.0])  # mês vazio por último
+        sem_frente = out[out["codigo_frente"].isna()]
+        self.assertEqual(sem_frente["Estoque.ReceitaRepresadaFinal"].tolist(), [6.0, 2.0])
+
+    def test_com_pendente_de_alocacao_anexado(self):
+        pendente = pd.DataFrame({
+            "Check": ["MID"], "mes_calendario": ["2025-04-01"], "codigo_frente": pd.array([404], dtype="Int64"),
+            "nome_cliente": ["Cliente"], "ReceitaPendenteAlocMes": [12.5],
+        })
+        out = self._estoque(_fonte_geral(), pendente)
+        self.assertEqual(out.iloc[-1]["Estoque.ReceitaRepresadaFinal"], 0.0)
+
+    def test_uma_frente_so(self):
+        fonte = _fonte_geral()
+        self._estoque(fonte[fonte["codigo_frente"] == 101].reset_index(drop=True))
+
+
+def _tf_vendas_long_original(pecas):
+    """Long do tf_vendas antes do wide: melt de todas as colunas não-dimensão, zeros inclusive."""
+    combined = pd.concat(pecas, ignore_index=True, sort=False)
+    for c in ["ReceitaPoC", "ReceitaMeta", "ReceitaPendenteAlocMes", "SomaVendas", "SuccessFee", "ReceitaProduto"]:
+        if c in combined.columns:
+            combined[c] = pd.to_numeric(combined[c], errors="coerce").fillna(0.0)
+    combined["ReceitaTotal"] = combined.get("ReceitaPoC", 0) + combined.get("ReceitaPendenteAlocMes", 0) + \
+                               combined.get("Estoque.ReceitaRepresadaFinal", 0) + combined.get("ReceitaPotencialPocMes", 0) + \
+                               combined.get("SuccessFee", 0) + combined.get("ReceitaProduto", 0)
+    combined["DifMeta"] = combined.get("ReceitaMeta", 0) - combined["ReceitaTotal"]
+
+    id_cols = [c for c in ["Check", "mes_calendario", "codigo_frente", "nome_cliente", "status_frente"] if c in combined.columns]
+    value_cols = [c for c in combined.columns if c not in id_cols]
+    long_df = combined.melt(id_vars=id_cols, value_vars=value_cols, var_name="Atributo", value_name="Valor")
+    if "mes_calendario" in long_df.columns:
+        long_df["mes_calendario"] = pd.to_datetime(long_df["mes_calendario"], errors="coerce").dt.date
+    if "codigo_frente" in long_df.columns:
+        long_df["codigo_frente"] = pd.to_numeric(long_df["codigo_frente"], errors="coerce").astype("Int64")
+    return long_df
+
+
+def _pecas_vendas() -> dict:
+    meta = pd.DataFrame({
+        "Check": ["Agronegócio", "Saúde"],
+        "mes_calendario": ["2025-03-01", "2025-04-01"],
+        "ReceitaMeta": [1000.0, 500.0],
+    })
+    poc = pd.DataFrame({
+        "Check": ["Agronegócio", "Agronegócio", "Saúde", "Saúde"],
+        "mes_calendario": ["2025-03-01", "2025-03-01", "2025-04-01", "data inválida"],
+        "codigo_frente": ["10", "11", "A-12", None],
+        "nome_cliente": ["Cliente A", "Cliente B", "Cliente C", None],
+        "status_frente": ["Ganho", None, "Projeto em Risco", "Ganho"],
+        "ReceitaPoC": [150.0, 0.0, np.nan, 30.0],
+    })
+    vendas = pd.DataFrame({
+        "Check": ["Agronegócio", "Saúde"],
+        "mes_calendario": ["2025-03-15", "2025-04-01"],
+        "codigo_frente": ["10", "12"],
+        "nome_cliente": ["Cliente A", "Cliente C"],
+        "classificacaooportunidade__c": ["Novo", "Renovação"],
+        "SomaVendas": [80.0, 0.0],
+    })
+    # na ordem em que o tf_vendas empilha as peças
+    return {"tD_Meta": meta, "tbl_Vendas_df": vendas, "tF_ReceitaPoC_df": poc}
+
+
+class TfVendasLongTests(SimpleTestCase):
+    def setUp(self):
+        pecas = _pecas_vendas()
+        self.wide = tf_vendas(Config(), **pecas)
+        self.novo = tf_vendas_long(self.wide)
+        # o original tinha a classificação como Atributo (texto); no wide ela é dimensão
+        original = _tf_vendas_long_original(list(pecas.values()))
+        original = original[original["Atributo"] != "classificacaooportunidade__c"].copy()
+        original["Valor"] = pd.to_numeric(original["Valor"], errors="coerce").astype(np.float64)
+        original["mes_calendario"] = pd.to_datetime(original["mes_calendario"]).astype(self.wide["mes_calendario"].dtype)
+        self.original = original
+
+    def test_tipos_do_wide_e_do_long(self):
+        self.assertEqual(self.wide["mes_calendario"].dtype.kind, "M")
+        self.assertEqual(str(self.wide["codigo_frente"].dtype), "Int64")
+        for c in ("Check", "nome_cliente", "status_frente", "classificacaooportunidade__c"):
+            self.assertIsInstance(self.wide[c].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(self.novo["Atributo"].dtype, pd.CategoricalDtype)
+        self.assertEqual(self.novo["Valor"].dtype, np.float64)
+
+    def test_igual_ao_long_original_sem_zeros(self):
+        esperado = self.original[(self.original["Valor"] != 0) & self.original["Valor"].notna()]
+        colunas = _ID_COLS_VENDAS + ["Atributo", "Valor"]
+        obtido = self.novo[colunas].astype({c: object for c in ("Check", "nome_cliente", "status_frente", "Atributo")})
+        esperado = esperado[colunas].astype({c: object for c in ("Check", "nome_cliente", "status_frente", "Atributo")})
+        assert_frame_equal(obtido.reset_index(drop=True), esperado.reset_index(drop=True), check_dtype=False)
+        self.assertTrue(self.novo["Valor"].ne(0).all())
+
+    def test_mesmas_somas_por_chave(self):
+        chaves = ["Check", "mes_calendario", "codigo_frente", "Atributo"]
+
+        def somas(df):
+            df = df.astype({"Check": object, "Atributo": object})
+            return df.groupby(chaves, dropna=False)["Valor"].sum().loc[lambda s: s != 0].sort_index()
+
+        assert_series_equal(somas(self.novo), somas(self.original), check_index_type=False)
+        self.assertEqual(set(self.novo["Atributo"]), set(self.original.loc[self.original["Valor"].fillna(0) != 0, "Atributo"]))
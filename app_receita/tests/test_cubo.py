@@ -0,0 +1,40 @@
+import pandas as pd
+from django.test import SimpleTestCase
+
+from basecode import Config
+from app_receita.services.dados import calcular_cascata
+
+
+class _Resultado(dict):
+    """Resultado do pipeline em memória (o cubo guarda referência fraca ao resultado)."""
+
+
+def _tf_vendas() -> "pd.DataFrame":
+    return pd.DataFrame({
+        "Check": ["MID", "MID", "MID"],
+        "mes_calendario": pd.to_datetime(["2025-03-01", "2025-03-01", "2025-04-01"]),
+        "status_frente": pd.Categorical(["Projeto em Risco", None, None]),
+        "classificacaooportunidade__c": pd.Categorical([None, "Novo", "Renovação"]),
+        "ReceitaPoC": [100.0, 10.0, 1.0],
+        "ReceitaTotal": [100.0, 10.0, 1.0],
+        "DifMeta": [0.0, 0.0, 0.0],
+    })
+
+
+class CascataStatusTests(SimpleTestCase):
+    def _poc(self, dfs, mes="tudo", status="todos"):
+        return calcular_cascata(Config(), mes, status, "todas", dfs=dfs)[0]["valor"]
+
+    def test_consolidado_filtra_status_so_por_status_frente(self):
+        dfs = _Resultado(tF_Vendas=_tf_vendas())
+        self.assertEqual(self._poc(dfs), 111.0)
+        self.assertEqual(self._poc(dfs, status="Projeto em Risco"), 100.0)
+        # a classificação Novo/Renovação é dimensão do wide, mas não entra no filtro de status
+        self.assertEqual(self._poc(dfs, status="Novo"), 0.0)
+        self.assertEqual(self._poc(dfs, mes="2025-03", status="Projeto em Risco"), 100.0)
+
+    def test_fontes_individuais_filtram_por_classificacao(self):
+        vendas = _tf_vendas().drop(columns=["ReceitaTotal", "DifMeta"])
+        dfs = _Resultado(Receita_PoC=vendas)
+        self.assertEqual(self._poc(dfs, status="Novo"), 10.0)
+        self.assertEqual(self._poc(dfs, status="Renovação"), 1.0)
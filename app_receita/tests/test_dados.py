@@ -0,0 +1,269 @@
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase, override_settings
+from pandas.testing import assert_frame_equal
+
+from basecode import Config, tf_vendas, tf_vendas_long  # type: ignore
+
+from app_receita.services.cubo import DIMENSOES_TABELA
+from app_receita.services.dados import (
+    FONTES_TABELAS,
+    PipelineCache,
+    _fontes_tabela,
+    _pivot_mensal_2025,
+    listar_carteiras_ui,
+    tabelas_filtradas,
+)
+
+
+class _ResultadoFalso(dict):
+    """Resultado do pipeline em memória, com o fingerprint das fontes no momento do run."""
+
+    def __init__(self, fp):
+        super().__init__({"Carteira": pd.DataFrame({"Check": ["Agronegócio"]})})
+        self.fp = fp
+
+    def fingerprint(self):
+        return self.fp
+
+    def materialize(self, keys):
+        return {k: self[k] for k in keys}
+
+
+class PipelineCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ajustes = override_settings(
+            RECEITA_TRAVA_DIR=tmp.name, RECEITA_USAR_SNAPSHOT=False, RECEITA_PIPELINE_SERVIR_ANTIGO=False,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        # fontes: arquivos (stat a cada acesso) e Access (só no fingerprint completo)
+        self.fontes = {"arquivos": {"Carteira.csv": [1, 100]}, "access": {"tbl": [10, "2025-03-01"]}}
+        self.cfg = Config()
+
+        def fingerprint_fontes(cfg, completo=True):
+            return dict(self.fontes) if completo else {"arquivos": self.fontes["arquivos"]}
+
+        def run_pipeline(cfg, previous=None):
+            return _ResultadoFalso(fingerprint_fontes(cfg))
+
+        for alvo, efeito in (("fingerprint_fontes", fingerprint_fontes), ("run_pipeline", run_pipeline)):
+            patcher = mock.patch(f"app_receita.services.dados.{alvo}", side_effect=efeito)
+            setattr(self, alvo, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def _completos(self) -> int:
+        return sum(1 for c in self.fingerprint_fontes.call_args_list if c.kwargs.get("completo", True))
+
+    def test_miss_e_hit(self):
+        cache = PipelineCache(ttl=60)
+        primeiro = cache.obter(self.cfg)
+        self.assertIs(cache.obter(self.cfg), primeiro)
+        self.assertEqual(self.run_pipeline.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.estatisticas()["hit_ratio"], 0.5)
+
+    def test_config_diferente_tem_entrada_propria(self):
+        cache = PipelineCache(ttl=60)
+        a = cache.obter(self.cfg)
+        b = cache.obter(Config(csv_carteira="/outra/Carteira.csv"))
+        self.assertIsNot(a, b)
+        self.assertEqual(cache.estatisticas()["entradas"], 2)
+
+    def test_arquivo_alterado_invalida_sem_esperar_o_ttl(self):
+        cache = PipelineCache(ttl=60)
+        antigo = cache.obter(self.cfg)
+        self.fontes["arquivos"] = {"Carteira.csv": [2, 120]}
+        self.assertIsNot(cache.obter(self.cfg), antigo)
+        self.assertEqual(self.run_pipeline.call_count, 2)
+        self.assertEqual(self._completos(), 0)  # dentro do TTL a validação é só stat
+
+    def test_ttl_vencido_revalida_pelo_fingerprint_completo(self):
+        cache = PipelineCache(ttl=0)
+        primeiro = cache.obter(self.cfg)
+        self.assertIs(cache.obter(self.cfg), primeiro)  # Access igual: revalidada
+        self.assertEqual(self.run_pipeline.call_count, 1)
+
+        self.fontes["access"] = {"tbl": [11, "2025-04-01"]}
+        self.assertIsNot(cache.obter(self.cfg), primeiro)
+        self.assertEqual(self.run_pipeline.call_count, 2)
+
+    def test_invalidar(self):
+        cache = PipelineCache(ttl=60)
+        primeiro = cache.obter(self.cfg)
+        cache.invalidar(self.cfg)
+        self.assertIsNone(cache.atual(self.cfg))
+        self.assertIsNot(cache.obter(self.cfg), primeiro)
+        cache.invalidar()
+        self.assertEqual(cache.estatisticas()["entradas"], 0)
+
+    def test_versao_muda_com_as_fontes(self):
+        cache = PipelineCache(ttl=60)
+        self.assertIsNone(cache.versao(self.cfg))  # não constrói
+        self.assertEqual(self.run_pipeline.call_count, 0)
+        cache.obter(self.cfg)
+        versao, _ = cache.versao(self.cfg)
+        self.assertEqual(cache.versao(self.cfg)[0], versao)
+        self.fontes["arquivos"] = {"Carteira.csv": [2, 120]}
+        self.assertIsNone(cache.versao(self.cfg))  # sem servir antigo: ainda não há versão servível
+
+    def test_versao_sem_validar_nao_confere_as_fontes(self):
+        cache = PipelineCache(ttl=0)
+        self.assertIsNone(cache.versao(self.cfg, validar=False))
+        cache.obter(self.cfg)
+        versao = cache.versao(self.cfg)
+        self.fontes["arquivos"] = {"Carteira.csv": [2, 120]}
+        chamadas = self.fingerprint_fontes.call_count
+        self.assertEqual(cache.versao(self.cfg, validar=False), versao)  # a da entrada guardada
+        self.assertEqual(self.fingerprint_fontes.call_count, chamadas)
+        self.assertEqual(self.run_pipeline.call_count, 1)
+
+    @override_settings(RECEITA_PIPELINE_SERVIR_ANTIGO=True)
+    def test_servir_antigo_enquanto_atualiza_em_segundo_plano(self):
+        cache = PipelineCache(ttl=60)
+        antigo = cache.obter(self.cfg)
+        self.fontes["arquivos"] = {"Carteira.csv": [2, 120]}
+        self.assertIs(cache.obter(self.cfg), antigo)
+        self.assertEqual(cache.antigos, 1)
+
+        prazo = time.monotonic() + 5
+        while cache.atual(self.cfg) is antigo and time.monotonic() < prazo:
+            time.sleep(0.01)
+        novo = cache.atual(self.cfg)
+        self.assertIsNot(novo, antigo)
+        self.assertIs(cache.obter(self.cfg), novo)
+
+    def test_single_flight_no_processo(self):
+        cache = PipelineCache(ttl=60)
+        liberar = threading.Event()
+        construir = self.run_pipeline.side_effect
+
+        def run_pipeline_lento(cfg, previous=None):
+            liberar.wait(5)
+            return construir(cfg, previous)
+
+        self.run_pipeline.side_effect = run_pipeline_lento
+        resultados = []
+        threads = [threading.Thread(target=lambda: resultados.append(cache.obter(self.cfg))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        prazo = time.monotonic() + 5
+        while cache.misses < 8 and time.monotonic() < prazo:
+            time.sleep(0.01)
+        self.assertEqual(cache.estatisticas()["construcoes"], 1)
+        liberar.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(self.run_pipeline.call_count, 1)
+        self.assertEqual(len(resultados), 8)
+        self.assertTrue(all(r is resultados[0] for r in resultados))
+        self.assertEqual(cache.estatisticas()["construcoes"], 0)
+
+    def test_falha_nao_fica_cacheada(self):
+        cache = PipelineCache(ttl=60)
+        construir = self.run_pipeline.side_effect
+        self.run_pipeline.side_effect = RuntimeError("Access indisponível")
+        with self.assertRaises(RuntimeError):
+            cache.obter(self.cfg)
+        self.assertIsNone(cache.atual(self.cfg))
+        self.run_pipeline.side_effect = construir
+        self.assertIsNotNone(cache.obter(self.cfg))
+
+    @override_settings(RECEITA_USAR_SNAPSHOT=True)
+    def test_quem_esperou_a_trava_usa_o_snapshot_publicado(self):
+        snap = SimpleNamespace(manifesto={"fingerprint": self.fontes})
+
+        @contextmanager
+        def trava_de_outro_processo():
+            yield SimpleNamespace(esperou=True)
+
+        cache = PipelineCache(ttl=0)
+        with mock.patch("app_receita.services.dados.trava_pipeline", trava_de_outro_processo), \
+                mock.patch("app_receita.services.dados.carregar_snapshot", return_value=snap):
+            self.assertIs(cache.obter(self.cfg), snap)
+        self.assertEqual(self.run_pipeline.call_count, 0)
+        # a entrada guarda o fingerprint do snapshot: revalida sem reconstruir
+        self.assertIs(cache.obter(self.cfg), snap)
+        self.assertEqual(cache.hits, 1)
+
+
+class _Resultado(dict):
+    """Resultado do pipeline em memória (o cubo guarda referência fraca ao resultado)."""
+
+
+def _consolidado() -> "pd.DataFrame":
+    pendente = pd.DataFrame({
+        "Check": ["Agronegócio", "Falconi EUA", "Agronegócio"],
+        "mes_calendario": ["2025-03-01", "2025-03-10", "2025-05-01"],
+        "codigo_frente": ["10", "11", "10"],
+        "nome_cliente": ["Cliente A", "Cliente B", "Cliente A"],
+        "status_frente": ["Ganho", "Ganho", "Projeto em Risco"],
+        "ReceitaPendenteAlocMes": [100.0, 40.0, 0.0],
+        "ReceitaPotencialPocMes": [0.0, 5.0, 7.5],
+        "ReceitaPendenteAssinatura": [12.0, None, 3.0],
+    })
+    vendas = pd.DataFrame({
+        "Check": ["Agronegócio"],
+        "mes_calendario": ["2025-03-01"],
+        "codigo_frente": ["10"],
+        "nome_cliente": ["Cliente A"],
+        "classificacaooportunidade__c": ["Novo"],
+        "SomaVendas": [80.0],
+    })
+    return tf_vendas(Config(), tbl_PendenteAlocacao_HD=pendente, tbl_Vendas_df=vendas)
+
+
+class TabelasDoConsolidadoTests(SimpleTestCase):
+    TIPOS = ("pend_formacao", "pend_assinatura", "potencial")
+
+    def setUp(self):
+        self.wide = _consolidado()
+        self.dfs = _Resultado(tF_Vendas=self.wide, Vendas=pd.DataFrame({"Check": ["Agronegócio"], "SomaVendas": [80.0]}))
+
+    def test_abas_usam_o_tf_vendas_com_as_colunas_esperadas(self):
+        for tipo in self.TIPOS:
+            with self.subTest(tipo=tipo):
+                self.assertEqual(_fontes_tabela(self.dfs, tipo), ("tF_Vendas",))
+                valor_col = FONTES_TABELAS[tipo][1]
+                for c in DIMENSOES_TABELA + ("mes_calendario", valor_col):
+                    self.assertIn(c, self.wide.columns)
+
+    def test_tabelas_iguais_as_do_long_explodido(self):
+        # referência: a medida lida do long (Atributo/Valor), como um consumidor legado faria
+        long_df = tf_vendas_long(self.wide)
+        for carteira in ("todas", "Agronegócio", "América do Norte"):
+            tabelas = tabelas_filtradas(Config(), "tudo", "todos", carteira, self.TIPOS, dfs=self.dfs)
+            for tipo in self.TIPOS:
+                with self.subTest(carteira=carteira, tipo=tipo):
+                    valor_col = FONTES_TABELAS[tipo][1]
+                    explodido = long_df[long_df["Atributo"] == valor_col].rename(columns={"Valor": valor_col})
+                    if carteira != "todas":
+                        interno = {"América do Norte": "Falconi EUA"}.get(carteira, carteira)
+                        explodido = explodido[explodido["Check"] == interno]
+                    esperado = _pivot_mensal_2025(explodido, valor_col)
+                    obtido = tabelas[tipo]
+                    self.assertFalse(obtido.empty)
+                    # o long descarta linhas sem a medida; na tabela elas aparecem zeradas
+                    zeradas = obtido["Total"].eq(0)
+                    self.assertTrue(obtido.loc[zeradas].drop(columns=["Carteira", "Cliente", "Frente"]).eq(0).all().all())
+                    obtido = obtido.loc[~zeradas]
+                    assert_frame_equal(
+                        obtido.reset_index(drop=True), esperado.reset_index(drop=True),
+                        check_dtype=False, check_categorical=False, check_column_type=False, check_names=False,
+                    )
+
+    def test_carteiras_lidas_do_tf_vendas(self):
+        with mock.patch("app_receita.services.dados.carregar_pipeline", return_value=self.dfs):
+            carteiras = listar_carteiras_ui(Config(), ("tF_Vendas",))
+        self.assertIn("América do Norte", carteiras)
+        self.assertNotIn("Falconi EUA", carteiras)
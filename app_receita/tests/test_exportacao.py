@@ -0,0 +1,140 @@
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from unittest import mock
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.test import SimpleTestCase, override_settings
+
+from app_receita.services.exportacao import (
+    csv_streaming,
+    limite_linhas,
+    linhas_dataframe,
+    xlsx_streaming,
+)
+
+
+def _tabela() -> "pd.DataFrame":
+    return pd.DataFrame({
+        "Carteira": ["Agronegócio", "Saúde Educação", "Serviços & <Tecnologia>"],
+        "Frente": pd.array([1, None, 3], dtype="Int64"),
+        "Valor": [1.5, np.nan, -2.25],
+        "Ativo": [True, False, True],
+        "Data": [date(2025, 3, 1), datetime(2025, 4, 2, 10, 30), None],
+        "Obs": ["ação\x01", "", "linha\nnova"],
+    })
+
+
+class XlsxStreamingTests(SimpleTestCase):
+    def _abrir(self, planilhas) -> "openpyxl.Workbook":
+        blocos = list(xlsx_streaming(planilhas))
+        self.assertTrue(all(isinstance(b, bytes) for b in blocos))
+        corpo = b"".join(blocos)
+        self.assertIsNone(zipfile.ZipFile(io.BytesIO(corpo)).testzip())
+        return openpyxl.load_workbook(io.BytesIO(corpo))
+
+    def test_abre_no_openpyxl_com_tipos_e_texto_nao_ascii(self):
+        wb = self._abrir([("dados", linhas_dataframe(_tabela()))])
+        linhas = list(wb["dados"].values)
+        self.assertEqual(linhas[0], ("Carteira", "Frente", "Valor", "Ativo", "Data", "Obs"))
+        self.assertEqual(linhas[1], ("Agronegócio", 1, 1.5, True, "2025-03-01", "ação"))
+        # NaN/NA/None viram célula vazia; caractere de controle é removido
+        self.assertEqual(linhas[2], ("Saúde Educação", None, None, False, "2025-04-02T10:30:00", ""))
+        self.assertEqual(linhas[3], ("Serviços & <Tecnologia>", 3, -2.25, True, None, "linha\nnova"))
+
+    def test_varias_abas_com_nomes_validos_e_unicos(self):
+        wb = self._abrir([
+            ("Pendente: Formação/Equipe [2025] com nome bem comprido", [("a",), (1,)]),
+            ("PoC", [("b",), (2,)]),
+            ("poc", [("c",), (3,)]),
+        ])
+        self.assertEqual(wb.sheetnames, ["Pendente_ Formação_Equipe _2025", "PoC", "poc_2"])
+        self.assertEqual(list(wb["poc_2"].values), [("c",), (3,)])
+
+    def test_sem_abas_gera_pacote_valido(self):
+        wb = self._abrir([])
+        self.assertEqual(wb.sheetnames, ["dados"])
+
+    def test_limite_de_linhas(self):
+        df = pd.DataFrame({"x": range(10)})
+        wb = self._abrir([("dados", linhas_dataframe(df, limite=3))])
+        self.assertEqual(list(wb["dados"].values), [("x",), (0,), (1,), (2,)])
+
+    def test_gera_em_blocos(self):
+        df = pd.DataFrame({"texto": [f"linha {i} – não comprimível {i * 7919}" for i in range(20000)]})
+        blocos = list(xlsx_streaming([("dados", linhas_dataframe(df))]))
+        self.assertGreater(len(blocos), 1)
+        wb = openpyxl.load_workbook(io.BytesIO(b"".join(blocos)), read_only=True)
+        self.assertEqual(sum(1 for _ in wb["dados"].values), 20001)
+
+
+class CsvStreamingTests(SimpleTestCase):
+    def test_round_trip(self):
+        corpo = b"".join(csv_streaming(linhas_dataframe(_tabela())))
+        self.assertTrue(corpo.startswith("﻿".encode("utf-8")))
+
+        texto = corpo.decode("utf-8-sig")
+        linhas = list(csv.reader(io.StringIO(texto, newline=""), delimiter=";"))
+        self.assertEqual(linhas[0], ["Carteira", "Frente", "Valor", "Ativo", "Data", "Obs"])
+        self.assertEqual(linhas[1], ["Agronegócio", "1", "1.5", "True", "2025-03-01", "ação\x01"])
+        self.assertEqual(linhas[2], ["Saúde Educação", "", "", "False", "2025-04-02 10:30:00", ""])
+        self.assertEqual(linhas[3], ["Serviços & <Tecnologia>", "3", "-2.25", "True", "", "linha\nnova"])
+
+        df = pd.read_csv(io.BytesIO(corpo), sep=";", encoding="utf-8-sig")
+        self.assertEqual(list(df.columns), ["Carteira", "Frente", "Valor", "Ativo", "Data", "Obs"])
+        self.assertEqual(df["Carteira"].tolist(), _tabela()["Carteira"].tolist())
+        self.assertTrue(np.isnan(df["Valor"][1]))
+
+    def test_gera_em_blocos(self):
+        linhas = [("coluna",)] + [(f"valor {i}",) for i in range(20000)]
+        blocos = list(csv_streaming(linhas))
+        self.assertGreater(len(blocos), 1)
+        self.assertEqual(b"".join(blocos).decode("utf-8-sig").splitlines()[-1], "valor 19999")
+
+
+class LimiteLinhasTests(SimpleTestCase):
+    @override_settings(RECEITA_EXPORTACAO_MAX_LINHAS=500)
+    def test_menor_entre_pedido_setting_e_excel(self):
+        self.assertEqual(limite_linhas(), 500)
+        self.assertEqual(limite_linhas(10), 10)
+        self.assertEqual(limite_linhas(0), 500)
+        self.assertEqual(limite_linhas(10_000), 500)
+
+    @override_settings(RECEITA_EXPORTACAO_MAX_LINHAS=10_000_000)
+    def test_maximo_do_excel(self):
+        self.assertEqual(limite_linhas(), 1_048_575)
+
+
+@override_settings(RECEITA_USAR_SNAPSHOT=False, RECEITA_VIEWS_ASYNC=False)
+class ExportarViewTests(SimpleTestCase):
+    def test_exporta_xlsx_e_csv(self):
+        with mock.patch("app_receita.views.tabelas_filtradas", return_value={"poc": _tabela()}) as tabelas:
+            resp = self.client.get("/exportar/poc/?mes=2025-03&limite=2")
+            wb = openpyxl.load_workbook(io.BytesIO(b"".join(resp.streaming_content)))
+            resp_csv = self.client.get("/exportar/poc/?formato=csv")
+            corpo_csv = b"".join(resp_csv.streaming_content)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Disposition"], 'attachment; filename="poc_2025.xlsx"')
+        self.assertEqual(resp["X-Export-Linhas"], "2")
+        self.assertEqual(resp["X-Export-Truncado"], "1")
+        self.assertEqual(wb["dados"].max_row, 3)
+        self.assertEqual(tabelas.call_args_list[0].args[1:], ("2025-03", "todos", "todas", ("poc",)))
+        self.assertEqual(resp_csv["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(len(corpo_csv.decode("utf-8-sig").splitlines()), 5)  # cabeçalho + 3 (uma com \n)
+
+    def test_erro_na_carga_responde_erro_antes_do_streaming(self):
+        self.client.raise_request_exception = False
+        with mock.patch("app_receita.views.tabelas_filtradas", side_effect=RuntimeError("Access indisponível")):
+            resp = self.client.get("/exportar/poc/")
+        self.assertEqual(resp.status_code, 500)
+        self.assertFalse(resp.streaming)
+
+    def test_erro_na_carga_de_todas_as_abas(self):
+        self.client.raise_request_exception = False
+        with mock.patch("app_receita.services.exportacao.carregar_pipeline", side_effect=RuntimeError("BigQuery")):
+            resp = self.client.get("/exportar/todas/")
+        self.assertEqual(resp.status_code, 500)
+        self.assertFalse(resp.streaming)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from pandas.testing import assert_frame_equal
+
+from app_receita.services.dados import _aplicar_filtros_basicos, _ajustar_carteira_para_interno
+from app_receita.services.filtros import FiltroIndexado, filtrar
+
+
+def _filtro_por_mascara(df, mes, status, carteira):
+    """Filtro original (máscaras booleanas sobre as colunas), referência do filtro indexado."""
+    out = df.copy()
+    if "mes_calendario" in out.columns and mes != "tudo":
+        try:
+            y, m = mes.split("-")
+            ini = pd.Timestamp(int(y), int(m), 1)
+            fim = ini + pd.offsets.MonthEnd(0)
+            datas = pd.to_datetime(out["mes_calendario"], errors="coerce")
+            out = out[(datas >= ini) & (datas <= fim)]
+        except Exception:
+            pass
+    if status != "todos":
+        cand_cols = [c for c in out.columns if "classificacao" in c or "status" in c]
+        if cand_cols:
+            mask = None
+            for c in cand_cols:
+                m = out[c].astype(str).str.strip().eq(status)
+                mask = m if mask is None else (mask | m)
+            out = out[mask]
+    if carteira != "todas":
+        carteira_interno = _ajustar_carteira_para_interno(carteira)
+        if "Check" in out.columns:
+            out = out[out["Check"].astype(str).str.strip().eq(carteira_interno)]
+    return out
+
+
+def _vendas(n=400, semente=7) -> "pd.DataFrame":
+    rng = np.random.default_rng(semente)
+    datas = pd.to_datetime("2025-01-01") + pd.to_timedelta(rng.integers(0, 400, n), unit="D")
+    datas = datas.where(rng.random(n) > 0.05)  # algumas datas vazias
+    return pd.DataFrame({
+        "Check": rng.choice(["Agronegócio", "Saúde ", "Falconi EUA", None], n),
+        "mes_calendario": datas,
+        "classificacaooportunidade__c": rng.choice(["Novo", "Renovação", None], n),
+        "status_frente": pd.Categorical(rng.choice(["Ganho", "Novo", "Perdido"], n)),
+        "ReceitaPoC": rng.random(n) * 1000,
+    })
+
+
+class FiltrosTests(SimpleTestCase):
+    def setUp(self):
+        self.df = _vendas()
+
+    def _comparar(self, mes, status, carteira):
+        obtido = _aplicar_filtros_basicos(self.df, mes=mes, status=status, carteira=carteira)
+        assert_frame_equal(obtido, _filtro_por_mascara(self.df, mes, status, carteira))
+
+    def test_igual_ao_filtro_por_mascara(self):
+        for mes in ("tudo", "2025-01", "2025-02", "2026-01", "2026-06", "2025-13", "março"):
+            for status in ("todos", "Novo", "Renovação", "Ganho", "Inexistente"):
+                for carteira in ("todas", "Agronegócio", "Saúde", "América do Norte", "Inexistente"):
+                    with self.subTest(mes=mes, status=status, carteira=carteira):
+                        self._comparar(mes, status, carteira)
+
+    def test_filtros_combinados(self):
+        out = _aplicar_filtros_basicos(self.df, mes="2025-03", status="Novo", carteira="América do Norte")
+        self.assertFalse(out.empty)
+        self.assertTrue((out["Check"] == "Falconi EUA").all())
+        self.assertTrue((out["mes_calendario"].dt.strftime("%Y-%m") == "2025-03").all())
+        novo = (out["classificacaooportunidade__c"] == "Novo") | (out["status_frente"] == "Novo")
+        self.assertTrue(novo.all())
+
+    def test_sem_filtro_devolve_o_proprio_df(self):
+        self.assertIs(_aplicar_filtros_basicos(self.df, mes="tudo", status="todos", carteira="todas"), self.df)
+        # mês mal formatado é ignorado, como no filtro original
+        self.assertIs(_aplicar_filtros_basicos(self.df, mes="2025-13", status="todos", carteira="todas"), self.df)
+
+    def test_valores_fora_do_indice_devolvem_vazio(self):
+        for filtros in (
+            {"mes": "2030-01", "status": "todos", "carteira": "todas"},
+            {"mes": "tudo", "status": "Inexistente", "carteira": "todas"},
+            {"mes": "tudo", "status": "todos", "carteira": "Inexistente"},
+        ):
+            with self.subTest(**filtros):
+                out = _aplicar_filtros_basicos(self.df, **filtros)
+                self.assertTrue(out.empty)
+                self.assertEqual(list(out.columns), list(self.df.columns))
+
+    def test_colunas_ausentes_nao_filtram(self):
+        df = self.df[["Check", "ReceitaPoC"]]
+        self.assertIs(filtrar(df, "2025-03", "Novo", None), df)
+        assert_frame_equal(filtrar(df, "2025-03", "Novo", "Agronegócio"), _filtro_por_mascara(df, "2025-03", "Novo", "Agronegócio"))
+
+    def test_vazio_ou_none(self):
+        vazio = self.df.iloc[:0]
+        self.assertIs(_aplicar_filtros_basicos(vazio, mes="2025-03", status="Novo", carteira="Agronegócio"), vazio)
+        self.assertIsNone(_aplicar_filtros_basicos(None, mes="2025-03", status="Novo", carteira="Agronegócio"))
+
+    def test_isentos_passam_no_filtro(self):
+        # duas partes empilhadas: a segunda não tem status (NaN) e fica isenta desse filtro
+        com_status = pd.DataFrame({"Check": ["Agronegócio", "Agronegócio"], "status_frente": ["Novo", "Ganho"], "v": [1.0, 2.0]})
+        sem_status = pd.DataFrame({"Check": ["Agronegócio", "Saúde"], "v": [3.0, 4.0]})
+        df = pd.concat([com_status, sem_status], ignore_index=True)
+        isentos = {"status": np.arange(len(com_status), len(df))}
+
+        self.assertEqual(filtrar(df, "tudo", "Novo", None)["v"].tolist(), [1.0])
+        self.assertEqual(filtrar(df, "tudo", "Novo", None, isentos)["v"].tolist(), [1.0, 3.0, 4.0])
+        self.assertEqual(filtrar(df, "tudo", "Novo", "Agronegócio", isentos)["v"].tolist(), [1.0, 3.0])
+
+    def test_limite_do_mes_segue_o_filtro_original(self):
+        # o filtro original compara com o último dia às 00:00: horas depois disso ficam de fora
+        df = pd.DataFrame({"mes_calendario": pd.to_datetime(["2025-03-01 00:00", "2025-03-31 00:00", "2025-03-31 12:00", "2025-04-01 00:00"])})
+        pos = FiltroIndexado(df).posicoes("2025-03", "todos", None)
+        self.assertEqual(pos.tolist(), [0, 1])
+        assert_frame_equal(filtrar(df, "2025-03", "todos", None), _filtro_por_mascara(df, "2025-03", "todos", "todas"))
@@ -0,0 +1,126 @@
+import re
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from basecode import Config  # type: ignore
+
+from app_receita.services.dados import PipelineCache
+from app_receita.services.metricas import Contador, Histograma, texto_prometheus
+
+# linha de amostra do formato texto do Prometheus: nome{rotulos} valor
+AMOSTRA = re.compile(
+    r'^(?P<nome>[a-zA-Z_:][a-zA-Z0-9_:]*)'
+    r'(?:\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\["\\n])*",?)*\})?'
+    r' (?:[+-]?(?:\d+(?:\.\d*)?(?:e[+-]?\d+)?|Inf)|NaN)$'
+)
+SUFIXOS = ("_bucket", "_sum", "_count")
+
+
+def validar_exposicao(test: SimpleTestCase, texto: str) -> dict:
+    """Confere HELP/TYPE antes das amostras de cada família; devolve {família: tipo}."""
+    test.assertTrue(texto.endswith("\n"))
+    tipos: dict = {}
+    for linha in texto.splitlines():
+        if linha.startswith("# HELP "):
+            continue
+        if linha.startswith("# TYPE "):
+            _, _, nome, tipo = linha.split(" ")
+            test.assertNotIn(nome, tipos, f"TYPE repetido: {nome}")
+            test.assertIn(tipo, ("counter", "gauge", "histogram"))
+            tipos[nome] = tipo
+            continue
+        m = AMOSTRA.match(linha)
+        test.assertIsNotNone(m, f"linha fora do formato: {linha!r}")
+        nome = m["nome"]
+        if nome not in tipos:
+            base = next((nome[: -len(s)] for s in SUFIXOS if nome.endswith(s)), nome)
+            test.assertEqual(tipos.get(base), "histogram", f"amostra sem TYPE: {linha!r}")
+    return tipos
+
+
+class _ResultadoFalso(dict):
+    def fingerprint(self):
+        return {"access": {}}
+
+
+class HistogramaTests(SimpleTestCase):
+    def test_buckets_cumulativos_sum_count(self):
+        h = Histograma("teste_duracao_seconds", "Duração.", (0.1, 1.0))
+        for valor in (0.05, 0.1, 0.5, 3.0):
+            h.observar(valor, view="poc")
+        self.assertEqual(h.exportar(), [
+            "# HELP teste_duracao_seconds Duração.",
+            "# TYPE teste_duracao_seconds histogram",
+            'teste_duracao_seconds_bucket{view="poc",le="0.1"} 2',
+            'teste_duracao_seconds_bucket{view="poc",le="1"} 3',
+            'teste_duracao_seconds_bucket{view="poc",le="+Inf"} 4',
+            'teste_duracao_seconds_sum{view="poc"} 3.65',
+            'teste_duracao_seconds_count{view="poc"} 4',
+        ])
+
+    def test_rotulos_escapados_e_ordenados(self):
+        c = Contador("teste_total", "Contagem.")
+        c.somar(tipo='a"b\\c\nd', status="200")
+        c.somar(2, status="200", tipo='a"b\\c\nd')
+        self.assertEqual(c.exportar()[-1], 'teste_total{status="200",tipo="a\\"b\\\\c\\nd"} 3')
+        validar_exposicao(self, "\n".join(c.exportar()) + "\n")
+
+    def test_gauge(self):
+        g = Contador("teste_em_andamento", "Em andamento.", tipo="gauge")
+        g.somar(1)
+        g.somar(-1)
+        self.assertEqual(g.exportar()[1:], ["# TYPE teste_em_andamento gauge", "teste_em_andamento 0"])
+
+
+class MetricasViewTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ajustes = override_settings(RECEITA_SNAPSHOT_DIR=tmp.name, RECEITA_USAR_SNAPSHOT=False)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_formato_prometheus(self):
+        with mock.patch("app_receita.views.versao_dados", return_value=None):
+            self.client.get("/api/tabela/inexistente/")
+        resp = self.client.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+
+        texto = resp.content.decode("utf-8")
+        tipos = validar_exposicao(self, texto)
+        self.assertEqual(tipos["receita_http_request_duration_seconds"], "histogram")
+        self.assertEqual(tipos["receita_http_requests_total"], "counter")
+        self.assertEqual(tipos["receita_pipeline_cache_hits_total"], "counter")
+        self.assertEqual(tipos["receita_pipeline_builds_in_progress"], "gauge")
+        self.assertTrue(all(n.endswith("_total") for n, t in tipos.items() if t == "counter"))
+        self.assertIn(
+            'receita_http_requests_total{metodo="GET",status="404",tipo="inexistente",view="tabela_api"} ',
+            texto,
+        )
+        self.assertIn('receita_http_request_duration_seconds_bucket{metodo="GET",tipo="inexistente",view="tabela_api",le="+Inf"} ', texto)
+        self.assertNotIn("receita_metricas_erro", texto)
+
+    def test_falha_na_coleta_do_pipeline_vira_metrica(self):
+        with mock.patch("app_receita.services.metricas.estatisticas_cache_pipeline", side_effect=RuntimeError("x")):
+            texto = self.client.get("/metrics").content.decode("utf-8")
+        validar_exposicao(self, texto)
+        self.assertIn("receita_metricas_erro 1\n", texto)
+
+    @override_settings(RECEITA_PIPELINE_SERVIR_ANTIGO=True)
+    def test_scrape_nao_revalida_o_cache(self):
+        cache = PipelineCache(ttl=0)  # vencida: qualquer validação faria o fingerprint completo
+        with mock.patch("app_receita.services.dados.fingerprint_fontes", return_value={"access": {}}) as fingerprint, \
+                mock.patch("app_receita.services.dados.run_pipeline", return_value=_ResultadoFalso()) as run_pipeline, \
+                mock.patch("app_receita.services.dados._CACHE_PIPELINE", cache):
+            cache.obter(Config())
+            fingerprint.reset_mock()
+            with mock.patch.object(cache, "_valida") as valida:
+                texto = texto_prometheus()
+        valida.assert_not_called()
+        fingerprint.assert_not_called()
+        self.assertEqual(run_pipeline.call_count, 1)
+        self.assertRegex(texto, r"\nreceita_dados_idade_segundos \d")
+        self.assertNotIn("receita_metricas_erro", texto)
@@ -0,0 +1,131 @@
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, override_settings
+
+from app_receita import views
+from app_receita.services import paginacao
+from app_receita.services.paginacao import LIMITE_PADRAO, TabelaPaginada, tabela_paginada
+
+
+def _tabela() -> "pd.DataFrame":
+    return pd.DataFrame({
+        "Carteira": ["Agronegócio", "MID", "Saúde", "MID", "Agronegócio"],
+        "Frente": pd.array([5, 4, 3, 2, 1], dtype="Int64"),
+        "Total": [10.0, np.nan, 30.0, -5.0, 20.0],
+        "Ativo": [True, False, True, True, False],
+    })
+
+
+@override_settings(RECEITA_API_MAX_LINHAS=3)
+class TabelaPaginadaTests(SimpleTestCase):
+    def test_recorte_e_totais_da_tabela_inteira(self):
+        pagina = TabelaPaginada(_tabela()).pagina(offset=1, limite=2)
+        self.assertEqual(pagina["colunas"], ["Carteira", "Frente", "Total", "Ativo"])
+        self.assertEqual(pagina["linhas"], [["MID", 4, None, False], ["Saúde", 3, 30.0, True]])
+        self.assertEqual((pagina["offset"], pagina["limite"], pagina["total_linhas"]), (1, 2, 5))
+        self.assertEqual(pagina["totais"], {"Frente": 15, "Total": 55.0})
+
+    def test_limites(self):
+        tabela = TabelaPaginada(_tabela())
+        pagina = tabela.pagina(offset=-4, limite=0)
+        self.assertEqual((pagina["offset"], pagina["limite"], len(pagina["linhas"])), (0, 1, 1))
+        pagina = tabela.pagina(limite=1000)
+        self.assertEqual((pagina["limite"], len(pagina["linhas"])), (3, 3))
+        pagina = tabela.pagina(offset=4, limite=3)
+        self.assertEqual(pagina["linhas"], [["Agronegócio", 1, 20.0, False]])
+        self.assertEqual(tabela.pagina(offset=50)["linhas"], [])
+
+    def test_ordenacao(self):
+        tabela = TabelaPaginada(_tabela())
+        pagina = tabela.pagina(limite=3, ordenar="Total", decrescente=True)
+        self.assertEqual([linha[2] for linha in pagina["linhas"]], [30.0, 20.0, 10.0])
+        pagina = tabela.pagina(offset=3, limite=3, ordenar="Total", decrescente=True)
+        self.assertEqual([linha[2] for linha in pagina["linhas"]], [-5.0, None])  # NaN por último
+        pagina = tabela.pagina(ordenar="inexistente", decrescente=True)
+        self.assertEqual((pagina["ordenar"], pagina["desc"]), (None, False))
+        self.assertEqual(pagina["linhas"][0][0], "Agronegócio")
+
+    def test_tabela_vazia(self):
+        pagina = TabelaPaginada(pd.DataFrame()).pagina()
+        self.assertEqual((pagina["linhas"], pagina["total_linhas"], pagina["totais"]), ([], 0, {}))
+
+
+class _Resultado(dict):
+    """Resultado do pipeline em memória (o cache guarda referência fraca ao resultado)."""
+
+
+class TabelaPaginadaCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dfs = _Resultado()
+        self.addCleanup(paginacao._TABELAS.clear)
+        for alvo, retorno in (("carregar_pipeline", self.dfs), ("tabelas_filtradas", {"poc": _tabela()})):
+            patcher = mock.patch(f"app_receita.services.paginacao.{alvo}", return_value=retorno)
+            setattr(self, alvo, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def _tabela(self, mes="tudo"):
+        return tabela_paginada(None, "poc", mes, "todos", "todas")
+
+    def test_reaproveitada_por_resultado_e_filtros(self):
+        tabela = self._tabela()
+        self.assertIs(self._tabela(), tabela)
+        self.assertIsNot(self._tabela(mes="2025-03"), tabela)
+        self.assertEqual(self.tabelas_filtradas.call_count, 2)
+        self.assertEqual(self.tabelas_filtradas.call_args.args[4:], (("poc",), self.dfs))
+
+    def test_tipo_desconhecido(self):
+        with self.assertRaises(KeyError):
+            tabela_paginada(None, "inexistente", "tudo", "todos", "todas")
+        self.carregar_pipeline.assert_not_called()
+
+    def test_erro_sobe_e_nao_fica_guardado(self):
+        self.tabelas_filtradas.side_effect = RuntimeError("Access indisponível")
+        with self.assertRaises(RuntimeError):
+            self._tabela()
+        self.assertEqual(len(paginacao._TABELAS), 0)
+
+        self.tabelas_filtradas.side_effect = None
+        self.assertEqual(self._tabela().df["Carteira"].tolist()[0], "Agronegócio")
+        self.assertEqual(self.tabelas_filtradas.call_count, 2)
+
+    def test_pagina_usa_o_fallback_em_caso_de_erro(self):
+        self.tabelas_filtradas.side_effect = RuntimeError("Access indisponível")
+        filtros = {"mes": "tudo", "status": "todos", "carteira": "todas"}
+        with self.assertLogs("app_receita.views", "ERROR"):
+            self.assertEqual(views._dados_tabela(filtros, "poc"), {"tipo_tabela": "poc"})
+
+        self.tabelas_filtradas.side_effect = None
+        dados = views._dados_tabela(filtros, "poc")
+        self.assertEqual(dados["table_total_linhas"], 5)
+
+
+@override_settings(RECEITA_USAR_SNAPSHOT=False, RECEITA_API_MAX_LINHAS=3)
+class TabelaApiTests(SimpleTestCase):
+    def test_parametros_da_querystring(self):
+        with mock.patch("app_receita.views.tabela_paginada", return_value=TabelaPaginada(_tabela())) as tabela, \
+                mock.patch("app_receita.views.versao_dados", return_value=None):
+            resp = self.client.get("/api/tabela/poc/?mes=2025-03&offset=-2&limite=500&ordenar=Frente&desc=1")
+            padrao = self.client.get("/api/tabela/poc/?offset=x&limite=y").json()
+        self.assertEqual(resp.status_code, 200)
+        dados = resp.json()
+        self.assertEqual(dados["tipo"], "poc")
+        self.assertEqual((dados["offset"], dados["limite"], dados["ordenar"], dados["desc"]), (0, 3, "Frente", True))
+        self.assertEqual([linha[1] for linha in dados["linhas"]], [5, 4, 3])
+        self.assertEqual(tabela.call_args_list[0].args[1:], ("poc", "2025-03", "todos", "todas"))
+        self.assertEqual((padrao["offset"], padrao["limite"]), (0, min(LIMITE_PADRAO, 3)))
+
+    def test_tipo_desconhecido(self):
+        with mock.patch("app_receita.views.versao_dados", return_value=None):
+            resp = self.client.get("/api/tabela/inexistente/")
+        self.assertEqual(resp.status_code, 404)
+        self.assertIn("erro", resp.json())
+
+    def test_erro_ao_montar_a_tabela(self):
+        with mock.patch("app_receita.views.tabela_paginada", side_effect=KeyError("Check")), \
+                mock.patch("app_receita.views.versao_dados", return_value=None), \
+                self.assertLogs("app_receita.views", "ERROR"):
+            resp = self.client.get("/api/tabela/poc/")
+        self.assertEqual(resp.status_code, 500)  # KeyError de coluna não vira 404
+        self.assertIn("erro", resp.json())
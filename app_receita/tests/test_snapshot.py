@@ -0,0 +1,170 @@
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.test import SimpleTestCase, override_settings
+from pandas.testing import assert_frame_equal
+
+from basecode import Config, tf_vendas_long  # type: ignore
+
+from app_receita.services import snapshot
+from app_receita.services.snapshot import (
+    ARQUIVO_PONTEIRO,
+    _preparar_parquet,
+    _remover_antigos,
+    carregar_snapshot,
+    construir_snapshot,
+    ler_manifesto,
+    versao_atual,
+)
+
+
+def _tf_vendas() -> "pd.DataFrame":
+    return pd.DataFrame({
+        "Check": pd.Categorical(["Realizado", "Orçado"]),
+        "mes_calendario": pd.to_datetime(["2025-03-01", "2025-04-01"]),
+        "codigo_frente": pd.array([10, None], dtype="Int64"),
+        "nome_cliente": pd.Categorical(["Agronegócio S.A.", "Saúde & Cia"]),
+        "status_frente": pd.Categorical(["Ganho", "Em negociação"]),
+        "ReceitaPoC": [1500.5, np.nan],
+    })
+
+
+class _ResultadoFalso(dict):
+    """Resultado do pipeline em memória: as saídas + fingerprint/materialize/report."""
+
+    def __init__(self, dfs, fp):
+        super().__init__(dfs)
+        self.fp = fp
+
+    def fingerprint(self):
+        return self.fp
+
+    def materialize(self, keys):
+        return {k: self[k] for k in keys}
+
+    def report(self):
+        return [{"stage": k, "rows": len(df)} for k, df in self.items()]
+
+
+class SnapshotTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.base = Path(tmp.name) / "snapshots"
+        travas = override_settings(RECEITA_TRAVA_DIR=Path(tmp.name) / "travas")
+        travas.enable()
+        self.addCleanup(travas.disable)
+        self.addCleanup(snapshot._CARREGADO.clear)
+
+    def _construir(self, dfs, fp, cfg=None, manter=3):
+        resultado = _ResultadoFalso(dfs, fp)
+        with mock.patch("app_receita.services.snapshot.run_pipeline", return_value=resultado):
+            return construir_snapshot(cfg or Config(), diretorio=self.base, manter=manter)
+
+    def test_round_trip_construir_e_carregar(self):
+        dfs = {
+            "tF_Vendas": _tf_vendas(),
+            "Carteira": pd.DataFrame({"codigo_frente": ["A-1", 2, None], "Valor": [1.0, 2.0, 3.0]}),
+            "Meta_Receita": pd.DataFrame({"Carteira": ["Agronegócio"], "Meta": [10.0]}),
+        }
+        fp = {"arquivos": {"x.xlsx": [1, 2]}, "access": {"tbl": [3, "2025-03-01"]}}
+        manifesto = self._construir(dict(dfs, tF_Vendas_long=tf_vendas_long(dfs["tF_Vendas"])), fp)
+
+        self.assertEqual(versao_atual(self.base), manifesto["versao"])
+        self.assertEqual(ler_manifesto(diretorio=self.base), manifesto)
+        self.assertEqual(set(manifesto["tabelas"]), set(dfs))  # visão não é gravada
+        self.assertEqual(manifesto["visoes"], {"tF_Vendas_long": "tF_Vendas"})
+        self.assertEqual(manifesto["fingerprint"], fp)
+
+        snap = carregar_snapshot(Config(), diretorio=self.base)
+        self.assertIsNotNone(snap)
+        self.assertEqual(snap.versao, manifesto["versao"])
+        self.assertEqual(set(snap), set(dfs) | {"tF_Vendas_long"})
+        assert_frame_equal(snap["tF_Vendas"], dfs["tF_Vendas"])
+        assert_frame_equal(snap["Meta_Receita"], dfs["Meta_Receita"])
+        # coluna de tipos misturados volta como texto, nulos preservados
+        self.assertEqual(snap["Carteira"]["codigo_frente"].tolist()[:2], ["A-1", "2"])
+        self.assertTrue(pd.isna(snap["Carteira"]["codigo_frente"].iloc[2]))
+        assert_frame_equal(snap["tF_Vendas_long"], tf_vendas_long(dfs["tF_Vendas"]))
+        self.assertEqual(snap.report(), manifesto["relatorio"])
+
+        self.assertIs(carregar_snapshot(Config(), diretorio=self.base), snap)
+        self.assertIsNone(carregar_snapshot(replace(Config(), csv_carteira="/outra/Carteira.csv"), diretorio=self.base))
+
+    def test_sem_snapshot_publicado(self):
+        self.assertIsNone(carregar_snapshot(Config(), diretorio=self.base))
+
+    def test_nova_versao_publicada_e_antigas_removidas(self):
+        versoes = []
+        for i in range(3):
+            manifesto = self._construir({"Meta_Receita": pd.DataFrame({"Meta": [float(i)]})}, {"rodada": i}, manter=2)
+            versoes.append(manifesto["versao"])
+            snap = carregar_snapshot(Config(), diretorio=self.base)
+            self.assertEqual(snap.versao, manifesto["versao"])
+            self.assertEqual(snap["Meta_Receita"]["Meta"].tolist(), [float(i)])
+        pastas = sorted(p.name for p in self.base.iterdir() if p.is_dir())
+        self.assertEqual(len(pastas), 2)
+        self.assertIn(versoes[-1], pastas)
+
+
+class PrepararParquetTests(SimpleTestCase):
+    def test_colunas_object_com_tipos_misturados_viram_texto(self):
+        df = pd.DataFrame({
+            "codigo_frente": [1, "A-2", None, 3.5],
+            "nome": ["Agronegócio", None, "Saúde", "x"],
+            "valor": [1.0, 2.0, np.nan, 4.0],
+        })
+        out = _preparar_parquet(df)
+
+        self.assertIsNot(out, df)
+        self.assertEqual(df["codigo_frente"].tolist()[:2], [1, "A-2"])  # original intacto
+        self.assertEqual(out["codigo_frente"].tolist()[:2], ["1", "A-2"])
+        self.assertEqual(out["codigo_frente"].iloc[3], "3.5")
+        self.assertTrue(pd.isna(out["codigo_frente"].iloc[2]))
+        assert_frame_equal(out[["nome", "valor"]], df[["nome", "valor"]])
+        pa.Table.from_pandas(out)  # não levanta
+
+    def test_sem_colunas_misturadas_devolve_o_mesmo_frame(self):
+        df = pd.DataFrame({"nome": ["a", None], "valor": [1, 2]}, dtype=object)
+        df["valor"] = df["valor"].astype("int64")
+        self.assertIs(_preparar_parquet(df), df)
+
+
+class RemoverAntigosTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.base = Path(tmp.name)
+        self.versoes = [f"2025010{i}T000000-abcdef0{i}" for i in range(1, 6)]
+        for v in self.versoes:
+            (self.base / v).mkdir()
+        (self.base / ".tmp-20250106T000000-abcdef06").mkdir()
+
+    def _restantes(self):
+        return sorted(p.name for p in self.base.iterdir() if p.is_dir())
+
+    def _publicar(self, versao):
+        (self.base / ARQUIVO_PONTEIRO).write_text(versao, encoding="utf-8")
+
+    def test_mantem_as_mais_recentes_e_ignora_pastas_temporarias(self):
+        self._publicar(self.versoes[-1])
+        _remover_antigos(self.base, 2)
+        self.assertEqual(self._restantes(), [".tmp-20250106T000000-abcdef06"] + self.versoes[-2:])
+
+    def test_nunca_remove_a_versao_publicada(self):
+        self._publicar(self.versoes[0])
+        _remover_antigos(self.base, 2)
+        self.assertEqual(
+            self._restantes(),
+            [".tmp-20250106T000000-abcdef06", self.versoes[0]] + self.versoes[-2:],
+        )
+
+    def test_manter_zero_nao_remove_nada(self):
+        self._publicar(self.versoes[-1])
+        _remover_antigos(self.base, 0)
+        self.assertEqual(len(self._restantes()), 6)
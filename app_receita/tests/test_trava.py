@@ -0,0 +1,84 @@
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from app_receita.services.trava import TravaArquivo
+
+
+class TravaArquivoTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        travas = override_settings(RECEITA_TRAVA_DIR=tmp.name)
+        travas.enable()
+        self.addCleanup(travas.disable)
+
+    def _trava(self, validade=60.0) -> TravaArquivo:
+        trava = TravaArquivo("teste", validade=validade, intervalo_espera=0.01)
+        self.addCleanup(trava.liberar)
+        return trava
+
+    def _abandonar(self, trava: TravaArquivo) -> None:
+        """Recua o mtime para além da validade, como se o dono tivesse parado de renovar."""
+        antes = time.time() - 2 * trava.validade
+        os.utime(trava.caminho, (antes, antes))
+
+    def test_adquirir_e_liberar(self):
+        with self._trava() as trava:
+            self.assertTrue(trava.caminho.exists())
+            self.assertTrue(trava._dono())
+            self.assertFalse(trava.esperou)
+            self.assertFalse(self._trava().tentar())
+        self.assertFalse(trava.caminho.exists())
+        self.assertTrue(self._trava().tentar())
+
+    def test_timeout_enquanto_outro_detem(self):
+        dono = self._trava()
+        self.assertTrue(dono.adquirir())
+        outro = self._trava()
+        inicio = time.monotonic()
+        self.assertFalse(outro.adquirir(timeout=0.05))
+        self.assertLess(time.monotonic() - inicio, 2)
+        self.assertTrue(outro.esperou)
+        self.assertTrue(dono._dono())
+
+        outro.liberar()  # sem ser dono: não remove a trava de quem a detém
+        self.assertTrue(dono.caminho.exists())
+        dono.liberar()
+        self.assertTrue(outro.adquirir(timeout=1))
+
+    def test_trava_abandonada_e_tomada(self):
+        antigo = self._trava()
+        self.assertTrue(antigo.adquirir())
+        novo = self._trava()
+        self.assertFalse(novo.tentar())  # ainda dentro da validade
+
+        self._abandonar(antigo)
+        self.assertTrue(novo.adquirir(timeout=1))
+        self.assertTrue(novo._dono())
+        self.assertFalse(antigo._dono())
+
+        antigo.liberar()  # o antigo dono não remove a trava do novo
+        self.assertTrue(novo.caminho.exists())
+        self.assertTrue(novo._dono())
+
+    def test_antigo_dono_para_de_renovar_apos_ser_tomado(self):
+        antigo = self._trava(validade=0.3)  # renova a cada 0,1 s
+        self.assertTrue(antigo.adquirir())
+        # outro processo tomou a trava (ex.: o antigo ficou parado por mais que a validade)
+        antigo.caminho.unlink()
+        novo = self._trava()
+        self.assertTrue(novo.tentar())
+
+        antigo._renovador.join(timeout=2)
+        self.assertFalse(antigo._renovador.is_alive())
+        self.assertFalse(antigo._parar.is_set())  # parou sozinho, sem liberar
+
+        self._abandonar(novo)
+        mtime = novo.caminho.stat().st_mtime
+        time.sleep(0.2)
+        self.assertEqual(novo.caminho.stat().st_mtime, mtime)  # ninguém renovou o arquivo do novo
+        antigo.liberar()
+        self.assertTrue(novo._dono())
@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from app_receita.views import condicional_por_versao, diagnostico
+
+VERSAO = ("a1b2c3d4e5f60718", 1_741_000_000.0)
+
+
+class CondicionalPorVersaoTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.chamadas = 0
+
+        @condicional_por_versao
+        def view(request):
+            self.chamadas += 1
+            return HttpResponse("ok")
+
+        self.view = view
+        patcher = mock.patch("app_receita.views.versao_dados", return_value=VERSAO)
+        self.versao_dados = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, url="/poc/?mes=2025-03", **cabecalhos):
+        return self.view(self.factory.get(url, headers=cabecalhos))
+
+    def test_200_com_validadores(self):
+        resp = self._get()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.chamadas, 1)
+        self.assertTrue(resp["ETag"].startswith('"'))
+        self.assertEqual(resp["Last-Modified"], "Mon, 03 Mar 2025 11:06:40 GMT")
+        self.assertIn("no-cache", resp["Cache-Control"])
+        self.assertIn("private", resp["Cache-Control"])
+
+    def test_304_sem_rodar_a_view(self):
+        etag = self._get()["ETag"]
+        resp = self._get(**{"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.chamadas, 1)
+        self.assertEqual(resp["ETag"], etag)
+
+        resp = self._get(**{"If-Modified-Since": "Mon, 03 Mar 2025 11:06:40 GMT"})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.chamadas, 1)
+
+    def test_etag_muda_com_filtros_rota_e_versao(self):
+        etag = self._get()["ETag"]
+        self.assertNotEqual(self._get("/poc/?mes=2025-04")["ETag"], etag)
+        self.assertNotEqual(self._get("/produtos/?mes=2025-03")["ETag"], etag)
+        self.versao_dados.return_value = ("0f0e0d0c0b0a0908", VERSAO[1] + 60)
+        resp = self._get(**{"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_sem_versao_conhecida_roda_a_view(self):
+        self.versao_dados.return_value = None
+        resp = self._get(**{"If-None-Match": '"qualquer"'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("ETag", resp)
+        self.assertEqual(self.chamadas, 1)
+
+    def test_post_nao_e_condicional(self):
+        resp = self.view(self.factory.post("/poc/"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("ETag", resp)
+        self.versao_dados.assert_not_called()
+
+    def test_view_assincrona(self):
+        @condicional_por_versao
+        async def view(request):
+            self.chamadas += 1
+            return HttpResponse("ok")
+
+        etag = async_to_sync(view)(self.factory.get("/poc/"))["ETag"]
+        resp = async_to_sync(view)(self.factory.get("/poc/", headers={"If-None-Match": etag}))
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.chamadas, 1)
+
+
+class _Resultado(dict):
+    def report(self):
+        return [{
+            "stage": "Vendas", "started_at": "2025-03-03T11:00:00", "wall_s": 1.5, "read_s": 1.0,
+            "transform_s": 0.5, "rows_in": 0, "rows_read": 10, "rows_out": 10, "columns_out": 4,
+            "memory_bytes": 2048, "sources": 1, "error": None, "reused": False,
+        }]
+
+
+class DiagnosticoTests(SimpleTestCase):
+    def setUp(self):
+        for alvo, retorno in (("versao_dados", None), ("resultado_atual", None)):
+            patcher = mock.patch(f"app_receita.views.{alvo}", return_value=retorno)
+            setattr(self, alvo, patcher.start())
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("app_receita.services.dados.carregar_pipeline")
+        self.carregar_pipeline = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self):
+        request = RequestFactory().get("/diagnostico/")
+        request.user = SimpleNamespace(is_active=True, is_staff=True)
+        resp = diagnostico(request)
+        self.assertEqual(resp.status_code, 200)
+        self.carregar_pipeline.assert_not_called()  # a página não dispara o cálculo
+        return resp.content.decode()
+
+    def test_sem_run_ainda(self):
+        html = self._get()
+        self.assertIn("nenhum run ainda", html)
+        self.assertIn("ainda não rodou", html)
+
+    def test_etapas_do_resultado_em_cache(self):
+        self.resultado_atual.return_value = _Resultado()
+        html = self._get()
+        self.assertIn("pipeline (cache do processo)", html)
+        self.assertIn("<td>Vendas</td>", html)
+        self.assertNotIn("ainda não rodou", html)
+        self.versao_dados.assert_called_once_with(mock.ANY, validar=False)
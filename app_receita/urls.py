@@ -1,18 +1,29 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
 
 app_name = "app_receita"
 
+# páginas/exportações: variantes assíncronas com RECEITA_VIEWS_ASYNC (servidor ASGI)
+paginas = views_async if getattr(settings, "RECEITA_VIEWS_ASYNC", False) else views
+
 urlpatterns = [
-    path("", views.resumo, name="resumo"),
-    path("receita/", views.receita, name="receita"),
-    path("poc/", views.poc, name="poc"),
-    path("success-fee/", views.success_fee, name="success_fee"),
-    path("produtos/", views.produtos, name="produtos"),
-    path("pendente-formacao/", views.pendente_formacao, name="pendente_formacao"),
-    path("pendente-assinatura/", views.pendente_assinatura, name="pendente_assinatura"),
-    path("receita-potencial/", views.receita_potencial, name="receita_potencial"),
+    path("", paginas.resumo, name="resumo"),
+    path("receita/", paginas.receita, name="receita"),
+    path("poc/", paginas.poc, name="poc"),
+    path("success-fee/", paginas.success_fee, name="success_fee"),
+    path("produtos/", paginas.produtos, name="produtos"),
+    path("pendente-formacao/", paginas.pendente_formacao, name="pendente_formacao"),
+    path("pendente-assinatura/", paginas.pendente_assinatura, name="pendente_assinatura"),
+    path("receita-potencial/", paginas.receita_potencial, name="receita_potencial"),
+
+    # tabelas das abas em JSON (paginadas)
+    path("api/tabela/<str:tipo>/", views.tabela_api, name="tabela_api"),
+
+    # relatório do pipeline (somente staff)
+    path("diagnostico/", views.diagnostico, name="diagnostico"),
 
     # exportações (inclui novos tipos pend_formacao, pend_assinatura e potencial)
-    path("exportar/<str:tipo>/", views.exportar_excel, name="exportar_excel"),
+    path("exportar/todas/", paginas.exportar_todas, name="exportar_todas"),
+    path("exportar/<str:tipo>/", paginas.exportar_excel, name="exportar_excel"),
 ]
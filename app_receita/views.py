@@ -1,19 +1,43 @@
+from functools import wraps
+import hashlib
+import inspect
+import json
+import logging
+import time
+from datetime import datetime
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 import pandas as pd
-from io import BytesIO
 
 from app_receita.services.dados import (
     Config,
+    TABELAS,
     calcular_cascata,
+    estatisticas_cache_pipeline,
     listar_carteiras_ui,
-    tabela_poc,
-    tabela_success_fee,
-    tabela_produtos,
-    tabela_pendente_formacao,
-    tabela_pendente_assinatura,
-    tabela_receita_potencial,
+    resultado_atual,
+    tabelas_filtradas,
+    versao_dados,
 )
+from app_receita.services.executor import em_executor
+from app_receita.services.metricas import texto_prometheus
+from app_receita.services.paginacao import LIMITE_PADRAO, tabela_paginada
+from app_receita.services.exportacao import (
+    CONTENT_TYPES,
+    ARQUIVO_TODAS,
+    TABELAS_EXPORTACAO,
+    csv_streaming,
+    limite_linhas,
+    linhas_dataframe,
+    planilhas_todas,
+    xlsx_streaming,
+)
+
+logger = logging.getLogger(__name__)
 
 # ---------- Helpers de filtros ----------
 MESES_2025 = [
@@ -60,27 +84,98 @@ def _get_filtros(request):
     return {"mes": mes, "status": status, "carteira": carteira}
 
 
-def _contexto_comum(request, titulo_pagina):
-    filtros = _get_filtros(request)
+def _validadores(request) -> tuple[str, float] | None:
+    """(ETag, Last-Modified) da resposta: versão dos dados + rota + querystring (filtros etc.)."""
+    versao = request.versao_dados = versao_dados(Config())
+    if versao is None:
+        return None
+    dados, modificado_em = versao
+    payload = json.dumps([dados, request.path, sorted(request.GET.lists())], default=str)
+    return quote_etag(hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]), modificado_em
+
+
+def condicional_por_versao(view):
+    """
+    GET condicional pelas versões dos dados: se o If-None-Match/If-Modified-Since do cliente
+    ainda vale, responde 304 antes de qualquer cálculo. Sem versão conhecida (cache ainda
+    vazio), a view roda e os validadores são calculados depois dela.
+    """
+
+    if inspect.iscoroutinefunction(view):
+
+        @wraps(view)
+        async def _view_async(request, *args, **kwargs):
+            validadores, resp = await em_executor(_condicional_antes, request)
+            if resp is None:
+                resp = await view(request, *args, **kwargs)
+            return await em_executor(_condicional_depois, request, resp, validadores)
+
+        return _view_async
+
+    @wraps(view)
+    def _view(request, *args, **kwargs):
+        validadores, resp = _condicional_antes(request)
+        if resp is None:
+            resp = view(request, *args, **kwargs)
+        return _condicional_depois(request, resp, validadores)
+
+    return _view
+
+
+def _condicional_antes(request):
+    """(validadores, resposta 304/412 ou None)."""
+    validadores = _validadores(request) if request.method in ("GET", "HEAD") else None
+    if validadores is None:
+        return None, None
+    etag, modificado_em = validadores
+    return validadores, get_conditional_response(request, etag=etag, last_modified=int(modificado_em))
+
+
+def _condicional_depois(request, resp, validadores):
+    # o 304 repete os validadores que o 200 teria (RFC 9110, 15.4.5)
+    if request.method in ("GET", "HEAD") and resp.status_code in (200, 304):
+        validadores = validadores or _validadores(request)
+        if validadores is not None:
+            resp.headers.setdefault("ETag", validadores[0])
+            resp.headers.setdefault("Last-Modified", http_date(validadores[1]))
+            resp.headers.setdefault("X-Dados-Idade", str(max(0, int(time.time() - validadores[1]))))
+    # o navegador sempre revalida (dados mudam com a atualização das fontes)
+    patch_cache_control(resp, private=True, no_cache=True)
+    return resp
 
-    # A Config do basecode.py não aceita 'use_access'; instancie sem argumentos.
-    cfg = Config()
 
+def _carteiras_ui(chaves_carteira=None) -> list[str]:
     try:
-        carteiras_ui = listar_carteiras_ui(cfg)
+        # chaves_carteira: fontes da aba (evita calcular o pipeline inteiro só para o filtro)
+        return listar_carteiras_ui(Config(), chaves_carteira)
     except Exception:
-        carteiras_ui = [
+        return [
             "Agronegócio", "América do Norte", "Bens Não Duráveis",
             "Infraestrutura e Indústria de Base", "MID",
             "Saúde Educação Segurança e Adm.Pública", "Servicos e Tecnologia",
         ]
 
+
+def _contexto_comum(request, titulo_pagina, chaves_carteira=None, carteiras_ui=None):
+    """carteiras_ui: lista já calculada (views assíncronas); sem ela, usa _carteiras_ui."""
+    filtros = _get_filtros(request)
+
+    # A Config do basecode.py não aceita 'use_access'; instancie sem argumentos.
+    cfg = Config()
+
+    if carteiras_ui is None:
+        carteiras_ui = _carteiras_ui(chaves_carteira)
+
     carteiras_options = [{"value": "todas", "label": "Selecionar Todos"}] + [
         {"value": c, "label": c} for c in carteiras_ui
     ]
 
+    # versão servida (pode ser a anterior enquanto a atualização roda em segundo plano)
+    versao = getattr(request, "versao_dados", None) or versao_dados(cfg)
+
     return {
         "titulo_pagina": titulo_pagina,
+        "dados_atualizados_em": datetime.fromtimestamp(versao[1]) if versao else None,
         "filtros": filtros,
         "MESES_2025": MESES_2025,
         "STATUS_OPCOES": STATUS_OPCOES,
@@ -88,20 +183,35 @@ def _contexto_comum(request, titulo_pagina):
     }
 
 
+def _dados_tabela(filtros, tipo: str) -> dict:
+    """1ª página da tabela da aba (renderizada no servidor); as demais vêm de tabela_api."""
+    f = filtros
+    try:
+        tabela = tabela_paginada(Config(), tipo, f["mes"], f["status"], f["carteira"])
+    except Exception:
+        logger.exception("Erro ao montar a tabela %s", tipo)
+        return {"tipo_tabela": tipo}  # sem "table": a página carrega tudo pela API
+    return {
+        "tipo_tabela": tipo,
+        "table": tabela.df.iloc[:LIMITE_PADRAO],
+        "table_totais": tabela.totais(),
+        "table_total_linhas": len(tabela.df),
+    }
+
+
+def _contexto_tabela(ctx, tipo: str) -> None:
+    ctx.update(_dados_tabela(ctx["filtros"], tipo))
+
+
 # ---------- Views ----------
+@condicional_por_versao
 def resumo(request):
     ctx = _contexto_comum(request, "Início · Falconi")
     return render(request, "home.html", ctx)
 
 
-def receita(request):
-    """
-    Página do gráfico em cascata (Receita 2025).
-    Agora usa dados reais do pipeline via calcular_cascata(...).
-    Mantém fallback seguro em caso de erro de conector/coluna.
-    """
-    ctx = _contexto_comum(request, "Receita (Cascata) · Falconi")
-
+def _dados_cascata(filtros) -> list:
+    """Dados da cascata para os filtros; fallback zerado em caso de erro de conector/coluna."""
     # Instancie a Config do seu basecode.py sem 'use_access' (esse campo não existe).
     # Quando o driver do Access (ACE/pyodbc) estiver instalado e os caminhos corretos,
     # basta garantir que os paths em Config apontem para suas bases. Opcionalmente,
@@ -117,18 +227,16 @@ def receita(request):
         # bigquery_project_id="seu-projeto-gcp",
     )
 
-    filtros = ctx["filtros"]
     try:
         dados = calcular_cascata(cfg, filtros["mes"], filtros["status"], filtros["carteira"])
         # sanity-check básico: precisa ser lista de dicts com label/valor
         if not isinstance(dados, list) or not all(isinstance(x, dict) for x in dados):
             raise ValueError("Formato inesperado retornado por calcular_cascata.")
-        ctx["waterfall_data"] = dados
-    except Exception as e:
+        return dados
+    except Exception:
         # Loga o erro e mantém o placeholder seguro
-        print("[receita] Erro ao calcular cascata:", e)
-        import traceback; traceback.print_exc()
-        ctx["waterfall_data"] = [
+        logger.exception("Erro ao calcular cascata")
+        return [
             {"label": "Receita PoC", "valor": 0},
             {"label": "Receita Success Fee", "valor": 0},
             {"label": "Receita Produtos", "valor": 0},
@@ -139,92 +247,203 @@ def receita(request):
             {"label": "Total", "valor": 0},
         ]
 
+
+@condicional_por_versao
+def receita(request):
+    """
+    Página do gráfico em cascata (Receita 2025).
+    Agora usa dados reais do pipeline via calcular_cascata(...).
+    Mantém fallback seguro em caso de erro de conector/coluna.
+    """
+    ctx = _contexto_comum(request, "Receita (Cascata) · Falconi")
+    ctx["waterfall_data"] = _dados_cascata(ctx["filtros"])
     return render(request, "receita/receita.html", ctx)
 
 
+@condicional_por_versao
 def poc(request):
-    ctx = _contexto_comum(request, "PoC · Falconi")
-    cfg = Config()
-    f = ctx["filtros"]
-    ctx["table"] = tabela_poc(cfg, f["mes"], f["status"], f["carteira"]) or pd.DataFrame()
+    ctx = _contexto_comum(request, "PoC · Falconi", ("Carteira", "Receita_PoC"))
+    _contexto_tabela(ctx, "poc")
     return render(request, "receita/poc.html", ctx)
 
 
+@condicional_por_versao
 def success_fee(request):
-    ctx = _contexto_comum(request, "Success Fee · Falconi")
-    cfg = Config()
-    f = ctx["filtros"]
-    ctx["table"] = tabela_success_fee(cfg, f["mes"], f["status"], f["carteira"]) or pd.DataFrame()
+    ctx = _contexto_comum(request, "Success Fee · Falconi", ("Carteira", "Receita_SuccessFee"))
+    _contexto_tabela(ctx, "success_fee")
     return render(request, "receita/success_fee.html", ctx)
 
 
+@condicional_por_versao
 def produtos(request):
-    ctx = _contexto_comum(request, "Produtos · Falconi")
-    cfg = Config()
-    f = ctx["filtros"]
-    ctx["table"] = tabela_produtos(cfg, f["mes"], f["status"], f["carteira"]) or pd.DataFrame()
+    ctx = _contexto_comum(request, "Produtos · Falconi", ("Carteira", "Receita_Produto", "Carteira_Produto"))
+    _contexto_tabela(ctx, "produtos")
     return render(request, "receita/produtos.html", ctx)
 
 
 # NOVAS ABAS
+@condicional_por_versao
 def pendente_formacao(request):
-    ctx = _contexto_comum(request, "Pendente Formação · Falconi")
-    cfg = Config()
-    f = ctx["filtros"]
-    ctx["table"] = tabela_pendente_formacao(cfg, f["mes"], f["status"], f["carteira"]) or pd.DataFrame()
+    ctx = _contexto_comum(request, "Pendente Formação · Falconi", ("Carteira", "Pendente_Alocacao_HD"))
+    _contexto_tabela(ctx, "pend_formacao")
     return render(request, "receita/pendente_formacao.html", ctx)
 
 
+@condicional_por_versao
 def pendente_assinatura(request):
     ctx = _contexto_comum(request, "Pendente Assinatura · Falconi")
-    cfg = Config()
-    f = ctx["filtros"]
-    ctx["table"] = tabela_pendente_assinatura(cfg, f["mes"], f["status"], f["carteira"]) or pd.DataFrame()
+    _contexto_tabela(ctx, "pend_assinatura")
     return render(request, "receita/pendente_assinatura.html", ctx)
 
 
+@condicional_por_versao
 def receita_potencial(request):
     ctx = _contexto_comum(request, "Receita Potencial · Falconi")
-    cfg = Config()
-    f = ctx["filtros"]
-    ctx["table"] = tabela_receita_potencial(cfg, f["mes"], f["status"], f["carteira"]) or pd.DataFrame()
+    _contexto_tabela(ctx, "potencial")
     return render(request, "receita/receita_potencial.html", ctx)
 
 
+# API DAS TABELAS
+@condicional_por_versao
+def tabela_api(request, tipo: str):
+    """
+    Página da tabela de uma aba em JSON (mesmos tipos da exportação), com os filtros da
+    querystring e:
+      - offset, limite: recorte de linhas (limite padrão 100, máximo RECEITA_API_MAX_LINHAS)
+      - ordenar=<coluna>, desc=1: ordenação feita no servidor
+    Resposta: colunas, linhas, offset, limite, total_linhas, totais (por coluna numérica,
+    sobre a tabela inteira), ordenar, desc.
+    """
+    if tipo not in TABELAS:
+        return JsonResponse({"erro": f"Tabela desconhecida: {tipo}"}, status=404)
+    f = _get_filtros(request)
+    try:
+        tabela = tabela_paginada(Config(), tipo, f["mes"], f["status"], f["carteira"])
+    except Exception:
+        logger.exception("Erro ao montar a tabela %s", tipo)
+        return JsonResponse({"erro": "Erro ao montar a tabela."}, status=500)
+    pagina = tabela.pagina(
+        offset=_parametro_int(request, "offset") or 0,
+        limite=_parametro_int(request, "limite") or LIMITE_PADRAO,
+        ordenar=request.GET.get("ordenar") or None,
+        decrescente=request.GET.get("desc") in ("1", "true"),
+    )
+    return JsonResponse({"tipo": tipo, **pagina})
+
+
 # EXPORTAÇÃO GENÉRICA
+def _parametro_int(request, nome: str) -> int | None:
+    try:
+        return int(request.GET.get(nome, ""))
+    except ValueError:
+        return None
+
+
+@condicional_por_versao
 def exportar_excel(request, tipo: str):
     """
     tipos suportados:
       - 'poc' | 'success_fee' | 'produtos'
       - 'pend_formacao' | 'pend_assinatura' | 'potencial'
-    Gera um .xlsx com uma aba "dados" contendo o DataFrame cru (após filtros).
+    Gera um .xlsx com uma aba "dados" contendo a tabela da aba (após filtros), enviado em
+    streaming enquanto as linhas são escritas (a tabela é calculada antes). Querystring opcional:
+      - formato=csv: CSV no lugar do .xlsx
+      - limite=N: no máximo N linhas (também limitado por RECEITA_EXPORTACAO_MAX_LINHAS)
     """
+    corpo, content_type, cabecalhos = _exportacao(request, tipo)
+    resp = StreamingHttpResponse(corpo, content_type=content_type)
+    for nome, valor in cabecalhos.items():
+        resp[nome] = valor
+    return resp
+
+
+def _exportacao(request, tipo: str):
+    """(gerador do arquivo, content-type, cabecalhos) da exportação de uma aba."""
     f = _get_filtros(request)
     cfg = Config()
-
-    if tipo == "poc":
-        df = tabela_poc(cfg, f["mes"], f["status"], f["carteira"]); fname = "poc_2025.xlsx"
-    elif tipo == "success_fee":
-        df = tabela_success_fee(cfg, f["mes"], f["status"], f["carteira"]); fname = "success_fee_2025.xlsx"
-    elif tipo == "produtos":
-        df = tabela_produtos(cfg, f["mes"], f["status"], f["carteira"]); fname = "produtos_2025.xlsx"
-    elif tipo == "pend_formacao":
-        df = tabela_pendente_formacao(cfg, f["mes"], f["status"], f["carteira"]); fname = "pendente_formacao_2025.xlsx"
-    elif tipo == "pend_assinatura":
-        df = tabela_pendente_assinatura(cfg, f["mes"], f["status"], f["carteira"]); fname = "pendente_assinatura_2025.xlsx"
-    elif tipo == "potencial":
-        df = tabela_receita_potencial(cfg, f["mes"], f["status"], f["carteira"]); fname = "receita_potencial_2025.xlsx"
+    formato = "csv" if request.GET.get("formato") == "csv" else "xlsx"
+    limite = limite_linhas(_parametro_int(request, "limite"))
+
+    nome, _ = TABELAS_EXPORTACAO.get(tipo, ("export", None))
+    # tabela calculada antes da resposta, sem o fallback vazio das páginas: erro de fonte
+    # vira resposta de erro, não um arquivo vazio/truncado com status 200
+    if tipo in TABELAS_EXPORTACAO:
+        df = tabelas_filtradas(cfg, f["mes"], f["status"], f["carteira"], (tipo,))[tipo]
     else:
-        df = pd.DataFrame(); fname = "export.xlsx"
+        df = pd.DataFrame()
 
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        (df if df is not None else pd.DataFrame()).to_excel(writer, index=False, sheet_name="dados")
-    bio.seek(0)
+    linhas = linhas_dataframe(df, limite)
+    corpo = csv_streaming(linhas) if formato == "csv" else xlsx_streaming([("dados", linhas)])
+    cabecalhos = {
+        "Content-Disposition": f'attachment; filename="{nome}.{formato}"',
+        "X-Export-Linhas": str(min(len(df), limite)),
+    }
+    if len(df) > limite:
+        cabecalhos["X-Export-Truncado"] = "1"
+    return corpo, CONTENT_TYPES[formato], cabecalhos
 
-    resp = HttpResponse(
-        bio.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    resp["Content-Disposition"] = f'attachment; filename="{fname}"'
+
+@condicional_por_versao
+def exportar_todas(request):
+    """
+    Um único .xlsx com uma aba por tabela (PoC, Success Fee, Produtos, Pendentes, Potencial)
+    + a cascata, todas com os mesmos filtros e calculadas sobre um só carregamento do
+    pipeline e uma só aplicação dos filtros (em vez de uma exportação por aba). Os dados
+    são calculados antes da resposta; o streaming só serializa. Aceita ?limite=N por aba.
+    """
+    f = _get_filtros(request)
+    cfg = Config()
+    limite = limite_linhas(_parametro_int(request, "limite"))
+    planilhas = planilhas_todas(cfg, f["mes"], f["status"], f["carteira"], limite)
+    resp = StreamingHttpResponse(xlsx_streaming(planilhas), content_type=CONTENT_TYPES["xlsx"])
+    resp["Content-Disposition"] = f'attachment; filename="{ARQUIVO_TODAS}.xlsx"'
     return resp
+
+
+# DIAGNÓSTICO
+@staff_member_required
+def diagnostico(request):
+    """
+    Relatório por etapa do pipeline em uso (tempo total, leitura x transformação, linhas,
+    memória) + estado do cache. Não dispara cálculo: mostra só as etapas já executadas
+    (ou as do run que gerou o snapshot); sem snapshot nem entrada no cache, "sem run".
+    """
+    cfg = Config()
+    try:
+        dfs = resultado_atual(cfg)
+        etapas = dfs.report() if hasattr(dfs, "report") else []
+        erro = None
+    except Exception as e:
+        dfs, etapas, erro = None, [], f"{type(e).__name__}: {e}"
+    versao = versao_dados(cfg, validar=False)
+    if hasattr(dfs, "versao"):
+        origem = "snapshot " + dfs.versao
+    elif dfs is not None:
+        origem = "pipeline (cache do processo)"
+    else:
+        origem = "nenhum run ainda"
+    ctx = {
+        "titulo_pagina": "Diagnóstico · Falconi",
+        "origem": origem,
+        "sem_run": dfs is None and erro is None,
+        "dados_atualizados_em": datetime.fromtimestamp(versao[1]) if versao else None,
+        "etapas": sorted(etapas, key=lambda e: e["wall_s"], reverse=True),
+        "totais": {
+            "wall_s": sum(e["wall_s"] for e in etapas),
+            "read_s": sum(e["read_s"] for e in etapas),
+            "transform_s": sum(e["transform_s"] for e in etapas),
+            "memory_bytes": sum(e["memory_bytes"] for e in etapas),
+        },
+        "cache": estatisticas_cache_pipeline(),
+        "erro": erro,
+    }
+    return render(request, "receita/diagnostico.html", ctx)
+
+
+# MÉTRICAS (Prometheus)
+def metricas(request):
+    """
+    Métricas do processo no formato texto do Prometheus: latência/tamanho por view,
+    idade dos dados/snapshot, cache e construções do pipeline. Não dispara cálculo.
+    """
+    return HttpResponse(texto_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
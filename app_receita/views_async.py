@@ -0,0 +1,117 @@
+import asyncio
+
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+
+from app_receita.services.dados import Config
+from app_receita.services.executor import em_executor, iterar_em_executor
+from app_receita.services.exportacao import (
+    ARQUIVO_TODAS,
+    CONTENT_TYPES,
+    limite_linhas,
+    planilhas_todas,
+    xlsx_streaming,
+)
+from app_receita.views import (
+    _carteiras_ui,
+    _contexto_comum,
+    _dados_cascata,
+    _dados_tabela,
+    _exportacao,
+    _get_filtros,
+    _parametro_int,
+    condicional_por_versao,
+)
+
+# Variantes assíncronas das páginas e exportações (RECEITA_VIEWS_ASYNC=True, servidas pelo
+# config/asgi.py). O pipeline, o pandas e a renderização rodam no executor limitado
+# (services/executor.py); o worker ASGI só espera. Lista de carteiras e tabela/cascata são
+# calculadas em paralelo. Se o cliente desconectar, a espera é cancelada e o que ainda não
+# começou no executor é descartado.
+
+
+async def _pagina(request, titulo, chaves_carteira, template, calcular):
+    """calcular(filtros) -> dict com o conteúdo da página, junto com a lista de carteiras."""
+    filtros = _get_filtros(request)
+    carteiras, conteudo = await asyncio.gather(
+        em_executor(_carteiras_ui, chaves_carteira),
+        em_executor(calcular, filtros),
+    )
+    ctx = await em_executor(_contexto_comum, request, titulo, carteiras_ui=carteiras)
+    ctx.update(conteudo)
+    return await em_executor(render, request, template, ctx)
+
+
+def _aba(tipo):
+    return lambda filtros: _dados_tabela(filtros, tipo)
+
+
+@condicional_por_versao
+async def resumo(request):
+    return await _pagina(request, "Início · Falconi", None, "home.html", lambda filtros: {})
+
+
+@condicional_por_versao
+async def receita(request):
+    return await _pagina(
+        request, "Receita (Cascata) · Falconi", None, "receita/receita.html",
+        lambda filtros: {"waterfall_data": _dados_cascata(filtros)},
+    )
+
+
+@condicional_por_versao
+async def poc(request):
+    return await _pagina(request, "PoC · Falconi", ("Carteira", "Receita_PoC"), "receita/poc.html", _aba("poc"))
+
+
+@condicional_por_versao
+async def success_fee(request):
+    return await _pagina(
+        request, "Success Fee · Falconi", ("Carteira", "Receita_SuccessFee"), "receita/success_fee.html", _aba("success_fee"),
+    )
+
+
+@condicional_por_versao
+async def produtos(request):
+    return await _pagina(
+        request, "Produtos · Falconi", ("Carteira", "Receita_Produto", "Carteira_Produto"), "receita/produtos.html", _aba("produtos"),
+    )
+
+
+@condicional_por_versao
+async def pendente_formacao(request):
+    return await _pagina(
+        request, "Pendente Formação · Falconi", ("Carteira", "Pendente_Alocacao_HD"), "receita/pendente_formacao.html",
+        _aba("pend_formacao"),
+    )
+
+
+@condicional_por_versao
+async def pendente_assinatura(request):
+    return await _pagina(request, "Pendente Assinatura · Falconi", None, "receita/pendente_assinatura.html", _aba("pend_assinatura"))
+
+
+@condicional_por_versao
+async def receita_potencial(request):
+    return await _pagina(request, "Receita Potencial · Falconi", None, "receita/receita_potencial.html", _aba("potencial"))
+
+
+@condicional_por_versao
+async def exportar_excel(request, tipo: str):
+    """Mesma exportação de views.exportar_excel; o arquivo é gerado no executor, bloco a bloco."""
+    corpo, content_type, cabecalhos = await em_executor(_exportacao, request, tipo)
+    resp = StreamingHttpResponse(iterar_em_executor(corpo), content_type=content_type)
+    for nome, valor in cabecalhos.items():
+        resp[nome] = valor
+    return resp
+
+
+@condicional_por_versao
+async def exportar_todas(request):
+    f = _get_filtros(request)
+    limite = limite_linhas(_parametro_int(request, "limite"))
+    # pipeline/filtros/tabelas calculados antes da resposta (no executor); o streaming só serializa
+    planilhas = await em_executor(planilhas_todas, Config(), f["mes"], f["status"], f["carteira"], limite)
+    resp = StreamingHttpResponse(iterar_em_executor(xlsx_streaming(planilhas)), content_type=CONTENT_TYPES["xlsx"])
+    resp["Content-Disposition"] = f'attachment; filename="{ARQUIVO_TODAS}.xlsx"'
+    return resp
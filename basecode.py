@@ -20,9 +20,21 @@ Observações:
 
 from __future__ import annotations
 
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
 import typing as t
-from dataclasses import dataclass
-from datetime import date
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
 import numpy as np
 import pandas as pd
 
@@ -55,6 +67,9 @@ class Config:
     # ---------- BigQuery ----------
     bigquery_project_id: t.Optional[str] = None  # ex.: "seu-projeto-gcp"
 
+    # ---------- Execução ----------
+    pipeline_workers: int = 8  # etapas independentes do run_pipeline rodando em paralelo
+
 
 # ===================== Utils ===================== #
 
@@ -63,29 +78,353 @@ def start_of_current_month() -> pd.Timestamp:
     return pd.Timestamp(today.year, today.month, 1)
 
 
-def _read_access_table(db_path: str, table_name: str, where_sql: str | None = None) -> pd.DataFrame:
+# ---------- Memo de leituras por execução ---------- #
+
+class _ReadScope:
     """
-    Lê tabela do Access usando pyodbc. Requer o driver do Access instalado.
+    Memo das leituras Access/BigQuery de um resultado do pipeline: cada fonte física
+    (mesma tabela/where ou mesmo SQL/projeto) é buscada uma única vez e compartilhada.
+    Falhas também são memorizadas (os loaders "aux_*" usam exceção como fallback).
+    Guarda também os fingerprints das fontes (_memo_fingerprint): cada COUNT/MAX no Access
+    ou consulta a __TABLES__ no BigQuery roda uma vez por execução, não uma por etapa.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[tuple, dict[str, t.Any]] = {}
+
+    def get(self, key: tuple, loader: t.Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        # cópia: os loaders alteram colunas in-place (ex.: PER_REF)
+        return self.value(key, loader).copy()
+
+    def value(self, key: tuple, loader: t.Callable[[], t.Any]) -> t.Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {"lock": threading.Lock(), "done": False, "value": None, "error": None}
+        # lock por chave: leituras concorrentes da mesma fonte esperam a primeira
+        with entry["lock"]:
+            if not entry["done"]:
+                try:
+                    entry["value"] = loader()
+                except Exception as e:
+                    entry["error"] = e
+                entry["done"] = True
+        if entry["error"] is not None:
+            raise entry["error"]
+        return entry["value"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def discard_errors(self) -> None:
+        """Esquece leituras que falharam (para que uma nova tentativa leia de novo)."""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e["done"] and e["error"] is not None]:
+                del self._entries[key]
+
+
+_READ_SCOPE: contextvars.ContextVar[_ReadScope | None] = contextvars.ContextVar("_READ_SCOPE", default=None)
+
+
+# ---------- Fontes lidas por etapa (refresh incremental) ---------- #
+
+class _StageSources:
+    """
+    Fontes lidas por uma etapa em execução, com o fingerprint de cada uma no momento da
+    leitura, e o tempo/linhas gastos nessas leituras (relatório da etapa).
     """
+
+    def __init__(self, fingerprint: t.Callable[[tuple], t.Any]):
+        self._fingerprint = fingerprint
+        self.sources: dict[tuple, t.Any] = {}
+        self.read_s = 0.0
+        self.read_rows = 0
+        self._lock = threading.Lock()
+
+    def add(self, src: tuple) -> None:
+        if src not in self.sources:
+            # calculado antes da leitura: se a fonte mudar no meio, o próximo refresh percebe
+            self.sources[src] = self._fingerprint(src)
+
+    def add_read(self, seconds: float, rows: int) -> None:
+        with self._lock:
+            self.read_s += seconds
+            self.read_rows += rows
+
+
+_STAGE_SOURCES: contextvars.ContextVar[_StageSources | None] = contextvars.ContextVar("_STAGE_SOURCES", default=None)
+
+
+def _track_source(src: tuple) -> None:
+    tracker = _STAGE_SOURCES.get()
+    if tracker is not None:
+        tracker.add(src)
+
+
+def _timed_read(load: t.Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """Executa a leitura contabilizando tempo e linhas na etapa em execução."""
+    t0 = time.perf_counter()
+    df = load()
+    tracker = _STAGE_SOURCES.get()
+    if tracker is not None:
+        tracker.add_read(time.perf_counter() - t0, len(df))
+    return df
+
+
+def _memo_read(key: tuple, loader: t.Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    scope = _READ_SCOPE.get()
+    if scope is None:
+        return loader()
+    return scope.get(key, loader)
+
+
+def _memo_fingerprint(key: tuple, compute: t.Callable[[], t.Any]) -> t.Any:
+    scope = _READ_SCOPE.get()
+    if scope is None:
+        return compute()
+    return scope.value(("fingerprint", *key), compute)
+
+
+def _pyodbc_connect(conn_str: str):
     try:
         import pyodbc  # type: ignore
     except Exception as e:
         raise RuntimeError(
             "pyodbc não está instalado. Instale `pip install pyodbc` e configure o driver do Access."
         ) from e
+    return pyodbc.connect(conn_str)
+
+
+# Função "connect(conn_str)" usada para abrir conexões (pyodbc por padrão; ver configure_access_pool)
+_ACCESS_DRIVER: t.Callable[[str], t.Any] = _pyodbc_connect
 
+
+def _access_connect(db_path: str):
+    """
+    Abre conexão nova com a base Access. Requer o driver do Access instalado.
+    """
     conn_str = (
         r"Driver={Microsoft Access Driver (*.mdb, *.accdb)};"
         rf"DBQ={db_path};"
     )
-    sql = f"SELECT * FROM [{table_name}]"
-    if where_sql:
-        sql += f" WHERE {where_sql}"
-    with pyodbc.connect(conn_str) as con:
-        return pd.read_sql(sql, con)
+    return _ACCESS_DRIVER(conn_str)
 
 
-def _read_bigquery_sql(sql: str, project_id: str | None) -> pd.DataFrame:
+# ---------- Pool de conexões Access ---------- #
+
+ACCESS_POOL_MAX_SIZE = 4          # conexões por arquivo .accdb
+ACCESS_POOL_TIMEOUT = 60.0        # espera máxima (s) por uma conexão livre
+ACCESS_POOL_CHECK_AFTER = 30.0    # conexões ociosas há mais tempo passam por health check
+
+
+class _AccessPool:
+    """
+    Pool de conexões para um único db_path, compartilhado entre leituras e entre execuções
+    do pipeline. Checkout/checkin thread-safe, limite de conexões abertas e health check
+    ("SELECT 1") das conexões que ficaram ociosas ou cujo último uso terminou em erro.
+    """
+
+    def __init__(self, db_path: str, max_size: int, timeout: float):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: list[tuple[t.Any, float]] = []   # (conexão, instante em que foi liberada)
+        self._abertas = 0
+        self._cond = threading.Condition()
+        self.criadas = 0
+        self.descartadas = 0
+
+    @staticmethod
+    def _saudavel(con) -> bool:
+        try:
+            cur = con.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _descartar(self, con) -> None:
+        try:
+            con.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._abertas -= 1
+            self.descartadas += 1
+            self._cond.notify()
+
+    def checkout(self):
+        prazo = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._abertas >= self.max_size:
+                    restante = prazo - time.monotonic()
+                    if restante <= 0:
+                        raise RuntimeError(f"Timeout aguardando conexão Access livre para {self.db_path}")
+                    self._cond.wait(restante)
+                if self._idle:
+                    con, liberada_em = self._idle.pop()
+                else:
+                    self._abertas += 1
+                    con, liberada_em = None, None
+
+            if con is None:
+                try:
+                    con = _access_connect(self.db_path)
+                except Exception:
+                    with self._cond:
+                        self._abertas -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.criadas += 1
+                return con
+
+            if time.monotonic() - liberada_em < ACCESS_POOL_CHECK_AFTER or self._saudavel(con):
+                return con
+            self._descartar(con)
+
+    def checkin(self, con, suspeita: bool = False) -> None:
+        # suspeita=True (uso terminou em exceção) força o health check no próximo checkout
+        with self._cond:
+            self._idle.append((con, float("-inf") if suspeita else time.monotonic()))
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for con, _ in idle:
+            self._descartar(con)
+
+
+_ACCESS_POOLS: dict[str, _AccessPool] = {}
+_ACCESS_POOLS_LOCK = threading.Lock()
+
+
+def _access_pool(db_path: str) -> _AccessPool:
+    with _ACCESS_POOLS_LOCK:
+        pool = _ACCESS_POOLS.get(db_path)
+        if pool is None:
+            pool = _ACCESS_POOLS[db_path] = _AccessPool(db_path, ACCESS_POOL_MAX_SIZE, ACCESS_POOL_TIMEOUT)
+        return pool
+
+
+@contextmanager
+def _access_connection(db_path: str):
+    """Empresta uma conexão do pool do db_path (devolvida ao sair do bloco)."""
+    pool = _access_pool(db_path)
+    con = pool.checkout()
+    ok = False
+    try:
+        yield con
+        ok = True
+    finally:
+        pool.checkin(con, suspeita=not ok)
+
+
+def close_access_pools() -> None:
+    with _ACCESS_POOLS_LOCK:
+        pools = list(_ACCESS_POOLS.values())
+        _ACCESS_POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_access_pools)
+
+
+def configure_access_pool(
+    max_size: int | None = None,
+    timeout: float | None = None,
+    driver: t.Callable[[str], t.Any] | None = None,
+) -> None:
+    """
+    Ajusta limites do pool e/ou o driver ("connect(conn_str)"). Fecha os pools existentes
+    para que as novas configurações valham para todas as conexões.
+    """
+    global ACCESS_POOL_MAX_SIZE, ACCESS_POOL_TIMEOUT, _ACCESS_DRIVER
+    if max_size is not None:
+        ACCESS_POOL_MAX_SIZE = max_size
+    if timeout is not None:
+        ACCESS_POOL_TIMEOUT = timeout
+    if driver is not None:
+        _ACCESS_DRIVER = driver
+    close_access_pools()
+
+
+# Operadores aceitos nos filtros empurrados para o Access (valores sempre como parâmetros "?")
+_ACCESS_OPS = {"=", "<>", "<", "<=", ">", ">=", "IN"}
+
+AccessFilter = t.Tuple[str, str, t.Any]
+
+
+def _access_ident(name: str) -> str:
+    if "[" in name or "]" in name:
+        raise ValueError(f"Identificador inválido para o Access: {name!r}")
+    return f"[{name}]"
+
+
+def _build_access_select(
+    table_name: str,
+    columns: t.Sequence[str] | None = None,
+    filters: t.Sequence[AccessFilter] | None = None,
+) -> tuple[str, list[t.Any]]:
+    """
+    Monta "SELECT <colunas> FROM [tabela] WHERE ..." parametrizado.
+    filters: [(coluna, operador, valor)], com operador em _ACCESS_OPS; "IN" recebe uma sequência.
+    """
+    cols_sql = ", ".join(_access_ident(c) for c in columns) if columns else "*"
+    sql = f"SELECT {cols_sql} FROM {_access_ident(table_name)}"
+    params: list[t.Any] = []
+    conds: list[str] = []
+    for col, op, value in filters or []:
+        op = op.upper()
+        if op not in _ACCESS_OPS:
+            raise ValueError(f"Operador não suportado: {op!r}")
+        if op == "IN":
+            values = list(value)
+            if not values:
+                raise ValueError(f"Filtro IN vazio para {col!r}")
+            conds.append(f"{_access_ident(col)} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        else:
+            conds.append(f"{_access_ident(col)} {op} ?")
+            params.append(value)
+    if conds:
+        sql += " WHERE " + " AND ".join(conds)
+    return sql, params
+
+
+def _read_access_table(
+    db_path: str,
+    table_name: str,
+    columns: t.Sequence[str] | None = None,
+    filters: t.Sequence[AccessFilter] | None = None,
+) -> pd.DataFrame:
+    """
+    Lê tabela do Access usando pyodbc. Requer o driver do Access instalado.
+    "columns" e "filters" são empurrados para o SQL (projeção + WHERE com parâmetros).
+    """
+    sql, params = _build_access_select(table_name, columns, filters)
+
+    def _load() -> pd.DataFrame:
+        with _access_connection(db_path) as con:
+            return pd.read_sql(sql, con, params=params or None)
+
+    _track_source(("access", db_path, table_name))
+    key = (
+        "access", db_path, table_name,
+        tuple(columns) if columns else None,
+        tuple((c, o.upper(), tuple(v) if o.upper() == "IN" else v) for c, o, v in filters or []),
+    )
+    return _timed_read(lambda: _memo_read(key, _load))
+
+
+def _query_bigquery(sql: str, project_id: str | None) -> pd.DataFrame:
     if project_id is None:
         raise RuntimeError("Defina Config.bigquery_project_id para usar BigQuery.")
     try:
@@ -97,12 +436,19 @@ def _read_bigquery_sql(sql: str, project_id: str | None) -> pd.DataFrame:
     return pd.read_gbq(sql, project_id=project_id, dialect="standard")
 
 
+def _read_bigquery_sql(sql: str, project_id: str | None) -> pd.DataFrame:
+    _track_source(("bigquery", sql, project_id))
+    return _timed_read(lambda: _memo_read(("bigquery", sql, project_id), lambda: _query_bigquery(sql, project_id)))
+
+
 def _read_csv(path: str, **kwargs) -> pd.DataFrame:
-    return pd.read_csv(path, **kwargs)
+    _track_source(("arquivo", path))
+    return _timed_read(lambda: pd.read_csv(path, **kwargs))
 
 
 def _read_excel(path: str, sheet: str | int = 0, header: int | None = 0) -> pd.DataFrame:
-    return pd.read_excel(path, sheet_name=sheet, header=header)
+    _track_source(("arquivo", path))
+    return _timed_read(lambda: pd.read_excel(path, sheet_name=sheet, header=header))
 
 
 def _normalize_carteira(s: pd.Series) -> pd.Series:
@@ -115,6 +461,161 @@ def _normalize_carteira(s: pd.Series) -> pd.Series:
     return s.replace(rep)
 
 
+# ===================== Fingerprint das fontes ===================== #
+
+# Arquivos locais (CSV/Excel/Access) – comparados por mtime/tamanho.
+_CAMPOS_ARQUIVO = [
+    "access_db_razao", "access_db_caixa", "access_db_resultado", "access_db_roda_razao",
+    "csv_projeto_risco", "csv_meta_vendas_td", "csv_meta_receita", "csv_meta_vendas",
+    "csv_mob", "csv_carteira", "xlsx_percentual_meta", "xlsx_recebimento", "xlsx_depara_un",
+    "csv_aux_estoque_meta", "csv_aux_estoque_safra",
+]
+
+# Tabelas Access lidas pelo pipeline e os agregados (além do COUNT(*)) usados para detectar
+# nova carga/alteração: a competência (PER_REF) nas bases com carga mensal; nas oportunidades,
+# que são editadas no lugar (sem mudar a contagem), a data da safra e a soma dos valores.
+_ACCESS_TABELAS_FONTE = {
+    "access_db_razao": [("tbl_BaseRazao_Acumulada", (("MAX", "PER_REF"),))],
+    "access_db_caixa": [("tbl_Carteira_Completa", (("MAX", "PER_REF"),))],
+    "access_db_resultado": [
+        ("tbl_OpportunityVendasCompleta", (("MAX", "Safra"), ("SUM", "Valor_Frente"))),
+        ("tbl_Dimensionamento_EquipeVendida", (("MAX", "PER_REF"),)),
+    ],
+    "access_db_roda_razao": [("tbl_Cotacoes", (("MAX", "PER_REF"),))],
+}
+
+# Tabelas BigQuery consultadas (via _SQL_FONTE_GERAL e afins).
+_BQ_TABELAS_FONTE = ["data-plataform-prd.cfo_contabilidade.receita_poc"]
+
+
+def _file_fingerprint(path: str | None) -> tuple[int, int] | None:
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _access_table_fingerprint(db_path: str, table_name: str, agregados: tuple[tuple[str, str], ...] = ()) -> tuple:
+    """
+    (linhas, *agregados) da tabela – bem mais barato do que ler a tabela inteira.
+    Memorizado por execução do pipeline (mesmo valor para todas as etapas que leem a tabela).
+    """
+    def _consultar() -> tuple:
+        agg = ", ".join(["COUNT(*)"] + [f"{fn}({_access_ident(col)})" for fn, col in agregados])
+        sql = f"SELECT {agg} FROM {_access_ident(table_name)}"
+        with _access_connection(db_path) as con:
+            cur = con.cursor()
+            cur.execute(sql)
+            row = cur.fetchone()
+            cur.close()
+        return tuple(str(v) for v in row)
+
+    return _memo_fingerprint(("access", db_path, table_name, agregados), _consultar)
+
+
+def _bigquery_table_fingerprint(table_id: str, project_id: str | None) -> tuple:
+    """
+    (última modificação, linhas) via metadados __TABLES__ – consulta sem custo de varredura.
+    """
+    def _consultar() -> tuple:
+        dataset, table = table_id.rsplit(".", 1)
+        sql = f"SELECT last_modified_time, row_count FROM `{dataset}.__TABLES__` WHERE table_id = '{table}'"
+        df = _query_bigquery(sql, project_id)
+        if df.empty:
+            return (None, None)
+        return (str(df.iloc[0, 0]), str(df.iloc[0, 1]))
+
+    return _memo_fingerprint(("bigquery", table_id, project_id), _consultar)
+
+
+# hash de conteúdo por (caminho, mtime, tamanho): só relê o arquivo quando o stat muda
+_FILE_HASHES: dict[tuple, str] = {}
+_FILE_HASHES_LOCK = threading.Lock()
+
+
+def _file_hash(path: str) -> tuple[int, str] | None:
+    """(tamanho, sha1 do conteúdo) – um "touch" sem alteração não conta como mudança."""
+    st = _file_fingerprint(path)
+    if st is None:
+        return None
+    key = (path, *st)
+    with _FILE_HASHES_LOCK:
+        digest = _FILE_HASHES.get(key)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with _FILE_HASHES_LOCK:
+            _FILE_HASHES[key] = digest
+    return (st[1], digest)
+
+
+def _source_fingerprint(src: tuple) -> t.Any:
+    """
+    Fingerprint de uma fonte registrada por _track_source:
+      - ("arquivo", path): tamanho + hash do conteúdo
+      - ("access", db_path, tabela): linhas + agregados de _ACCESS_TABELAS_FONTE
+      - ("bigquery", sql, projeto): metadados das tabelas citadas no SQL; None se não houver
+    None = desconhecido (a etapa é sempre recalculada). Falhas viram "erro:<Tipo>".
+    """
+    try:
+        kind = src[0]
+        if kind == "arquivo":
+            return _file_hash(src[1])
+        if kind == "access":
+            _, db_path, table_name = src
+            agregados = {tb: agg for tabelas in _ACCESS_TABELAS_FONTE.values() for tb, agg in tabelas}
+            return _access_table_fingerprint(db_path, table_name, agregados.get(table_name, ()))
+        if kind == "bigquery":
+            _, sql, project_id = src
+            tables = sorted(set(re.findall(r"`([^`]+)`", sql)))
+            if not tables:
+                return None
+            return tuple(_bigquery_table_fingerprint(tid, project_id) for tid in tables)
+    except Exception as e:
+        return f"erro:{type(e).__name__}"
+    return None
+
+
+def fingerprint_fontes(cfg: Config, completo: bool = True) -> dict[str, dict[str, t.Any]]:
+    """
+    Identifica o estado atual das fontes do pipeline.
+      - "arquivos": (mtime, tamanho) de cada caminho do Config (barato, só stat)
+      - "access"/"bigquery" (quando completo=True): linhas + agregados / metadados da tabela
+    Falhas de leitura viram "erro:<Tipo>" – o fingerprint nunca levanta exceção. Para
+    compartilhar as consultas com as etapas de um run, use PipelineResult.fingerprint().
+    """
+    out: dict[str, dict[str, t.Any]] = {
+        "arquivos": {c: _file_fingerprint(getattr(cfg, c, None)) for c in _CAMPOS_ARQUIVO},
+    }
+    if not completo:
+        return out
+
+    access: dict[str, t.Any] = {}
+    for campo, tabelas in _ACCESS_TABELAS_FONTE.items():
+        db_path = getattr(cfg, campo)
+        for table_name, agregados in tabelas:
+            try:
+                access[f"{campo}:{table_name}"] = _access_table_fingerprint(db_path, table_name, agregados)
+            except Exception as e:
+                access[f"{campo}:{table_name}"] = f"erro:{type(e).__name__}"
+    out["access"] = access
+
+    bq: dict[str, t.Any] = {}
+    for table_id in _BQ_TABELAS_FONTE:
+        try:
+            bq[table_id] = _bigquery_table_fingerprint(table_id, cfg.bigquery_project_id)
+        except Exception as e:
+            bq[table_id] = f"erro:{type(e).__name__}"
+    out["bigquery"] = bq
+    return out
+
+
 # ===================== tD_* auxiliares (CSV/Excel) ===================== #
 
 def tD_meta_vendas_td(cfg: Config) -> pd.DataFrame:
@@ -274,7 +775,11 @@ def tbl_opportunity_vendas_completa(cfg: Config) -> pd.DataFrame:
 
 
 def tbl_dimensionamento_equipe_vendida(cfg: Config) -> pd.DataFrame:
-    df = _read_access_table(cfg.access_db_resultado, "tbl_Dimensionamento_EquipeVendida")
+    df = _read_access_table(
+        cfg.access_db_resultado, "tbl_Dimensionamento_EquipeVendida",
+        columns=["codigofrente", "PER_REF", "QTD_HD", "nomestatus_agenda"],
+        filters=[("PER_REF", ">=", date(2025, 1, 1)), ("nomestatus_agenda", "=", "Equipe vendida atual")],
+    )
     if "PER_REF" in df.columns:
         df["PER_REF"] = pd.to_datetime(df["PER_REF"], errors="coerce").dt.date
         df = df[df["PER_REF"] >= date(2025,1,1)]
@@ -284,7 +789,7 @@ def tbl_dimensionamento_equipe_vendida(cfg: Config) -> pd.DataFrame:
 
 
 def tbl_cotacoes(cfg: Config) -> pd.DataFrame:
-    df = _read_access_table(cfg.access_db_roda_razao, "tbl_Cotacoes")
+    df = _read_access_table(cfg.access_db_roda_razao, "tbl_Cotacoes", columns=["PER_REF", "USD", "MXN"])
     if "PER_REF" in df.columns:
         df["PER_REF"] = pd.to_datetime(df["PER_REF"], errors="coerce").dt.date
     for c in ["USD","MXN"]:
@@ -307,8 +812,22 @@ def receita_poc_2025_mes(cfg: Config) -> pd.DataFrame:
 
 # ===================== **PRIMEIRA LEVA** ===================== #
 
+# Razão acumulado: uma leitura projetada/filtrada atende PoC, Produto e Success Fee
+# (o memo do run_pipeline compartilha o resultado entre os três).
+_RAZAO_COLS = ["Carteira_Atual", "PER_REF", "Valor_Contabil_Ajustado", "Cliente", "Frente", "Class_DRE", "Class_DRE_2"]
+_RAZAO_CLASSES = ("Receita POC", "Produtos", "SUCCESS FEE")
+
+
+def _razao_acumulada(cfg: Config) -> pd.DataFrame:
+    return _read_access_table(
+        cfg.access_db_razao, "tbl_BaseRazao_Acumulada",
+        columns=_RAZAO_COLS,
+        filters=[("PER_REF", ">=", date(2025, 1, 1)), ("Class_DRE_2", "IN", _RAZAO_CLASSES)],
+    )
+
+
 def tf_receita_poc(cfg: Config) -> pd.DataFrame:
-    df = _read_access_table(cfg.access_db_razao, "tbl_BaseRazao_Acumulada")
+    df = _razao_acumulada(cfg)
     if "PER_REF" in df.columns:
         df["PER_REF"] = pd.to_datetime(df["PER_REF"], errors="coerce").dt.date
     df = df[
@@ -335,7 +854,7 @@ def tf_receita_poc(cfg: Config) -> pd.DataFrame:
 
 
 def tf_receita_produto(cfg: Config) -> pd.DataFrame:
-    df = _read_access_table(cfg.access_db_razao, "tbl_BaseRazao_Acumulada")
+    df = _razao_acumulada(cfg)
     if "PER_REF" in df.columns:
         df["PER_REF"] = pd.to_datetime(df["PER_REF"], errors="coerce").dt.date
     df = df[(df.get("Class_DRE_2") == "Produtos") & (df["PER_REF"] >= date(2025, 1, 1))].copy()
@@ -355,7 +874,7 @@ def tf_receita_produto(cfg: Config) -> pd.DataFrame:
 
 
 def tf_receita_successfee(cfg: Config) -> pd.DataFrame:
-    df = _read_access_table(cfg.access_db_razao, "tbl_BaseRazao_Acumulada")
+    df = _razao_acumulada(cfg)
     if "PER_REF" in df.columns:
         df["PER_REF"] = pd.to_datetime(df["PER_REF"], errors="coerce").dt.date
     df = df[(df.get("Class_DRE_2") == "SUCCESS FEE") & (df["PER_REF"] >= date(2025, 1, 1))].copy()
@@ -409,21 +928,20 @@ def tf_estoque(cfg: Config, tbl_PendenteAlocacao: pd.DataFrame | None = None) ->
         ReceitaRepresadaAc=("valor_represado_acumulado", "sum"),
         ReceitaRecuperadaAc=("valor_recuperado_acumulado", "sum"),
     ).reset_index()
-    out_frames = []
-    for cod, sub in agg.groupby("codigo_frente", dropna=False):
-        sub = sub.sort_values("mes_calendario").copy()
-        sub["Estoque.ReceitaRepresadaFinalSaldo"] = sub["ReceitaRepresadaAc"] - sub["ReceitaRecuperadaAc"]
-        sub["Estoque.ReceitaRepresadaFinal"] = sub["Estoque.ReceitaRepresadaFinalSaldo"].diff()
-        if not sub.empty:
-            sub.loc[sub.index[0], "Estoque.ReceitaRepresadaFinal"] = sub.loc[sub.index[0], "Estoque.ReceitaRepresadaFinalSaldo"]
-        out_frames.append(sub)
-    estoque = pd.concat(out_frames, ignore_index=True) if out_frames else agg
+    # uma ordenação estável (frente, mês) e diff global: a 1ª linha de cada frente recebe o saldo
+    estoque = agg.sort_values(["codigo_frente", "mes_calendario"], kind="mergesort", ignore_index=True)
+    saldo = estoque["ReceitaRepresadaAc"] - estoque["ReceitaRecuperadaAc"]
+    primeira = ~estoque["codigo_frente"].duplicated()
+    estoque["Estoque.ReceitaRepresadaFinalSaldo"] = saldo
+    estoque["Estoque.ReceitaRepresadaFinal"] = saldo.diff().where(~primeira, saldo)
+    estoque["mes_calendario"] = estoque["mes_calendario"].dt.date
     if tbl_PendenteAlocacao is not None and not tbl_PendenteAlocacao.empty:
-        estoque = pd.concat([estoque, tbl_PendenteAlocacao], ignore_index=True, sort=False)
-    estoque["mes_calendario"] = pd.to_datetime(estoque["mes_calendario"], errors="coerce").dt.date
-    for c in ["Estoque.ReceitaRepresadaFinalSaldo", "Estoque.ReceitaRepresadaFinal"]:
-        if c in estoque.columns:
-            estoque[c] = pd.to_numeric(estoque[c], errors="coerce").fillna(0.0)
+        # só o bloco anexado é convertido; o estoque já está nos tipos finais
+        pend = tbl_PendenteAlocacao.copy()
+        pend["mes_calendario"] = pd.to_datetime(pend["mes_calendario"], errors="coerce").dt.date
+        for c in ["Estoque.ReceitaRepresadaFinalSaldo", "Estoque.ReceitaRepresadaFinal"]:
+            pend[c] = pd.to_numeric(pend[c], errors="coerce").fillna(0.0) if c in pend.columns else 0.0
+        estoque = pd.concat([estoque, pend], ignore_index=True, sort=False)
     return estoque
 
 
@@ -452,8 +970,23 @@ def tf_receita_cancelada(cfg: Config) -> pd.DataFrame:
 
 # ===================== **SEGUNDA LEVA** ===================== #
 
+# Carteira completa (caixa): Produto e Success Fee futuros saem da mesma leitura.
+_CARTEIRA_COLS = ["Tipo_Item", "PER_REF", "NOME_CARTEIRA", "Valor", "cliente", "ID_FRENTE"]
+_CARTEIRA_TIPOS = ("Licenciamento de Sistemas", "Success Fee")
+
+
+def _carteira_completa(cfg: Config) -> pd.DataFrame:
+    # ambos os loaders descartam competências anteriores ao mês corrente
+    per_min = max(date(2025, 1, 1), start_of_current_month().date())
+    return _read_access_table(
+        cfg.access_db_caixa, "tbl_Carteira_Completa",
+        columns=_CARTEIRA_COLS,
+        filters=[("Tipo_Item", "IN", _CARTEIRA_TIPOS), ("PER_REF", ">=", per_min)],
+    )
+
+
 def tf_carteira_produto(cfg: Config) -> pd.DataFrame:
-    df = _read_access_table(cfg.access_db_caixa, "tbl_Carteira_Completa")
+    df = _carteira_completa(cfg)
     df = df[df.get("Tipo_Item") == "Licenciamento de Sistemas"].copy()
     df["PER_REF"] = pd.to_datetime(df["PER_REF"], errors="coerce").dt.date
     df = df[df["PER_REF"] >= date(2025, 1, 1)].copy()
@@ -472,7 +1005,7 @@ def tf_carteira_produto(cfg: Config) -> pd.DataFrame:
 
 
 def tf_carteira_successfee(cfg: Config) -> pd.DataFrame:
-    df = _read_access_table(cfg.access_db_caixa, "tbl_Carteira_Completa")
+    df = _carteira_completa(cfg)
     df = df[df.get("Tipo_Item") == "Success Fee"].copy()
     df["PER_REF"] = pd.to_datetime(df["PER_REF"], errors="coerce").dt.date
     df = df[df["PER_REF"] >= date(2025, 1, 1)].copy()
@@ -547,28 +1080,98 @@ def tbl_pendente_alocacao_hd_v2(
     cur = start_of_current_month()
     dim["PER_REF"] = dim["PER_REF"].fillna(cur)
 
+    return _alocar_pendente_hd(rec, dim, cur)
+
+
+def _add_months_clip(ts: pd.Series, months: np.ndarray) -> np.ndarray:
+    """
+    (ts + DateOffset(months=k)).normalize() vetorizado: soma k meses no índice int64 de mês
+    e limita o dia ao último dia do mês de destino (31/01 + 1 mês = 28/02). NaT segue NaT.
+    """
+    vals = ts.to_numpy(dtype="datetime64[ns]")
+    nat = np.isnat(vals)
+    days = vals.astype("datetime64[D]")
+    mes0 = days.astype("datetime64[M]")
+    dia = (days - mes0).astype(np.int64)  # 0-based
+    alvo = mes0 + months.astype(np.int64)
+    inicio = alvo.astype("datetime64[D]")
+    ultimo = (alvo + 1).astype("datetime64[D]") - inicio - 1
+    out = (inicio + np.minimum(dia, ultimo.astype(np.int64))).astype("datetime64[ns]")
+    out[nat] = np.datetime64("NaT")
+    return out
+
+
+def _alocar_pendente_hd(rec: pd.DataFrame, dim: pd.DataFrame, cur: pd.Timestamp) -> pd.DataFrame:
+    """
+    Distribui a receita pendente de cada frente pelos meses do dimensionamento, na proporção
+    QTD_HD / TotalHD da frente; frentes com início no passado são deslocadas para começar no
+    mês corrente (mesmo deslocamento para todos os meses da frente).
+    """
     jd = rec.merge(dim, left_on="codigo_frente", right_on="codigofrente", how="left")
-    tot = jd.groupby("codigo_frente", dropna=False)["QTD_HD"].sum().rename("TotalHD").reset_index()
-    jd = jd.merge(tot, on="codigo_frente", how="left")
-
-    mmin = jd.groupby("codigo_frente", dropna=False)["PER_REF"].min().rename("MinPER").reset_index()
-    jd = jd.merge(mmin, on="codigo_frente", how="left")
-    jd["MesesDeslocar"] = np.where(jd["MinPER"] < cur, (cur.year-jd["MinPER"].dt.year)*12 + (cur.month-jd["MinPER"].dt.month), 0)
-
-    def _calc_row(row):
-        if pd.isna(row["TotalHD"]) or row["TotalHD"] == 0:
-            return pd.Series({"mes_calendario": pd.NaT, "ReceitaPendenteAlocMes": np.nan})
-        valor = row["ReceitaPendAloc"] * (row["QTD_HD"] / row["TotalHD"])
-        mes = (row["PER_REF"] + pd.DateOffset(months=int(row["MesesDeslocar"]))).normalize()
-        return pd.Series({"mes_calendario": mes, "ReceitaPendenteAlocMes": valor})
-
-    out = jd.join(jd.apply(_calc_row, axis=1))
-    out = out[out["mes_calendario"].notna()].copy()
-    out = out[out["mes_calendario"] >= cur].copy()
-    out["mes_calendario"] = out["mes_calendario"].dt.date
+    grp = jd.groupby("codigo_frente", dropna=False)
+    total = grp["QTD_HD"].transform("sum")
+    min_per = grp["PER_REF"].transform("min")
+
+    atrasado = (min_per < cur).to_numpy()
+    desloc = np.zeros(len(jd), dtype=np.int64)
+    desloc[atrasado] = (
+        (cur.year - min_per[atrasado].dt.year) * 12 + (cur.month - min_per[atrasado].dt.month)
+    ).to_numpy(dtype=np.int64)
+
+    valido = (total.notna() & (total != 0)).to_numpy()
+    mes = _add_months_clip(jd["PER_REF"], desloc)
+    with np.errstate(divide="ignore", invalid="ignore"):  # TotalHD 0/NaN: linha descartada abaixo
+        valor = jd["ReceitaPendAloc"].to_numpy(dtype=float) * (
+            jd["QTD_HD"].to_numpy(dtype=float) / total.to_numpy(dtype=float)
+        )
+
+    keep = valido & ~np.isnat(mes) & (mes >= cur.to_datetime64())
+    out = jd.loc[keep, ["Check", "codigo_frente", "nome_cliente"]].copy()
+    out["mes_calendario"] = pd.Series(mes[keep], index=out.index).dt.date
+    out["ReceitaPendenteAlocMes"] = valor[keep]
     return out[["Check","mes_calendario","codigo_frente","nome_cliente","ReceitaPendenteAlocMes"]]
 
 
+# prioridade da classificação: maior vence no rollup por frente/prefixo
+_CLASSES_OPORTUNIDADE = np.array([None, "Novo", "Renovação"], dtype=object)
+
+
+def _classificar_oportunidades(classe: pd.Series | None, frente: pd.Series | None) -> np.ndarray:
+    """
+    Novo/Renovação por oportunidade, na ordem:
+      1) a classificação da própria linha (vazio = sem classificação; "Novo" = Novo; resto = Renovação);
+      2) a da frente: Renovação se alguma linha da frente for Renovação, senão Novo se houver Novo;
+      3) a do prefixo (5 primeiros dígitos da frente): Renovação se alguma frente do prefixo
+         for Renovação, senão Novo.
+    Classes viram códigos 0/1/2 e os rollups são groupby max sobre os códigos.
+    """
+    n = len(frente) if classe is None else len(classe)
+    if classe is None:
+        prio = np.zeros(n, dtype=np.int8)
+    else:
+        # normaliza só os valores distintos (poucos) e espalha pelos códigos
+        cod, valores = pd.factorize(classe)
+        txt = [str(v).strip() for v in valores]
+        prio_valor = np.array([0 if c == "" else 1 if c == "Novo" else 2 for c in txt], dtype=np.int8)
+        prio = np.where(cod < 0, 0, prio_valor[cod] if len(valores) else 0).astype(np.int8)
+
+    if frente is None:
+        cod_frente = np.zeros(n, dtype=np.intp)  # todas as linhas na mesma "frente" vazia
+        cod_prefixo = cod_frente
+    else:
+        # frentes sem código formam um grupo próprio ("<NA>"), como texto
+        cod_frente, frentes = pd.factorize(frente.astype("Int64"), use_na_sentinel=False)
+        prefixos = ["<NA>" if pd.isna(v) else str(v)[:5] for v in frentes]
+        cod_prefixo = pd.factorize(pd.Series(prefixos, dtype=object))[0][cod_frente]
+
+    p = pd.Series(prio)
+    por_frente = p.groupby(cod_frente).transform("max").to_numpy()
+    por_prefixo = np.where(p.groupby(cod_prefixo).transform("max").to_numpy() == 2, 2, 1)
+
+    final = np.select([prio > 0, por_frente > 0], [prio, por_frente], default=por_prefixo)
+    return _CLASSES_OPORTUNIDADE[final]
+
+
 def tbl_vendas(cfg: Config) -> pd.DataFrame:
     import pandas as pd
 
@@ -595,77 +1198,19 @@ def tbl_vendas(cfg: Config) -> pd.DataFrame:
     if "Valor_Frente" in df.columns:
         df["Valor_Frente"] = pd.to_numeric(df["Valor_Frente"], errors="coerce")
 
-    # Classificação (Novo/Renovação)
-    def norm_class(c):
-        if pd.isna(c) or str(c).strip() == "":
-            return None
-        return "Novo" if str(c).strip() == "Novo" else "Renovação"
-
-    if "classificacaooportunidade__c" in df.columns:
-        df["class_norm"] = df["classificacaooportunidade__c"].apply(norm_class)
-    else:
-        df["class_norm"] = None
-
     # codigo_frente pode estar com outro nome; fallback para "Frente"
     if "codigo_frente" in df.columns:
         cod_raw = pd.to_numeric(df["codigo_frente"], errors="coerce")
     elif "Frente" in df.columns:
         cod_raw = pd.to_numeric(df["Frente"], errors="coerce")
     else:
-        cod_raw = pd.Series(dtype="float64")  # vazio
-
-    df["codigo_frente_txt"] = cod_raw.astype("Int64").astype(str) if not cod_raw.empty else ""
-
-    # Mapear classificação por frente
-    mapa_frente = (
-        df.groupby("codigo_frente_txt")["class_norm"]
-          .apply(lambda s: [x for x in s.dropna().tolist() if x != ""])
-          .reset_index(name="ListaClass")
-    )
+        cod_raw = None
 
-    def class_por_frente(lc):
-        if "Renovação" in lc:
-            return "Renovação"
-        if "Novo" in lc:
-            return "Novo"
-        return None
-
-    mapa_frente["class_por_frente"] = mapa_frente["ListaClass"].apply(class_por_frente)
-    mapa_frente = mapa_frente.drop(columns=["ListaClass"])
-
-    # Prefixo para fallback adicional
-    df["prefixo5"] = df["codigo_frente_txt"].astype(str).str[:5]
-
-    mapa_prefixo = (
-        mapa_frente.assign(prefixo5=mapa_frente["codigo_frente_txt"].astype(str).str[:5])
-        .groupby("prefixo5")["class_por_frente"]
-        .apply(lambda s: [x for x in s.dropna().tolist()])
-        .reset_index(name="Classes")
+    df["classificacao_final"] = _classificar_oportunidades(
+        df["classificacaooportunidade__c"] if "classificacaooportunidade__c" in df.columns else None,
+        cod_raw,
     )
 
-    def class_por_prefixo(cls):
-        if "Renovação" in cls:
-            return "Renovação"
-        return "Novo" if any(x == "Novo" for x in cls) else "Novo"
-
-    mapa_prefixo["class_por_prefixo"] = mapa_prefixo["Classes"].apply(class_por_prefixo)
-    mapa_prefixo = mapa_prefixo.drop(columns=["Classes"])
-
-    df = df.merge(mapa_frente, on="codigo_frente_txt", how="left") \
-           .merge(mapa_prefixo, on="prefixo5", how="left")
-
-    def class_final(row):
-        c1, c2, c3 = row.get("class_norm"), row.get("class_por_frente"), row.get("class_por_prefixo")
-        if c1 not in [None, ""]:
-            return c1
-        if c2 not in [None, ""]:
-            return c2
-        if c3 not in [None, ""]:
-            return c3
-        return "Novo"
-
-    df["classificacao_final"] = df.apply(class_final, axis=1)
-
     # Filtros mínimos esperados
     if "Status" in df.columns:
         df = df[df["Status"].isin(["Oficializado", "Vendido"])].copy()
@@ -817,99 +1362,469 @@ def tf_vendas(
                                combined.get("SuccessFee", 0) + combined.get("ReceitaProduto", 0)
     combined["DifMeta"] = combined.get("ReceitaMeta", 0) - combined["ReceitaTotal"]
 
-    id_cols = [c for c in ["Check", "mes_calendario", "codigo_frente", "nome_cliente", "status_frente"] if c in combined.columns]
-    value_cols = [c for c in combined.columns if c not in id_cols]
-    long_df = combined.melt(id_vars=id_cols, value_vars=value_cols, var_name="Atributo", value_name="Valor")
+    return _tipar_vendas(combined)
+
+
+def tf_vendas_long(tF_Vendas: pd.DataFrame) -> pd.DataFrame:
+    """Visão long (Atributo/Valor) do tF_Vendas – para exportação e consumidores legados."""
+    return _melt_vendas(tF_Vendas)
+
+
+_ID_COLS_VENDAS = ["Check", "mes_calendario", "codigo_frente", "nome_cliente", "status_frente"]
+
+
+def _dims_vendas(df: pd.DataFrame) -> list[str]:
+    """
+    Dimensões do tF_Vendas: Check, mes_calendario, codigo_frente, nome_cliente, status_frente
+    e colunas de texto de classificação/status (ex.: a classificação Novo/Renovação das Vendas).
+    As demais colunas são medidas.
+    """
+    dims = [c for c in _ID_COLS_VENDAS if c in df.columns]
+    dims += [
+        c for c in df.columns
+        if c not in dims and ("classificacao" in c or "status" in c)
+        and not pd.api.types.is_numeric_dtype(df[c])
+    ]
+    return dims
+
+
+def _tipar_vendas(combined: pd.DataFrame) -> pd.DataFrame:
+    """mes_calendario datetime64, codigo_frente Int64, textos category e medidas float64."""
+    dims = _dims_vendas(combined)
+    out = combined.copy()
+    if "mes_calendario" in out.columns:
+        out["mes_calendario"] = pd.to_datetime(out["mes_calendario"], errors="coerce")
+    if "codigo_frente" in out.columns:
+        out["codigo_frente"] = pd.to_numeric(out["codigo_frente"], errors="coerce").astype("Int64")
+    for c in out.columns:
+        if c in ("mes_calendario", "codigo_frente"):
+            continue
+        if c in dims:
+            out[c] = out[c].astype("category")
+        else:
+            out[c] = pd.to_numeric(out[c], errors="coerce").astype(np.float64)
+    return out
 
-    if "mes_calendario" in long_df.columns:
-        long_df["mes_calendario"] = pd.to_datetime(long_df["mes_calendario"], errors="coerce").dt.date
-    if "codigo_frente" in long_df.columns:
-        tmp = pd.to_numeric(long_df["codigo_frente"], errors="coerce")
-        long_df["codigo_frente"] = tmp.astype("Int64")
 
+def _melt_vendas(wide: pd.DataFrame) -> pd.DataFrame:
+    """
+    Long compacto do tF_Vendas (já tipado por _tipar_vendas): uma linha por (linha, medida)
+    com Valor diferente de zero/NaN; Atributo category (na ordem das colunas) e Valor float64.
+    """
+    dims = _dims_vendas(wide)
+    medidas = [c for c in wide.columns if c not in dims]
+
+    # matriz medidas x linhas: a ordem de np.nonzero repete a do melt (medida, depois linha)
+    valores = np.empty((len(medidas), len(wide)), dtype=np.float64)
+    for i, c in enumerate(medidas):
+        valores[i] = wide[c].to_numpy(dtype=np.float64, na_value=np.nan)
+    manter = (valores != 0) & ~np.isnan(valores)
+    med_idx, linhas = np.nonzero(manter)
+    base = wide[dims]
+
+    long_df = base.take(linhas).reset_index(drop=True)
+    long_df["Atributo"] = pd.Categorical.from_codes(med_idx, categories=medidas)
+    long_df["Valor"] = valores[manter]
     return long_df
 
 
 # ===================== Orquestração ===================== #
 
-def run_pipeline(cfg: Config) -> dict[str, pd.DataFrame]:
+@dataclass(frozen=True)
+class Stage:
     """
-    Executa as etapas principais e retorna um dicionário com os dataframes finais/intermediários.
-    Ajuste "cfg" conforme seus caminhos/credenciais.
+    Etapa do pipeline: func(cfg, **{entrada: DataFrame}) -> DataFrame.
+    "inputs" são os nomes das etapas das quais esta depende.
+    """
+    name: str
+    func: t.Callable[..., pd.DataFrame]
+    inputs: tuple[str, ...] = ()
+
+
+@dataclass
+class StageReport:
     """
+    Medições de uma execução de etapa (PipelineResult.report() e log "basecode.pipeline").
+    read_s = tempo nas leituras de fontes (Access/BigQuery/arquivos); transform_s = o resto.
+    """
+    stage: str
+    started_at: str
+    wall_s: float
+    read_s: float
+    transform_s: float
+    rows_in: int  # linhas das etapas de entrada + linhas lidas das fontes
+    rows_read: int
+    rows_out: int
+    columns_out: int
+    memory_bytes: int
+    sources: int
+    reused: bool = False
+    error: str | None = None
+
+
+_PIPELINE_LOG = logging.getLogger("basecode.pipeline")
+
+
+def _stage_report(
+    name: str, started_at: str, t0: float, rows_in: int, tracker: "_StageSources | None",
+    df: pd.DataFrame | None, reused: bool = False, error: str | None = None,
+) -> StageReport:
+    wall = time.perf_counter() - t0
+    read_s = tracker.read_s if tracker is not None else 0.0
+    rows_read = tracker.read_rows if tracker is not None else 0
+    return StageReport(
+        stage=name,
+        started_at=started_at,
+        wall_s=round(wall, 4),
+        read_s=round(read_s, 4),
+        transform_s=round(max(wall - read_s, 0.0), 4),
+        rows_in=rows_in + rows_read,
+        rows_read=rows_read,
+        rows_out=len(df) if df is not None else 0,
+        columns_out=df.shape[1] if df is not None else 0,
+        memory_bytes=int(df.memory_usage(deep=True).sum()) if df is not None else 0,
+        sources=len(tracker.sources) if tracker is not None else 0,
+        reused=reused,
+        error=error,
+    )
+
+
+def _stage_pendente_hd(cfg: Config, Frentes_PoC, Aux_Razao, Dim_Equipes) -> pd.DataFrame:
+    return tbl_pendente_alocacao_hd_v2(cfg, aux_pendente_frentes=Frentes_PoC, aux_pendente_razao=Aux_Razao, dim_equipes=Dim_Equipes)
+
+
+def _stage_produto_unificado(cfg: Config, Receita_Produto, Carteira_Produto) -> pd.DataFrame:
+    # junta produto de Razão (histórico) + Carteira (pipeline de caixa/futuro)
+    return pd.concat([Receita_Produto, Carteira_Produto], ignore_index=True, sort=False)
+
+
+def _stage_tf_vendas(
+    cfg: Config, Meta_Receita, Pendente_Alocacao_HD, Receita_SuccessFee, Produto_Unificado, Vendas,
+    Meta_Vendas_TD, Receita_PoC, Carteira_SF, Recebimento, Estoque,
+) -> pd.DataFrame:
+    return tf_vendas(
+        cfg,
+        tD_Meta=Meta_Receita,
+        tbl_PendenteAlocacao_HD=Pendente_Alocacao_HD,
+        tF_ReceitaSuccessFee_df=Receita_SuccessFee,
+        tF_ReceitaProduto_df=Produto_Unificado,
+        tbl_Vendas_df=Vendas,
+        tD_MetaVendas_df=Meta_Vendas_TD,
+        tF_ReceitaPoC_df=Receita_PoC,
+        tF_CarteiraSuccessFee_df=Carteira_SF,
+        qry_Financeiro_Recebimento_df=Recebimento,
+        tF_Estoque_df=Estoque,
+        # tF_PotencialReceita_df=pot_curva,
+        # tbl_PotencialReceita_Fim=pot_fim,
+    )
+
+
+def _stage_tf_vendas_long(cfg: Config, tF_Vendas) -> pd.DataFrame:
+    return tf_vendas_long(tF_Vendas)
+
+
+PIPELINE_STAGES: list[Stage] = [
     # 1) Bases de metas e vendas
-    df_meta_rec   = tD_meta(cfg)              # ReceitaMeta
-    df_meta_vdt   = tD_meta_vendas_td(cfg)    # MetaVendas (TD)
-    df_metas_alt  = tD_metas(cfg)             # MetaVendas (média) – opcional
-    df_mob        = tD_mob(cfg)
+    Stage("Meta_Receita", tD_meta),                 # ReceitaMeta
+    Stage("Meta_Vendas_TD", tD_meta_vendas_td),     # MetaVendas (TD)
+    Stage("Metas_Media", tD_metas),                 # MetaVendas (média) – opcional
+    Stage("MoB", tD_mob),
 
     # 2) Carteiras / DePara / Percentuais
-    df_carteira   = tD_carteira(cfg)
-    df_depara     = depara_un(cfg)
-    df_pct_meta   = percentual_meta(cfg)
+    Stage("Carteira", tD_carteira),
+    Stage("DeParaUN", depara_un),
+    Stage("PercentualMeta", percentual_meta),
 
     # 3) Vendas e pendências
-    df_vendas     = tbl_vendas(cfg)
-    df_dim_eq     = tbl_dimensionamento_equipe_vendida(cfg)
-    frentes_poc   = tf_frente_equipe_formada(cfg)
-    aux_razao     = aux_pendentealocacao_razao(cfg)
-    df_pend_hd    = tbl_pendente_alocacao_hd_v2(cfg, aux_pendente_frentes=frentes_poc, aux_pendente_razao=aux_razao, dim_equipes=df_dim_eq)
+    Stage("Vendas", tbl_vendas),
+    Stage("Dim_Equipes", tbl_dimensionamento_equipe_vendida),
+    Stage("Frentes_PoC", tf_frente_equipe_formada),
+    Stage("Aux_Razao", aux_pendentealocacao_razao),
+    Stage("Pendente_Alocacao_HD", _stage_pendente_hd, ("Frentes_PoC", "Aux_Razao", "Dim_Equipes")),
 
     # 4) Carteira (caixa) – Success Fee / Produto futuros
-    df_sf_car     = tf_carteira_successfee(cfg)
-    df_prod_car   = tf_carteira_produto(cfg)
+    Stage("Carteira_SF", tf_carteira_successfee),
+    Stage("Carteira_Produto", tf_carteira_produto),
 
     # 5) Razão – PoC/Produto/SucessFee histórico
-    df_poc        = tf_receita_poc(cfg)
-    df_prod       = tf_receita_produto(cfg)
-    df_sfee       = tf_receita_successfee(cfg)
+    Stage("Receita_PoC", tf_receita_poc),
+    Stage("Receita_Produto", tf_receita_produto),
+    Stage("Receita_SuccessFee", tf_receita_successfee),
 
     # 6) Estoque e potencial
-    df_estoque    = tf_estoque(cfg)
+    Stage("Estoque", tf_estoque),
     # (Opcional) potencial por curva e fim – requer BQ cheio
     # pot_curva     = tbl_potencial_receita(cfg, tF_Estoque_df=df_estoque, tD_MoB_df=df_mob)
     # pot_fim       = tbl_potencial_receita_fim(cfg, tF_Estoque_df=df_estoque, dim_equipes=df_dim_eq)
 
     # 7) Recebimento (caixa)
-    df_receb      = qry_financeiro_recebimento(cfg)
-
-    # 8) Unificação estilo tF_Vendas (long)
-    # junta produto de Razão (histórico) + Carteira (pipeline de caixa/futuro)
-    prod_unificado = pd.concat([df_prod, df_prod_car], ignore_index=True, sort=False)
+    Stage("Recebimento", qry_financeiro_recebimento),
+
+    # 8) Unificação estilo tF_Vendas (wide) + visão long sob demanda
+    Stage("Produto_Unificado", _stage_produto_unificado, ("Receita_Produto", "Carteira_Produto")),
+    Stage("tF_Vendas", _stage_tf_vendas, (
+        "Meta_Receita", "Pendente_Alocacao_HD", "Receita_SuccessFee", "Produto_Unificado", "Vendas",
+        "Meta_Vendas_TD", "Receita_PoC", "Carteira_SF", "Recebimento", "Estoque",
+    )),
+    Stage("tF_Vendas_long", _stage_tf_vendas_long, ("tF_Vendas",)),
+]
+
+# Chaves devolvidas por run_pipeline (as demais etapas são intermediárias)
+PIPELINE_OUTPUTS: tuple[str, ...] = (
+    "tF_Vendas", "tF_Vendas_long", "Meta_Receita", "Meta_Vendas_TD", "Vendas", "Pendente_Alocacao_HD",
+    "Receita_PoC", "Receita_Produto", "Receita_SuccessFee", "Estoque", "Recebimento",
+    "Carteira_SF", "Carteira_Produto", "Carteira", "DeParaUN", "PercentualMeta",
+)
+
+# Saídas calculadas só a partir de outra saída (sem ler fontes): {saída: (base, função)}.
+# O snapshot grava apenas a base e gera a visão no primeiro acesso.
+PIPELINE_VIEWS: dict[str, tuple[str, t.Callable[[pd.DataFrame], pd.DataFrame]]] = {
+    "tF_Vendas_long": ("tF_Vendas", tf_vendas_long),
+}
+
+
+def _stage_closure(stages: dict[str, Stage], targets: t.Iterable[str]) -> set[str]:
+    needed: set[str] = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name in needed:
+            continue
+        if name not in stages:
+            raise KeyError(name)
+        needed.add(name)
+        stack.extend(stages[name].inputs)
+    return needed
+
+
+class PipelineResult(Mapping):
+    """
+    Resultado preguiçoso do run_pipeline: cada chave (ex.: "Receita_PoC") calcula apenas o
+    seu subgrafo de etapas no primeiro acesso e memoriza o resultado; etapas já calculadas
+    (ou em cálculo por outra thread) são reaproveitadas.
+
+    - Etapas independentes do subgrafo rodam em paralelo (cfg.pipeline_workers threads).
+    - Fail-fast: a primeira exceção é propagada no acesso (dfs[chave] / dfs.get(chave)) e a
+      etapa sai do memo, para que o próximo acesso tente de novo.
+    - As leituras Access/BigQuery ficam num memo próprio do resultado, liberado quando todas
+      as etapas das chaves públicas já foram calculadas.
+    - Refresh incremental ("previous"): cada etapa guarda as fontes que leu e o fingerprint
+      delas; uma etapa do resultado anterior é reaproveitada se as fontes não mudaram e todas
+      as entradas também foram reaproveitadas. Config diferente ou virada de mês recalculam tudo.
+    - Instrumentação: cada etapa executada gera um StageReport (tempo total, leitura x
+      transformação, linhas, memória), disponível em .report() e registrado em JSON no
+      logger "basecode.pipeline".
+    """
 
-    long = tf_vendas(
-        cfg,
-        tD_Meta=df_meta_rec,
-        tbl_PendenteAlocacao_HD=df_pend_hd,
-        tF_ReceitaSuccessFee_df=df_sfee,
-        tF_ReceitaProduto_df=prod_unificado,
-        tbl_Vendas_df=df_vendas,
-        tD_MetaVendas_df=df_meta_vdt,
-        tF_ReceitaPoC_df=df_poc,
-        tF_CarteiraSuccessFee_df=df_sf_car,
-        qry_Financeiro_Recebimento_df=df_receb,
-        tF_Estoque_df=df_estoque,
-        # tF_PotencialReceita_df=pot_curva,
-        # tbl_PotencialReceita_Fim=pot_fim,
-    )
+    def __init__(
+        self,
+        cfg: Config,
+        stages: t.Sequence[Stage] = PIPELINE_STAGES,
+        outputs: t.Sequence[str] = PIPELINE_OUTPUTS,
+        previous: "PipelineResult | None" = None,
+    ):
+        self.cfg = cfg
+        self._stages = {st.name: st for st in stages}
+        self._order = [st.name for st in stages]
+        self._outputs = tuple(outputs)
+        self._needed_all = _stage_closure(self._stages, self._outputs)
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._scope = _ReadScope()
+        # as etapas usam o mês corrente (ex.: carteira a partir do início do mês)
+        self._mes = date.today().replace(day=1)
+        self._sources: dict[str, dict[tuple, t.Any]] = {}
+        self._reused: set[str] = set()
+        self._anterior = previous._reusable(cfg, self._mes) if previous is not None else {}
+        self._report: dict[str, StageReport] = {}
+
+    # ---------- Mapping ----------
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        if key not in self._outputs:
+            raise KeyError(key)
+        return self._resolve([key])[key]
+
+    def __iter__(self):
+        return iter(self._outputs)
+
+    def __len__(self) -> int:
+        return len(self._outputs)
+
+    def __contains__(self, key: object) -> bool:
+        # não dispara cálculo (o padrão do Mapping chamaria __getitem__)
+        return key in self._outputs
+
+    def get(self, key: str, default=None):
+        if key not in self._outputs:
+            return default
+        return self[key]
+
+    # ---------- API ----------
+    def computed(self) -> list[str]:
+        """Etapas já calculadas com sucesso."""
+        with self._lock:
+            return [n for n in self._order if n in self._futures and self._futures[n].done()
+                    and self._futures[n].exception() is None]
+
+    def materialize(self, keys: t.Iterable[str] | None = None) -> dict[str, pd.DataFrame]:
+        """Calcula todas as chaves públicas (ou só "keys") de uma vez (máximo paralelismo)."""
+        keys = self._outputs if keys is None else tuple(keys)
+        for key in keys:
+            if key not in self._outputs:
+                raise KeyError(key)
+        return self._resolve(keys)
+
+    def fingerprint(self, completo: bool = True) -> dict[str, dict[str, t.Any]]:
+        """
+        fingerprint_fontes(cfg) compartilhando as consultas com as etapas deste resultado:
+        chamado antes do cálculo, as etapas reaproveitam os mesmos valores.
+        """
+        token = _READ_SCOPE.set(self._scope)
+        try:
+            return fingerprint_fontes(self.cfg, completo)
+        finally:
+            _READ_SCOPE.reset(token)
+
+    def reused(self) -> list[str]:
+        """Etapas aproveitadas do resultado anterior (sem recálculo)."""
+        with self._lock:
+            return [n for n in self._order if n in self._reused]
+
+    def report(self) -> list[dict[str, t.Any]]:
+        """Relatório das etapas já executadas (última execução de cada uma), na ordem do pipeline."""
+        with self._lock:
+            return [asdict(self._report[n]) for n in self._order if n in self._report]
+
+    def _record(self, rep: StageReport) -> None:
+        with self._lock:
+            self._report[rep.stage] = rep
+        if _PIPELINE_LOG.isEnabledFor(logging.INFO):
+            _PIPELINE_LOG.info(json.dumps(asdict(rep), ensure_ascii=False))
+
+    # ---------- refresh incremental ----------
+    def _reusable(self, cfg: Config, mes: date) -> dict[str, tuple[pd.DataFrame, dict[tuple, t.Any]]]:
+        """Etapas deste resultado que um novo run pode reaproveitar: {etapa: (df, fontes)}."""
+        if cfg != self.cfg or mes != self._mes:
+            return {}
+        with self._lock:
+            out = dict(self._anterior)  # ainda não consumidas por este resultado
+            for name, fut in self._futures.items():
+                if fut.done() and fut.exception() is None and name in self._sources:
+                    out[name] = (fut.result(), self._sources[name])
+        return out
+
+    def _reuse(self, st: Stage) -> pd.DataFrame | None:
+        with self._lock:
+            prev = self._anterior.pop(st.name, None)
+            inputs_ok = all(i in self._reused for i in st.inputs)
+        if prev is None or not inputs_ok:
+            return None
+        df, sources = prev
+        for src, fp in sources.items():
+            if fp is None or _source_fingerprint(src) != fp:
+                return None
+        with self._lock:
+            self._sources[st.name] = sources
+            self._reused.add(st.name)
+        return df
+
+    # ---------- execução ----------
+    def _call(self, st: Stage, deps: dict[str, pd.DataFrame]) -> pd.DataFrame:
+        t0 = time.perf_counter()
+        started_at = datetime.now().isoformat(timespec="seconds")
+        rows_in = sum(len(d) for d in deps.values())
+        # o scope vale também para a conferência do _reuse (fingerprints uma vez por run)
+        scope_token = _READ_SCOPE.set(self._scope)
+        try:
+            df = self._reuse(st)
+            if df is not None:
+                self._record(_stage_report(st.name, started_at, t0, rows_in, None, df, reused=True))
+                return df
+            tracker = _StageSources(_source_fingerprint)
+            sources_token = _STAGE_SOURCES.set(tracker)
+            try:
+                df = st.func(self.cfg, **deps)
+            except Exception as e:
+                self._record(_stage_report(st.name, started_at, t0, rows_in, tracker, None, error=f"{type(e).__name__}: {e}"))
+                raise
+            finally:
+                _STAGE_SOURCES.reset(sources_token)
+        finally:
+            _READ_SCOPE.reset(scope_token)
+        with self._lock:
+            self._sources[st.name] = tracker.sources
+        self._record(_stage_report(st.name, started_at, t0, rows_in, tracker, df))
+        return df
+
+    def _resolve(self, targets: t.Sequence[str]) -> dict[str, pd.DataFrame]:
+        needed = _stage_closure(self._stages, targets)
+        mine: dict[str, Future] = {}
+        with self._lock:
+            futs: dict[str, Future] = {}
+            for name in needed:
+                fut = self._futures.get(name)
+                if fut is None:
+                    fut = self._futures[name] = Future()
+                    mine[name] = fut
+                futs[name] = fut
+        if mine:
+            self._compute(mine, futs)
+        out = {name: futs[name].result() for name in targets}
+        if self._needed_all.issubset(self.computed()):
+            self._scope.clear()
+        return out
+
+    def _compute(self, mine: dict[str, Future], futs: dict[str, Future]) -> None:
+        """
+        Executa as etapas "mine" (reservadas por esta chamada) assim que as entradas ficam
+        prontas – inclusive entradas sendo calculadas por outra thread.
+        """
+        pending = [self._stages[n] for n in self._order if n in mine]
+        running: dict[Future, str] = {}
+        ex = ThreadPoolExecutor(max_workers=max(1, self.cfg.pipeline_workers), thread_name_prefix="pipeline")
+        try:
+            while pending or running:
+                waiting: set[Future] = set()
+                for st in list(pending):
+                    deps = [futs[i] for i in st.inputs]
+                    for dep in deps:
+                        if dep.done() and dep.exception() is not None:
+                            raise dep.exception()
+                    if all(dep.done() for dep in deps):
+                        pending.remove(st)
+                        args = {i: futs[i].result() for i in st.inputs}
+                        fut = ex.submit(contextvars.copy_context().run, self._call, st, args)
+                        running[fut] = st.name
+                    else:
+                        waiting.update(dep for dep in deps if not dep.done())
+                done, _ = wait(set(running) | waiting, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut, None)
+                    if name is not None:
+                        mine[name].set_result(fut.result())
+        except BaseException as e:
+            ex.shutdown(wait=False, cancel_futures=True)
+            self._scope.discard_errors()
+            with self._lock:
+                for name, fut in mine.items():
+                    if not fut.done():
+                        fut.set_exception(e)
+                    if fut.exception() is not None and self._futures.get(name) is fut:
+                        del self._futures[name]
+            raise
+        ex.shutdown(wait=True)
+
+
+def run_pipeline(cfg: Config, previous: PipelineResult | None = None) -> PipelineResult:
+    """
+    Monta o pipeline e retorna um mapeamento preguiçoso com os dataframes finais/intermediários:
+    dfs["Receita_PoC"] calcula só o que essa chave precisa. Use .materialize() para calcular tudo.
+    Com "previous" (resultado de um run anterior), etapas cujas fontes não mudaram são
+    reaproveitadas em vez de recalculadas.
+    Ajuste "cfg" conforme seus caminhos/credenciais.
+    """
+    return PipelineResult(cfg, previous=previous)
 
-    return {
-        "tF_Vendas_long": long,
-        "Meta_Receita": df_meta_rec,
-        "Meta_Vendas_TD": df_meta_vdt,
-        "Vendas": df_vendas,
-        "Pendente_Alocacao_HD": df_pend_hd,
-        "Receita_PoC": df_poc,
-        "Receita_Produto": df_prod,
-        "Receita_SuccessFee": df_sfee,
-        "Estoque": df_estoque,
-        "Recebimento": df_receb,
-        "Carteira_SF": df_sf_car,
-        "Carteira_Produto": df_prod_car,
-        "Carteira": df_carteira,
-        "DeParaUN": df_depara,
-        "PercentualMeta": df_pct_meta,
-    }
 
 # ===================== Execução direta (opcional) ===================== #
 
@@ -931,6 +1846,6 @@ if __name__ == "__main__":
         xlsx_depara_un=r"C:\Work\BI Receita\DeParaCarteira (Traduzido).xlsx",
         bigquery_project_id="SEU-PROJETO-GCP",
     )
-    dfs = run_pipeline(cfg)
+    dfs = run_pipeline(cfg).materialize()
     for name, df in dfs.items():
         print(name, df.shape)
\ No newline at end of file
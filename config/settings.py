@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app_receita.middleware.MetricasMiddleware',  # mede todas as camadas abaixo (/metrics)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -119,6 +120,64 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Pipeline de receita (app_receita)
+# Tempo (s) até revalidar o resultado cacheado contra o fingerprint completo das fontes.
+RECEITA_PIPELINE_CACHE_TTL = 15 * 60
+
+# Snapshots Parquet dos DataFrames do pipeline (python manage.py construir_snapshot).
+# Com RECEITA_USAR_SNAPSHOT, as views leem o snapshot publicado em vez das fontes.
+RECEITA_SNAPSHOT_DIR = BASE_DIR / "snapshots"
+RECEITA_USAR_SNAPSHOT = True
+RECEITA_SNAPSHOT_MANTER = 3  # versões mantidas em disco
+
+# Stale-while-revalidate do cache do processo: com fontes alteradas, serve o resultado
+# anterior enquanto o novo é calculado em segundo plano (falha mantém o anterior).
+RECEITA_PIPELINE_SERVIR_ANTIGO = True
+
+# Intervalo (s) entre verificações do "manage.py atualizar_dados" (novo snapshot só se as fontes mudaram)
+RECEITA_ATUALIZACAO_INTERVALO = 15 * 60
+
+# Travas entre processos (uma leitura completa das fontes por vez); a trava de um processo
+# que não a renova há RECEITA_TRAVA_VALIDADE segundos é considerada abandonada.
+RECEITA_TRAVA_DIR = BASE_DIR / ".travas"
+RECEITA_TRAVA_VALIDADE = 10 * 60
+
+# Páginas e exportações assíncronas (servidor ASGI, config/asgi.py): pipeline/pandas rodam
+# num executor de RECEITA_ASYNC_WORKERS threads, sem prender um worker por requisição.
+RECEITA_VIEWS_ASYNC = False
+RECEITA_ASYNC_WORKERS = 8
+
+# Relatório por etapa do pipeline (tempo, linhas, memória) em JSON lines; a pasta é
+# criada pelo handler no primeiro registro
+RECEITA_LOG_DIR = BASE_DIR / "logs"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json_lines": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "pipeline_jsonl": {
+            "class": "app_receita.log.ArquivoRotativoHandler",
+            "filename": RECEITA_LOG_DIR / "pipeline.jsonl",
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "encoding": "utf-8",
+            "formatter": "json_lines",
+        },
+    },
+    "loggers": {
+        "basecode.pipeline": {"handlers": ["pipeline_jsonl"], "level": "INFO", "propagate": False},
+    },
+}
+
+# Máximo de linhas por exportação (Excel/CSV); o Excel aceita até 1.048.575 linhas de dados.
+RECEITA_EXPORTACAO_MAX_LINHAS = 1_048_575
+
+# Máximo de linhas por página da API das tabelas (api/tabela/<tipo>/?limite=)
+RECEITA_API_MAX_LINHAS = 1000
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
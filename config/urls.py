@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from app_receita import views as receita_views
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", receita_views.metricas, name="metricas"),  # scrape do Prometheus
     path("", include("app_receita.urls")),  # envia a home para a app
 ]